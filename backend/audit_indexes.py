@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Index audit: start the app against a local mongod (which creates the
+declared indexes), explain each DAL's representative queries and flag
+the ones answered by a collection scan. Exits non-zero if any are.
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+# Get MongoDB URI from environment or use default
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017/reach_hk")
+
+import server
+from core.indexes import audit_queries
+
+async def audit_indexes() -> int:
+    async with server.lifespan(server.app):
+        results = await audit_queries(*server.app.indexed_components)
+
+    scans = 0
+    for result in results:
+        flag = "⚠️  COLLSCAN" if result["collection_scan"] else "✅"
+        print(f"{flag}  {result['component']}.{result['collection']}  "
+              f"{json.dumps(result['filter'], default=str)}"
+              f"{'  sort ' + str(result['sort']) if result['sort'] else ''}  [{' <- '.join(result['stages'])}]")
+        scans += result["collection_scan"]
+
+    print(f"\n{len(results)} queries audited, {scans} collection scans")
+    return 1 if scans else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(audit_indexes()))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+DAL benchmarks: seed the benchmark database, start the app's components
+the way the server does, and measure throughput and latency of the hot
+paths. Results are stored under benchmarks/results/ and compared with
+the previous run.
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from common import BENCH_MONGODB_URI, compare, measure, previous_results, print_result, write_results
+
+os.environ["MONGODB_URI"] = BENCH_MONGODB_URI
+import server
+from fastapi import UploadFile
+
+from seed import PASSWORD, add_seed_arguments, connect, load_dataset, parent_id, seed, seed_options, student_username
+
+async def instant_grading(content: str, context: dict) -> dict:
+    """Stands in for the model call so the benchmark measures our own work, not the simulated 0.5s latency"""
+    score = 50 + len(content) % 50
+    return {
+        "raw_score": score,
+        "adjusted_score": score,
+        "confidence": 0.85,
+        "criteria": {"content_relevance": score, "vocabulary_usage": 75, "structure": 80, "creativity": 70},
+        "feedback": "Benchmark feedback",
+        "suggestions": "Keep reading every day"
+    }
+
+async def run(args) -> list:
+    client, database = connect(force=args.force)
+    if not args.no_seed:
+        await seed(database, **seed_options(args))
+    dataset = await load_dataset(database)
+    client.close()
+
+    app = server.app
+    results = []
+    async with server.lifespan(app):
+        # Scheduled maintenance jobs aren't under test and would skew whatever runs alongside them
+        await app.scheduler.stop()
+        if not args.model_latency:
+            app.ai_grading_dal._call_gemma_api = instant_grading
+
+        volunteers, experiences = dataset["volunteers"], dataset["experiences"]
+        submissions = dataset["pending_submissions"]
+        upload_dir = tempfile.mkdtemp(prefix="bench_uploads_")
+        app.assignment_dal.upload_dir = upload_dir
+        payload = b"x" * args.upload_bytes
+        due_date = datetime.now() + timedelta(days=7)
+        count, concurrency = args.count, args.concurrency
+
+        scenarios = {
+            "grade_submission": (min(count, len(submissions)), lambda i: app.ai_grading_dal.grade_submission(
+                str(submissions[i]["_id"]), submissions[i].get("content", ""), {"subject": "English", "grade_level": "K3"}
+            )),
+            # Distinct (volunteer, experience) pairs so every call attempts a real seat claim
+            "register_for_experience": (count, lambda i: app.time_auction_dal.register_for_experience(
+                volunteers[i % len(volunteers)], experiences[(i // len(volunteers)) % len(experiences)]
+            )),
+            "add_experience": (count, lambda i: app.pet_game_dal.add_experience(
+                parent_id(i % dataset["students"]), "daily_login", 10, "Benchmark"
+            )),
+            "get_volunteer_leaderboard": (count, lambda i: app.time_auction_dal.get_volunteer_leaderboard(
+                ("all_time", "this_month", "this_week")[i % 3], 10
+            )),
+            "sign_in_student": (count, lambda i: app.login_dal.sign_in_student(
+                student_username(i % dataset["students"]), PASSWORD
+            )),
+            "create_assignment": (count, lambda i: app.assignment_dal.create_assignment(
+                f"Benchmark assignment {i}", "Generated for benchmarking", due_date,
+                UploadFile(io.BytesIO(payload), filename="bench.txt")
+            )),
+        }
+        selected = args.only or list(scenarios)
+        print(f"\n⏱️  DAL benchmarks: {count} operations per scenario, concurrency {concurrency}")
+        for name in selected:
+            scenario_count, operation = scenarios[name]
+            result = await measure(name, operation, scenario_count, concurrency)
+            print_result(result)
+            results.append(result)
+    return results
+
+def main(argv=sys.argv[1:]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000, help="operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--only", nargs="+", choices=[
+        "grade_submission", "register_for_experience", "add_experience",
+        "get_volunteer_leaderboard", "sign_in_student", "create_assignment"
+    ])
+    parser.add_argument("--upload-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--model-latency", action="store_true", help="keep the simulated grading model delay")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data already in the benchmark database")
+    parser.add_argument("--force", action="store_true", help="use a database whose name lacks 'bench'")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    add_seed_arguments(parser)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    config = {key: value for key, value in vars(args).items() if key not in ("force", "fail_on_regression")}
+    path = write_results("dal", results, config)
+    print(f"\n💾 Results written to {path}")
+
+    previous = previous_results("dal", exclude=path)
+    regressions = compare(previous, results) if previous else []
+    return 1 if regressions and args.fail_on_regression else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# Benchmark helpers: timed runs, latency summaries and JSON results per commit
+import asyncio
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "src"))
+sys.path.insert(0, BACKEND_DIR)
+
+# Benchmarks wipe what they seed, so they get their own database
+BENCH_MONGODB_URI = os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017/reach_hk_bench")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# A benchmark is slower than the previous run if throughput drops or p95 grows by more than this
+REGRESSION_THRESHOLD = 0.2
+
+async def measure(name: str, operation: Callable[[int], Awaitable], count: int, concurrency: int) -> dict:
+    """Run operation(0..count-1) with at most `concurrency` calls in flight and summarize the latencies"""
+    latencies = []
+    succeeded = errors = 0
+    first_error = None
+    indexes = iter(range(count))
+
+    async def worker():
+        nonlocal succeeded, errors, first_error
+        for index in indexes:
+            start = time.perf_counter()
+            try:
+                succeeded += await operation(index) is not False
+            except Exception as exc:
+                errors += 1
+                first_error = first_error or repr(exc)
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(name, latencies, time.perf_counter() - started, succeeded, errors, concurrency)
+    result["first_error"] = first_error
+    return result
+
+def summarize(name: str, latencies: List[float], elapsed: float, succeeded: int, errors: int,
+              concurrency: int) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "name": name,
+        "operations": len(latencies),
+        "succeeded": succeeded,
+        "errors": errors,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "mean": _ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": _ms(percentile(latencies, 50)),
+            "p95": _ms(percentile(latencies, 95)),
+            "p99": _ms(percentile(latencies, 99)),
+            "max": _ms(latencies[-1]) if latencies else None,
+        }
+    }
+
+def percentile(ordered: List[float], pct: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def print_result(result: dict):
+    latency = result["latency_ms"]
+    print(f"  {result['name']:<32} {result['throughput'] or 0:>9.1f} ops/s  "
+          f"p50 {latency['p50'] or 0:>7.2f} ms  p95 {latency['p95'] or 0:>7.2f} ms  "
+          f"p99 {latency['p99'] or 0:>7.2f} ms  ok {result['succeeded']}/{result['operations']}"
+          f"{'  errors ' + str(result['errors']) if result['errors'] else ''}")
+    if result.get("first_error"):
+        print(f"    first error: {result['first_error']}")
+
+# Results
+def write_results(kind: str, results: List[dict], config: dict) -> str:
+    """Store a run as results/<kind>-<timestamp>-<commit>.json"""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    commit = git_commit()
+    created_at = datetime.now()
+    path = os.path.join(RESULTS_DIR, f"{kind}-{created_at:%Y%m%d-%H%M%S}-{commit}.json")
+    with open(path, "w") as file:
+        json.dump({
+            "kind": kind,
+            "commit": commit,
+            "created_at": created_at.isoformat(),
+            "config": config,
+            "results": results
+        }, file, indent=2)
+    return path
+
+def previous_results(kind: str, exclude: str = None) -> Optional[dict]:
+    """The most recent stored run of a kind"""
+    paths = sorted(path for path in glob.glob(os.path.join(RESULTS_DIR, f"{kind}-*.json")) if path != exclude)
+    if not paths:
+        return None
+    with open(paths[-1]) as file:
+        return json.load(file)
+
+def compare(previous: dict, results: List[dict], threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Print the change against a previous run and return the benchmarks that regressed"""
+    before = {result["name"]: result for result in previous["results"]}
+    regressions = []
+    print(f"\nCompared with {previous['commit']} ({previous['created_at']}):")
+    for result in results:
+        old = before.get(result["name"])
+        if not old or not old["throughput"] or not old["latency_ms"]["p95"]:
+            continue
+        throughput_change = result["throughput"] / old["throughput"] - 1
+        p95_change = result["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1
+        regressed = throughput_change < -threshold or p95_change > threshold
+        print(f"  {'⚠️ ' if regressed else '  '}{result['name']:<32} throughput {throughput_change:+7.1%}  "
+              f"p95 {p95_change:+7.1%}")
+        if regressed:
+            regressions.append(result["name"])
+    return regressions
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 3) if seconds is not None else None
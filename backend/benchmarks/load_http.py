@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator: drive the FastAPI endpoints with concurrent async
+clients and record throughput and latency per endpoint.
+
+By default the app runs in-process over an ASGI transport against the
+benchmark database. Pass --url to load a running server instead (e.g. the
+multi-worker mode, started with MONGODB_URI pointing at the benchmark
+database and seeded with seed.py).
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from common import BENCH_MONGODB_URI, compare, measure, previous_results, print_result, write_results
+
+os.environ["MONGODB_URI"] = BENCH_MONGODB_URI
+import httpx
+import server
+
+from seed import PASSWORD, add_seed_arguments, connect, load_dataset, parent_id, seed, seed_options, student_username
+
+@asynccontextmanager
+async def http_client(url: str, connections: int):
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    if url:
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+            yield client
+        return
+    async with server.lifespan(server.app):
+        await server.app.scheduler.stop()
+        server.app.assignment_dal.upload_dir = tempfile.mkdtemp(prefix="bench_uploads_")
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits, timeout=30) as client:
+            yield client
+
+async def run(args) -> list:
+    client, database = connect(force=args.force)
+    if not args.no_seed:
+        await seed(database, **seed_options(args))
+    dataset = await load_dataset(database)
+    client.close()
+
+    volunteers, students = dataset["volunteers"], dataset["students"]
+    payload = b"x" * args.upload_bytes
+    due_date = (datetime.now() + timedelta(days=7)).isoformat()
+    results = []
+    async with http_client(args.url, args.concurrency) as http:
+        async def request(method: str, path: str, **kwargs) -> bool:
+            response = await http.request(method, path, **kwargs)
+            response.raise_for_status()
+            return True
+
+        scenarios = {
+            "GET leaderboard": lambda i: request("GET", "/api/time_auction/leaderboard", params={
+                "period": ("all_time", "this_month", "this_week")[i % 3]
+            }),
+            "GET volunteer badges": lambda i: request(
+                "GET", f"/api/time_auction/badges/{volunteers[i % len(volunteers)]}"
+            ),
+            "GET shop items": lambda i: request("GET", "/api/pet/shop/items"),
+            "POST sign_in_student": lambda i: request("POST", "/api/sign_in_student", params={
+                "username": student_username(i % students), "password": PASSWORD
+            }),
+            "POST add_experience": lambda i: request("POST", "/api/pet/add_experience", params={
+                "user_id": parent_id(i % students), "activity_type": "daily_login", "exp_gained": 10
+            }),
+            "POST create_assignment": lambda i: request("POST", "/api/create_assignment", data={
+                "title": f"Benchmark assignment {i}", "description": "Generated for benchmarking", "due_date": due_date
+            }, files={"file": ("bench.txt", payload, "text/plain")}),
+        }
+        selected = args.only or list(scenarios)
+        print(f"\n⏱️  HTTP load against {args.url or 'in-process app'}: "
+              f"{args.requests} requests per endpoint, concurrency {args.concurrency}")
+        for name in selected:
+            result = await measure(name, scenarios[name], args.requests, args.concurrency)
+            print_result(result)
+            results.append(result)
+    return results
+
+def main(argv=sys.argv[1:]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server, e.g. http://localhost:3001")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--only", nargs="+", choices=[
+        "GET leaderboard", "GET volunteer badges", "GET shop items",
+        "POST sign_in_student", "POST add_experience", "POST create_assignment"
+    ])
+    parser.add_argument("--upload-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data already in the benchmark database")
+    parser.add_argument("--force", action="store_true", help="use a database whose name lacks 'bench'")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    add_seed_arguments(parser)
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    config = {key: value for key, value in vars(args).items() if key not in ("force", "fail_on_regression")}
+    path = write_results("http", results, config)
+    print(f"\n💾 Results written to {path}")
+
+    previous = previous_results("http", exclude=path)
+    regressions = compare(previous, results) if previous else []
+    return 1 if regressions and args.fail_on_regression else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Seed the benchmark database with realistic volumes: the sample items and
+experiences from insert_sample_data.py, plus students, parents,
+volunteers with verified hours, and graded and pending submissions.
+Drops everything in the benchmark database first.
+"""
+
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from common import BENCH_MONGODB_URI
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from insert_sample_data import insert_sample_data
+
+SCHOOLS = ["Kowloon Tong", "Sha Tin", "Tuen Mun", "Wan Chai", "Sai Kung", "Tai Po", "Yuen Long", "Central"]
+SUBJECTS = ["English", "Chinese", "Mathematics", "Science"]
+ACTIVITIES = ["tutoring", "reading_buddy", "event_support", "mentoring"]
+CATEGORIES = ["culinary", "business", "arts", "wellness", "technology"]
+PASSWORD = "bench-password"
+INSERT_BATCH = 5000
+
+def student_username(index: int) -> str:
+    return f"bench_student_{index}"
+
+def parent_id(index: int) -> str:
+    return f"bench_parent_{index}"
+
+def volunteer_id(index: int) -> str:
+    return f"bench_volunteer_{index}"
+
+async def seed(database, students: int = 5000, volunteers: int = 2000, hour_logs: int = 50000,
+               submissions: int = 20000, pending: int = 2000, experiences: int = 200, seed: int = 42):
+    """Replace the benchmark database contents with a generated dataset"""
+    rng = random.Random(seed)
+    now = datetime.now()
+
+    for name in await database.list_collection_names():
+        await database.drop_collection(name)
+    await insert_sample_data(database)
+
+    # Students, one parent each
+    student_docs = [{
+        "name": f"Student {index}",
+        "username": student_username(index),
+        "password": PASSWORD,
+        "guardian_name": f"Parent {index}",
+        "school": rng.choice(SCHOOLS),
+        "badges": [],
+        "verified": True
+    } for index in range(students)]
+    await _insert(database.get_collection("students"), student_docs)
+    student_ids = [str(doc["_id"]) for doc in student_docs]
+
+    # Volunteers with a verified hour history and a matching ledger
+    await _insert(database.get_collection("users"), [
+        {"_id": volunteer_id(index), "full_name": f"Volunteer {index}", "role": "volunteer"}
+        for index in range(volunteers)
+    ])
+    earned = [0.0] * volunteers
+    logs = []
+    for _ in range(hour_logs):
+        index = rng.randrange(volunteers)
+        hours = rng.choice([1.0, 1.5, 2.0, 3.0, 4.0])
+        earned[index] += hours
+        logs.append({
+            "volunteer_id": volunteer_id(index),
+            "activity_type": rng.choice(ACTIVITIES),
+            "hours_earned": hours,
+            "is_verified": True,
+            "verified_by": "bench_admin",
+            "verified_at": now,
+            "created_at": now - timedelta(days=rng.randrange(365))
+        })
+    await _insert(database.get_collection("volunteer_hours"), logs)
+    await _insert(database.get_collection("volunteer_hour_ledger"), [{
+        "_id": volunteer_id(index),
+        "volunteer_id": volunteer_id(index),
+        "earned": earned[index],
+        "available": earned[index],
+        "updated_at": now
+    } for index in range(volunteers)])
+
+    # Experiences open for first-come registration
+    await _insert(database.get_collection("time_auction_experiences"), [{
+        "title": f"Benchmark Experience {index}",
+        "description": "Generated for benchmarking",
+        "category": rng.choice(CATEGORIES),
+        "hours_required": rng.choice([2, 4, 6, 8]),
+        "max_participants": rng.choice([20, 50, 100]),
+        "is_virtual": rng.random() < 0.3,
+        "experience_date": now + timedelta(days=30 + rng.randrange(60)),
+        "registration_deadline": now + timedelta(days=20),
+        "organizer_name": "Benchmark Organizer",
+        "is_active": True,
+        "seats_taken": 0,
+        "allocation_mode": "first_come",
+        "created_at": now,
+        "updated_at": now
+    } for index in range(experiences)])
+
+    # Submissions: a graded history, and the newest ones still waiting for grading
+    submission_docs = []
+    for index in range(submissions):
+        student = rng.randrange(students)
+        submission_docs.append({
+            "student_id": student_ids[student],
+            "parent_id": parent_id(student),
+            "assignment_id": f"bench_assignment_{rng.randrange(200)}",
+            "content": " ".join(rng.choice(["reading", "story", "book", "character", "the", "a", "was", "happy"])
+                                for _ in range(rng.randrange(20, 120))),
+            "status": "submitted" if index >= submissions - pending else "graded",
+            "submitted_at": now - timedelta(minutes=submissions - index)
+        })
+    await _insert(database.get_collection("submissions"), submission_docs)
+    await _insert(database.get_collection("ai_grading_sessions"), [{
+        "submission_id": doc["_id"],
+        "subject": rng.choice(SUBJECTS),
+        "model_used": "gemma",
+        "raw_score": (score := rng.uniform(40, 100)),
+        "adjusted_score": score,
+        "confidence_level": 0.85,
+        "grading_criteria": {},
+        "ai_feedback": "",
+        "personalized_suggestions": [],
+        "created_at": doc["submitted_at"]
+    } for doc in submission_docs if doc["status"] == "graded"])
+
+    print(f"🌱 Seeded {students} students, {volunteers} volunteers, {hour_logs} hour logs, "
+          f"{experiences} experiences and {submissions} submissions ({pending} pending)")
+
+async def load_dataset(database) -> dict:
+    """Ids the benchmarks draw their inputs from"""
+    return {
+        "students": await database.get_collection("students").count_documents({}),
+        "volunteers": [doc["_id"] async for doc in database.get_collection("volunteer_hour_ledger").find({}, {"_id": 1})],
+        "experiences": [str(doc["_id"]) async for doc in database.get_collection("time_auction_experiences").find(
+            {"is_active": True, "allocation_mode": "first_come"}, {"_id": 1}
+        )],
+        "pending_submissions": [doc async for doc in database.get_collection("submissions").find(
+            {"status": "submitted"}, {"content": 1}
+        )],
+        "items": [str(doc["_id"]) async for doc in database.get_collection("pet_items").find({}, {"_id": 1})],
+    }
+
+async def _insert(collection, documents):
+    for start in range(0, len(documents), INSERT_BATCH):
+        await collection.insert_many(documents[start:start + INSERT_BATCH], ordered=False)
+
+def add_seed_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--volunteers", type=int, default=2000)
+    parser.add_argument("--hour-logs", type=int, default=50000)
+    parser.add_argument("--submissions", type=int, default=20000)
+    parser.add_argument("--pending", type=int, default=2000, help="submissions left ungraded for grade_submission")
+    parser.add_argument("--experiences", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+
+def seed_options(args) -> dict:
+    return {
+        "students": args.students, "volunteers": args.volunteers, "hour_logs": args.hour_logs,
+        "submissions": args.submissions, "pending": args.pending, "experiences": args.experiences,
+        "seed": args.seed
+    }
+
+def connect(uri: str = BENCH_MONGODB_URI, force: bool = False):
+    """Client and database for benchmarking, refusing databases that don't look like benchmark ones"""
+    client = AsyncIOMotorClient(uri, tlsAllowInvalidCertificates=True)
+    database = client.get_default_database()
+    if "bench" not in database.name and not force:
+        raise SystemExit(f"Refusing to seed '{database.name}': benchmark database names must contain 'bench' "
+                         "(or pass --force)")
+    return client, database
+
+async def main(args):
+    client, database = connect(force=args.force)
+    await seed(database, **seed_options(args))
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_seed_arguments(parser)
+    parser.add_argument("--force", action="store_true", help="seed a database whose name lacks 'bench'")
+    asyncio.run(main(parser.parse_args()))
@@ -4,23 +4,34 @@ Sample data insertion script for the new features:
 - RPG Pet Game items and initial pet data
 - Time Auction experiences
 - Initial volunteer badges setup
+
+With --synthetic it also generates a seeded dataset at load-testing
+volumes: schools, students and their parents, volunteers with hour logs,
+assignments, submissions with grading sessions, score history, streaks,
+alerts and family points, and pets with their XP events. The same seed and
+volumes always produce the same data (dated relative to today).
 """
 
+import argparse
 import asyncio
 import os
+import random
+import struct
+import sys
+import time
+from bson import ObjectId
+from collections import defaultdict
 from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timedelta
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from core.pet_game import EXP_REWARDS, LEVEL_THRESHOLDS
 
 # Get MongoDB URI from environment or use default
 MONGODB_URI = os.environ.get("MONGODB_URI", "mongodb://localhost:27017/reach_hk")
 
-async def insert_sample_data():
-    # Connect to MongoDB
-    client = AsyncIOMotorClient(MONGODB_URI, tlsAllowInvalidCertificates=True)
-    database = client.get_default_database()
-    
-    print("🔗 Connected to MongoDB")
-    
+async def insert_sample_data(database):
     # Pet Game Items
     pet_items = [
         {
@@ -185,9 +196,426 @@ async def insert_sample_data():
     print(f"  • {len(pet_items)} pet game items")
     print(f"  • {len(experiences)} Time Auction experiences")
     print("\n🚀 Your new features are ready to use!")
+
+class BatchInserter:
+    """Buffers documents per collection and writes them in unordered insert_many
+    batches, several in flight at once, so generating the next batch overlaps
+    with Mongo writing the previous ones"""
+
+    def __init__(self, database, batch_size: int = 5000, concurrency: int = 8):
+        self.database = database
+        self.batch_size = batch_size
+        self.counts: Dict[str, int] = defaultdict(int)
+        self._buffers: Dict[str, List[dict]] = defaultdict(list)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+        self._error = None
+
+    async def add(self, collection: str, document: dict):
+        buffer = self._buffers[collection]
+        buffer.append(document)
+        if len(buffer) >= self.batch_size:
+            self._buffers[collection] = []
+            await self._write(collection, buffer)
+
+    async def flush(self):
+        for collection, documents in list(self._buffers.items()):
+            if documents:
+                await self._write(collection, documents)
+        self._buffers.clear()
+        await asyncio.gather(*self._tasks)
+        if self._error:
+            raise self._error
+
+    async def _write(self, collection: str, documents: List[dict]):
+        if self._error:
+            raise self._error
+        # Generation waits here while `concurrency` batches are in flight
+        await self._slots.acquire()
+        task = asyncio.create_task(self._insert(collection, documents))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _insert(self, collection: str, documents: List[dict]):
+        try:
+            await self.database.get_collection(collection).insert_many(documents, ordered=False)
+            self.counts[collection] += len(documents)
+        except Exception as exc:
+            self._error = exc
+        finally:
+            self._slots.release()
+
+
+async def generate_synthetic_data(database, schools: int = 60, students: int = 100_000, parents: int = 70_000,
+                                  volunteers: int = 10_000, assignments: int = 2_000, submissions: int = 1_000_000,
+                                  grading_sessions: int = 900_000, hour_logs: int = 500_000,
+                                  xp_events: int = 2_000_000, days: int = 180, seed: int = 42,
+                                  batch_size: int = 5000, concurrency: int = 8) -> Dict[str, int]:
+    """Insert a generated dataset, returning the number of documents written per collection"""
+    rng = random.Random(seed)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    period_start = today - timedelta(days=days)
+    parents = max(1, min(parents, students))
+    writer = BatchInserter(database, batch_size, concurrency)
+    started = time.perf_counter()
+
+    def moment() -> datetime:
+        """A time in the period, mostly after school and less often at weekends"""
+        day = period_start + timedelta(days=rng.randrange(days))
+        if day.weekday() >= 5 and rng.random() < 0.4:
+            day -= timedelta(days=day.weekday() - 4)
+        hour = rng.choices(HOURS, cum_weights=HOUR_WEIGHTS)[0]
+        return day + timedelta(hours=hour, minutes=rng.randrange(60), seconds=rng.randrange(60))
+
+    # Schools: a few large ones and a long tail of small ones
+    school_names = _school_names(rng, schools)
+    school_weights = _cumulative([1 / (rank + 1) ** 0.8 for rank in range(schools)])
+
+    # Assignments, due throughout the period
+    assignment_ids = []
+    for index in range(assignments):
+        created_at = period_start + timedelta(days=rng.randrange(days))
+        assignment_id = _object_id(rng, created_at)
+        assignment_ids.append(str(assignment_id))
+        await writer.add("assignments", {
+            "_id": assignment_id,
+            "title": f"{rng.choice(SUBJECTS)} practice {index + 1}",
+            "description": "Generated assignment",
+            "path": None,
+            "due_date": created_at + timedelta(days=rng.choice([3, 7, 14]))
+        })
+
+    # Families: every parent has at least one child, some have two or three
+    family = list(range(parents)) + [rng.randrange(parents) for _ in range(students - parents)]
+    rng.shuffle(family)
+    parent_ids = [str(_object_id(rng, period_start)) for _ in range(parents)]
+    for index, parent_id in enumerate(parent_ids):
+        await writer.add("users", {
+            "_id": parent_id,
+            "username": f"synthetic_parent_{index}",
+            "full_name": f"Parent {index}",
+            "role": "parent"
+        })
+
+    # Students: ability sets their typical score, engagement how much they submit
+    ability = [min(95.0, max(35.0, rng.gauss(72, 12))) for _ in range(students)]
+    trend = [rng.gauss(0, 3) for _ in range(students)]  # score change per 30 days
+    weak_skill = [rng.choice(CRITERIA) for _ in range(students)]
+    engagement = [rng.lognormvariate(0, 0.8) for _ in range(students)]
+    per_student = [0] * students
+    for index in rng.choices(range(students), weights=engagement, k=submissions):
+        per_student[index] += 1
+
+    student_ids = []
+    schools_of = []
+    for index in range(students):
+        student_id = _object_id(rng, period_start)
+        student_ids.append(str(student_id))
+        schools_of.append(rng.choices(school_names, cum_weights=school_weights)[0])
+        await writer.add("students", {
+            "_id": student_id,
+            "name": f"Student {index}",
+            "username": f"synthetic_student_{index}",
+            "password": SYNTHETIC_PASSWORD,
+            "guardian_name": f"Parent {family[index]}",
+            "school": schools_of[index],
+            "home_language": rng.choices(LANGUAGES, cum_weights=LANGUAGE_WEIGHTS)[0],
+            "badges": [],
+            "verified": True
+        })
+    print(f"🏫 Generated {assignments} assignments, {parents} parents and {students} students in {schools} schools")
+
+    # Submissions with their grading sessions, and everything derived from the scores
+    graded_positions = set(rng.sample(range(submissions), min(grading_sessions, submissions)))
+    position = 0
+    for index in range(students):
+        student_id, parent_id = student_ids[index], parent_ids[family[index]]
+        buckets = {}
+        active_days = set()
+        for submitted_at in sorted(moment() for _ in range(per_student[index])):
+            graded = position in graded_positions
+            position += 1
+            submission_id = _object_id(rng, submitted_at)
+            await writer.add("submissions", {
+                "_id": submission_id,
+                "student_id": student_id,
+                "parent_id": parent_id,
+                "assignment_id": rng.choice(assignment_ids) if assignment_ids else None,
+                "content": " ".join(rng.choices(WORDS, k=int(rng.lognormvariate(4, 0.5)))),
+                "status": "graded" if graded else "submitted",
+                "submitted_at": submitted_at
+            })
+            if not graded:
+                continue
+
+            months_in = (submitted_at - period_start).days / 30
+            score = round(min(100.0, max(0.0, rng.gauss(ability[index] + trend[index] * months_in, 8))), 1)
+            criteria = {criterion: round(min(100.0, max(0.0, score + rng.gauss(-12 if criterion == weak_skill[index]
+                                                                               else 3, 7))), 1)
+                        for criterion in CRITERIA}
+            graded_at = submitted_at + timedelta(seconds=rng.randrange(5, 600))
+            session_id = _object_id(rng, graded_at)
+            await writer.add("ai_grading_sessions", {
+                "_id": session_id,
+                "submission_id": str(submission_id),
+                "subject": rng.choices(SUBJECTS, cum_weights=SUBJECT_WEIGHTS)[0],
+                "model_used": "gemma",
+                "raw_score": score,
+                "adjusted_score": score,
+                "confidence_level": round(rng.uniform(0.7, 0.95), 2),
+                "grading_criteria": criteria,
+                "ai_feedback": "Generated feedback",
+                "personalized_suggestions": "Keep practising every day.",
+                "processing_time_ms": int(rng.lognormvariate(6.2, 0.4)),
+                "cube_batch": None,
+                "created_at": graded_at
+            })
+            await writer.add("family_points", {
+                "student_id": student_id,
+                "school": schools_of[index],
+                "points": 10,
+                "source": "assignment_completion",
+                "reference_id": str(submission_id),
+                "created_at": graded_at
+            })
+            if score < 60:
+                resolved = graded_at < today - timedelta(days=14) and rng.random() < 0.8
+                await writer.add("performance_alerts", {
+                    "student_id": student_id,
+                    "parent_id": parent_id,
+                    "alert_type": "low_score",
+                    "severity": "medium" if score >= 40 else "high",
+                    "message": f"Student scored {score:.1f}% on recent assignment. Consider additional support.",
+                    "trigger_data": {"score": score, "submission_id": str(submission_id)},
+                    "is_resolved": resolved,
+                    "resolved_at": graded_at + timedelta(days=rng.randrange(1, 7)) if resolved else None,
+                    "sent_to_ngo": score < 40,
+                    "ngo_notified_at": graded_at if score < 40 else None,
+                    "created_at": graded_at
+                })
+
+            month = graded_at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            bucket = buckets.setdefault(month, {"student_id": student_id, "month": month, "count": 0, "sum": 0.0,
+                                                "min": score, "max": score, "samples": []})
+            bucket["count"] += 1
+            bucket["sum"] += score
+            bucket["min"] = min(bucket["min"], score)
+            bucket["max"] = max(bucket["max"], score)
+            bucket["samples"].append({"score": score, "recorded_at": graded_at, "source_id": str(submission_id)})
+            active_days.add(graded_at.replace(hour=0, minute=0, second=0))
+
+        for bucket in buckets.values():
+            await writer.add("score_buckets", bucket)
+        if active_days:
+            current, longest = _streaks(sorted(active_days), today)
+            await writer.add("user_streaks", {
+                "user_id": parent_id,
+                "student_id": student_id,
+                "streak_type": "assignment_submission",
+                "current_streak": current,
+                "longest_streak": longest,
+                "last_activity_date": max(active_days),
+                "created_at": period_start,
+                "updated_at": max(active_days)
+            })
+    print(f"📝 Generated {submissions} submissions, {len(graded_positions)} of them graded")
+
+    # Pets and XP events, more of them for families whose children are more engaged
+    family_engagement = [0.0] * parents
+    for index in range(students):
+        family_engagement[family[index]] += engagement[index]
+    per_parent = [0] * parents
+    for index in rng.choices(range(parents), weights=family_engagement, k=xp_events):
+        per_parent[index] += 1
+    for index, parent_id in enumerate(parent_ids):
+        pet_id = _object_id(rng, period_start)
+        experience = 0
+        for _ in range(per_parent[index]):
+            activity_type = rng.choices(XP_ACTIVITIES, cum_weights=XP_WEIGHTS)[0]
+            experience += EXP_REWARDS[activity_type]
+            await writer.add("experience_logs", {
+                "user_id": parent_id,
+                "pet_id": str(pet_id),
+                "activity_type": activity_type,
+                "exp_gained": EXP_REWARDS[activity_type],
+                "description": None,
+                "created_at": moment()
+            })
+        last_fed = today - timedelta(hours=rng.expovariate(1 / 30))
+        await writer.add("user_pets", {
+            "_id": pet_id,
+            "user_id": parent_id,
+            "pet_name": "My Learning Buddy",
+            "pet_type": rng.choice(PET_TYPES),
+            "level": _level(experience),
+            "experience_points": experience,
+            "health": rng.randint(60, 100),
+            "happiness": rng.randint(40, 100),
+            "last_fed": last_fed,
+            "created_at": period_start,
+            "updated_at": last_fed
+        })
+    print(f"🐉 Generated {parents} pets and {xp_events} XP events")
+
+    # Volunteers: a few do most of the hours
+    volunteer_activity = [rng.paretovariate(1.5) for _ in range(volunteers)]
+    per_volunteer = [0] * volunteers
+    for index in rng.choices(range(volunteers), weights=volunteer_activity, k=hour_logs):
+        per_volunteer[index] += 1
+    for index in range(volunteers):
+        volunteer_oid = _object_id(rng, period_start)
+        volunteer_id = str(volunteer_oid)
+        earned = pending = 0.0
+        for _ in range(per_volunteer[index]):
+            created_at = moment()
+            hours = rng.choices(HOUR_AMOUNTS, cum_weights=HOUR_AMOUNT_WEIGHTS)[0]
+            verified = created_at < today - timedelta(days=7) or rng.random() < 0.3
+            if verified:
+                earned += hours
+            else:
+                pending += hours
+            await writer.add("volunteer_hours", {
+                "volunteer_id": volunteer_id,
+                "activity_type": rng.choices(VOLUNTEER_ACTIVITIES, cum_weights=VOLUNTEER_ACTIVITY_WEIGHTS)[0],
+                "hours_earned": hours,
+                "description": None,
+                "is_verified": verified,
+                "verified_by": "synthetic_admin" if verified else None,
+                "verified_at": created_at + timedelta(days=rng.randrange(1, 7)) if verified else None,
+                "created_at": created_at
+            })
+        school = rng.choices(school_names, cum_weights=school_weights)[0]
+        await writer.add("volunteers", {
+            "_id": volunteer_oid,
+            "name": f"Volunteer {index}",
+            "username": f"synthetic_volunteer_{index}",
+            "password": SYNTHETIC_PASSWORD,
+            "school": school,
+            "languages": ["Cantonese"] + rng.sample(LANGUAGES[1:], k=rng.choice([0, 1, 1, 2])),
+            "volunteer_hours": earned,
+            "badges": [],
+            "verified": True
+        })
+        await writer.add("users", {"_id": volunteer_id, "full_name": f"Volunteer {index}", "role": "volunteer"})
+        await writer.add("volunteer_hour_ledger", {
+            "_id": volunteer_id,
+            "volunteer_id": volunteer_id,
+            "earned": earned,
+            "pending": pending,
+            "spent": 0.0,
+            "held": 0.0,
+            "available": earned,
+            "rating_total": 0.0,
+            "rating_count": 0,
+            "updated_at": today
+        })
+    print(f"🙋 Generated {volunteers} volunteers and {hour_logs} hour logs")
+
+    await writer.flush()
+    elapsed = time.perf_counter() - started
+    total = sum(writer.counts.values())
+    print(f"⏱️  Wrote {total} documents in {elapsed:.0f}s ({total / elapsed:.0f} documents/s)")
+    return dict(writer.counts)
+
+def _object_id(rng: random.Random, at: datetime) -> ObjectId:
+    """An ObjectId dated `at` whose other bytes come from the seeded generator"""
+    return ObjectId(struct.pack(">I", int(at.timestamp())) + rng.randbytes(8))
+
+def _cumulative(weights: List[float]) -> List[float]:
+    total, cumulative = 0.0, []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+def _school_names(rng: random.Random, count: int) -> List[str]:
+    names = [f"{district} {kind}" for district in DISTRICTS for kind in SCHOOL_KINDS]
+    rng.shuffle(names)
+    return [names[index % len(names)] + (f" {index // len(names) + 1}" if index >= len(names) else "")
+            for index in range(count)]
+
+def _streaks(days: List[datetime], today: datetime) -> tuple:
+    """(current, longest) runs of consecutive days; the current one lapses after a day without activity"""
+    longest = run = 1
+    for previous, day in zip(days, days[1:]):
+        run = run + 1 if day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+    current = run if days[-1] >= today - timedelta(days=1) else 0
+    return current, longest
+
+def _level(experience: int) -> int:
+    # As PetGameDAL._calculate_level
+    for level, threshold in enumerate(LEVEL_THRESHOLDS, start=1):
+        if experience < threshold:
+            return level
+    return 10 + (experience - LEVEL_THRESHOLDS[-1]) // 1000
+
+async def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", action="store_true", help="also generate a dataset at the volumes below")
+    parser.add_argument("--drop", action="store_true", help="drop every collection in the database first")
+    parser.add_argument("--schools", type=int, default=60)
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--parents", type=int, default=70_000)
+    parser.add_argument("--volunteers", type=int, default=10_000)
+    parser.add_argument("--assignments", type=int, default=2_000)
+    parser.add_argument("--submissions", type=int, default=1_000_000)
+    parser.add_argument("--grading-sessions", type=int, default=900_000, help="how many submissions are graded")
+    parser.add_argument("--hour-logs", type=int, default=500_000)
+    parser.add_argument("--xp-events", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=180, help="length of the history")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000, help="documents per insert_many")
+    parser.add_argument("--concurrency", type=int, default=8, help="insert_many batches in flight")
+    args = parser.parse_args(argv)
+
+    # Connect to MongoDB
+    client = AsyncIOMotorClient(MONGODB_URI, tlsAllowInvalidCertificates=True)
+    database = client.get_default_database()
+    
+    print("🔗 Connected to MongoDB")
+
+    if args.drop:
+        for name in await database.list_collection_names():
+            await database.drop_collection(name)
+        print(f"🧹 Dropped the collections in {database.name}")
+    
+    await insert_sample_data(database)
+
+    if args.synthetic:
+        await generate_synthetic_data(
+            database, schools=args.schools, students=args.students, parents=args.parents,
+            volunteers=args.volunteers, assignments=args.assignments, submissions=args.submissions,
+            grading_sessions=args.grading_sessions, hour_logs=args.hour_logs, xp_events=args.xp_events,
+            days=args.days, seed=args.seed, batch_size=args.batch_size, concurrency=args.concurrency
+        )
     
     # Close connection
     client.close()
 
+# Synthetic data vocabularies and distributions
+SYNTHETIC_PASSWORD = "synthetic-password"
+DISTRICTS = ["Central", "Wan Chai", "Eastern", "Southern", "Yau Tsim Mong", "Sham Shui Po", "Kowloon City",
+             "Wong Tai Sin", "Kwun Tong", "Kwai Tsing", "Tsuen Wan", "Tuen Mun", "Yuen Long", "North", "Tai Po",
+             "Sha Tin", "Sai Kung", "Islands"]
+SCHOOL_KINDS = ["Primary School", "Kindergarten", "Catholic Primary School", "Baptist Primary School"]
+SUBJECTS = ["English", "Chinese", "Mathematics", "Science"]
+SUBJECT_WEIGHTS = _cumulative([0.4, 0.25, 0.25, 0.1])
+CRITERIA = ["content_relevance", "vocabulary_usage", "structure", "creativity"]
+LANGUAGES = ["Cantonese", "English", "Mandarin", "Urdu", "Tagalog", "Nepali", "Hindi"]
+LANGUAGE_WEIGHTS = _cumulative([0.72, 0.08, 0.1, 0.03, 0.03, 0.02, 0.02])
+HOURS = list(range(7, 23))
+HOUR_WEIGHTS = _cumulative([1, 1, 1, 1, 1, 2, 2, 2, 3, 6, 8, 9, 9, 8, 5, 2])
+XP_ACTIVITIES = ["daily_login", "assignment_completion", "participation", "streak_bonus", "improvement",
+                 "helping_others", "perfect_score"]
+XP_WEIGHTS = _cumulative([45, 25, 10, 8, 5, 4, 2])
+PET_TYPES = ["dragon", "cat", "dog", "bird", "rabbit"]
+VOLUNTEER_ACTIVITIES = ["tutoring", "reading_buddy", "event_support", "mentoring"]
+VOLUNTEER_ACTIVITY_WEIGHTS = _cumulative([0.45, 0.25, 0.15, 0.15])
+HOUR_AMOUNTS = [1.0, 1.5, 2.0, 3.0, 4.0]
+HOUR_AMOUNT_WEIGHTS = _cumulative([0.3, 0.2, 0.3, 0.12, 0.08])
+WORDS = ["the", "a", "was", "my", "and", "story", "book", "reading", "character", "happy", "school", "friend",
+         "because", "learned", "family", "played", "garden", "favourite", "wrote", "question"]
+
 if __name__ == "__main__":
-    asyncio.run(insert_sample_data())
+    asyncio.run(main())
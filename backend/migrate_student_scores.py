@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Migration script: move the embedded Student.scores arrays into the
+monthly `score_buckets` collection. Safe to re-run.
+"""
+
+import asyncio
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from core.score_history import ScoreHistoryDAL
+from core.indexes import apply_indexes
+
+# Get MongoDB URI from environment or use default
+MONGODB_URI = os.environ.get("MONGODB_URI", "mongodb://localhost:27017/reach_hk")
+
+async def migrate_student_scores():
+    # Connect to MongoDB
+    client = AsyncIOMotorClient(MONGODB_URI, tlsAllowInvalidCertificates=True)
+    database = client.get_default_database()
+
+    print("🔗 Connected to MongoDB")
+
+    score_history_dal = ScoreHistoryDAL(
+        database.get_collection("score_buckets"),
+        database.get_collection("students")
+    )
+    await apply_indexes(score_history_dal)
+    migrated = await score_history_dal.migrate_embedded_scores()
+
+    print(f"\n✅ Migrated the score history of {migrated} students")
+
+    # Close connection
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(migrate_student_scores())
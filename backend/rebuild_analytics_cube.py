@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Backfill script: recompute the analytics cube from every AI grading session.
+Run it while grading is quiet.
+"""
+
+import asyncio
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from core.analytics_cube import AnalyticsCube
+from core.indexes import apply_indexes
+
+# Get MongoDB URI from environment or use default
+MONGODB_URI = os.environ.get("MONGODB_URI", "mongodb://localhost:27017/reach_hk")
+
+async def rebuild_analytics_cube():
+    # Connect to MongoDB
+    client = AsyncIOMotorClient(MONGODB_URI, tlsAllowInvalidCertificates=True)
+    database = client.get_default_database()
+
+    print("🔗 Connected to MongoDB")
+
+    analytics_cube = AnalyticsCube(
+        database.get_collection("analytics_cube"),
+        database.get_collection("ai_grading_sessions"),
+        database.get_collection("submissions"),
+        database.get_collection("students")
+    )
+    await apply_indexes(analytics_cube)
+    counted = await analytics_cube.rebuild()
+
+    print(f"\n✅ Rebuilt the analytics cube from {counted} grading sessions")
+
+    # Close connection
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_analytics_cube())
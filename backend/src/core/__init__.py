@@ -1,4 +1,20 @@
 from .models import *
 
 from .login import LoginDAL
-from .assignment_hub import AssignmentDAL
\ No newline at end of file
+from .assignment_hub import AssignmentDAL
+from .time_auction import TimeAuctionDAL
+from .pet_game import PetGameDAL
+from .ai_grading import AIGradingDAL
+from .family_points import FamilyPointsDAL
+from .score_history import ScoreHistoryDAL
+from .watchlist import WatchlistDAL
+from .reports import ReportExporter, REPORT_FORMATS
+from .analytics_cube import AnalyticsCube
+from .matching import VolunteerMatchingDAL
+from .indexes import apply_indexes, audit_queries
+from .instrumentation import RequestInstrumentation
+from .admission import AdmissionController, AdmissionRejected, ConcurrencyLimiter, MemoryTokenBuckets, MongoTokenBuckets, RateLimit
+from .events import EventBus
+from .push import PushHub, MemoryBroadcast, MongoBroadcast
+from .scheduler import CronSchedule, JobScheduler
+from .gamification import GamificationConsumers
@@ -0,0 +1,157 @@
+# Admission Control: token-bucket rate limits and concurrency caps
+from .indexes import declare_index
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from typing import Dict, List, NamedTuple, Optional
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import asyncio
+import time
+
+class RateLimit(NamedTuple):
+    rate: float  # tokens refilled per second
+    burst: int   # bucket capacity
+
+class AdmissionRejected(Exception):
+    """Raised when a request should be turned away; the API answers 429 with Retry-After"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class MemoryTokenBuckets:
+    """Token buckets for a single worker process.
+
+    A bucket that has refilled is the same as a missing one, so it is
+    dropped; past `max_buckets`, the least recently used ones go too, so
+    rotating keys (e.g. usernames) can't grow the worker's memory.
+    """
+
+    def __init__(self, max_buckets: int = 100_000):
+        self.max_buckets = max_buckets
+        # key -> [tokens, updated_at, full_at], least recently used first
+        self.buckets: Dict[str, List[float]] = OrderedDict()
+
+    async def take(self, key: str, limit: RateLimit, cost: float = 1) -> float:
+        """Take `cost` tokens, returning 0 if admitted or the seconds until enough have refilled"""
+        now = time.monotonic()
+        tokens, updated_at, _ = self.buckets.pop(key, (limit.burst, now, now))
+        tokens = min(limit.burst, tokens + (now - updated_at) * limit.rate)
+        wait = 0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / limit.rate
+        self.buckets[key] = [tokens, now, now + (limit.burst - tokens) / limit.rate]
+        self._evict(now)
+        return wait
+
+    def _evict(self, now: float):
+        while self.buckets:
+            key, (_, _, full_at) = next(iter(self.buckets.items()))
+            if full_at > now and len(self.buckets) <= self.max_buckets:
+                break
+            del self.buckets[key]
+
+
+class MongoTokenBuckets:
+    """Token buckets shared by every worker, one document per bucket.
+
+    Refill and take happen in a single pipeline update, so concurrent
+    requests from different workers can't both spend the last token.
+    """
+
+    INDEXES = [
+        # Idle buckets are full again after burst / rate seconds; drop them a while after that
+        declare_index("buckets_collection", ("expires_at", 1), expireAfterSeconds=0),
+    ]
+
+    def __init__(self, buckets_collection: AsyncIOMotorCollection):
+        self.buckets_collection = buckets_collection
+
+    async def take(self, key: str, limit: RateLimit, cost: float = 1) -> float:
+        """Take `cost` tokens, returning 0 if admitted or the seconds until enough have refilled"""
+        now = datetime.now()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [limit.burst, {"$add": [{"$ifNull": ["$tokens", limit.burst]},
+                                                    {"$multiply": [elapsed, limit.rate]}]}]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated_at": now}},
+            {"$set": {"admitted": {"$gte": ["$tokens", cost]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$admitted", {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                "expires_at": now + timedelta(seconds=limit.burst / limit.rate + 60)
+            }}
+        ]
+        try:
+            bucket = await self._take(key, pipeline)
+        except DuplicateKeyError:
+            # Another worker created the bucket at the same moment
+            bucket = await self._take(key, pipeline)
+        if bucket["admitted"]:
+            return 0
+        return (cost - bucket["tokens"]) / limit.rate
+
+    async def _take(self, key: str, pipeline: List[dict]) -> dict:
+        return await self.buckets_collection.find_one_and_update(
+            {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER,
+            projection={"tokens": 1, "admitted": 1}
+        )
+
+
+class AdmissionController:
+    """Per-user and per-route token buckets in front of expensive endpoints"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+
+    async def admit(self, route: str, user: Optional[str], user_limit: RateLimit = None,
+                    route_limit: RateLimit = None):
+        """Raise AdmissionRejected if the user or the route as a whole is over its rate"""
+        # The user's own bucket first, so one abusive client can't drain the shared one
+        if user_limit and user:
+            wait = await self._take(f"{route}:user:{user}", user_limit)
+            if wait:
+                raise AdmissionRejected(f"Too many {route} requests, slow down", wait)
+        if route_limit:
+            wait = await self._take(f"{route}:all", route_limit)
+            if wait:
+                raise AdmissionRejected(f"{route} is busy, try again shortly", wait)
+
+    async def _take(self, key: str, limit: RateLimit) -> float:
+        try:
+            return await self.buckets.take(key, limit)
+        except PyMongoError as exc:
+            # Rate limiting is best effort: admit rather than fail the request
+            print(f"Rate limit check failed for {key}: {exc}")
+            return 0
+
+
+class ConcurrencyLimiter:
+    """Caps how many calls run at once; callers queue briefly, or are rejected when the queue is full"""
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self._queued = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self._queued >= self.max_queue:
+            raise AdmissionRejected(f"{self.name} is at capacity, try again shortly", self.queue_timeout)
+        self._queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise AdmissionRejected(f"{self.name} is at capacity, try again shortly", self.queue_timeout)
+        finally:
+            self._queued -= 1
+        try:
+            yield
+        finally:
+            self._semaphore.release()
@@ -1,8 +1,13 @@
 # AI Grading System with Gemma
-from .models import AIGradingSession, PerformanceAlert, UserStreak
+from .models import AIGradingSession, PerformanceAlert, UserStreak, db_projection, from_db
+from .events import EventBus, SUBMISSION_GRADED
+from .indexes import declare_index, declare_query
+from .push import PushHub, alerts_topic
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorCollection
-from typing import List, Optional, Dict, Any
+from pymongo import ReturnDocument, UpdateOne
+from typing import List, Optional, Dict, Any, Tuple
+from collections import defaultdict
 import asyncio
 import json
 import time
@@ -10,17 +15,38 @@ from datetime import datetime, timedelta
 import os
 
 class AIGradingDAL:
+    INDEXES = [
+        declare_index("submissions_collection", ("student_id", 1), ("status", 1), ("submitted_at", -1)),
+        declare_index("ai_grading_collection", ("submission_id", 1)),
+        declare_index("alerts_collection", ("parent_id", 1), ("is_resolved", 1), ("created_at", -1)),
+        declare_index("streaks_collection", ("user_id", 1), ("student_id", 1), ("streak_type", 1)),
+        declare_index("streaks_collection", ("student_id", 1)),
+        declare_index("streaks_collection", ("last_activity_date", 1)),
+    ]
+    QUERIES = [
+        declare_query("submissions_collection", {"student_id": "demo", "status": "graded"}, [("submitted_at", -1)]),
+        declare_query("ai_grading_collection", {"submission_id": "demo"}),
+        declare_query("alerts_collection", {"parent_id": "demo", "is_resolved": False}, [("created_at", -1)]),
+        declare_query("streaks_collection", {"user_id": "demo", "student_id": "demo", "streak_type": "assignment_submission"}),
+        declare_query("streaks_collection", {"student_id": "demo"}),
+        declare_query("streaks_collection", {"last_activity_date": {"$lt": datetime(2025, 1, 1)}, "current_streak": {"$gt": 0}}),
+    ]
+
     def __init__(self, 
                  ai_grading_collection: AsyncIOMotorCollection,
                  alerts_collection: AsyncIOMotorCollection,
                  streaks_collection: AsyncIOMotorCollection,
                  submissions_collection: AsyncIOMotorCollection,
-                 students_collection: AsyncIOMotorCollection):
+                 students_collection: AsyncIOMotorCollection,
+                 event_bus: EventBus = None,
+                 push_hub: PushHub = None):
         self.ai_grading_collection = ai_grading_collection
         self.alerts_collection = alerts_collection
         self.streaks_collection = streaks_collection
         self.submissions_collection = submissions_collection
         self.students_collection = students_collection
+        self.event_bus = event_bus
+        self.push_hub = push_hub
 
     async def grade_submission(self, submission_id: str, submission_content: str, assignment_context: dict) -> AIGradingSession:
         """Grade a submission using AI and create personalized feedback"""
@@ -34,6 +60,7 @@ class AIGradingDAL:
         # Create grading session
         grading_session = AIGradingSession(
             submission_id=submission_id,
+            subject=assignment_context.get("subject", "English"),
             model_used="gemma",
             raw_score=grading_result["raw_score"],
             adjusted_score=grading_result["adjusted_score"],
@@ -44,11 +71,20 @@ class AIGradingDAL:
             processing_time_ms=processing_time
         )
         
-        await self.ai_grading_collection.insert_one(grading_session.model_dump())
+        result = await self.ai_grading_collection.insert_one(grading_session.model_dump(exclude={"id"}))
+        grading_session.id = str(result.inserted_id)
         
         # Check if we need to create performance alerts
         await self._check_performance_alerts(submission_id, grading_result["adjusted_score"])
         
+        # XP, streaks and the analytics cube are updated off the request path
+        if self.event_bus:
+            await self.event_bus.publish(SUBMISSION_GRADED, {
+                "submission_id": submission_id,
+                "session_id": grading_session.id,
+                "score": grading_result["adjusted_score"]
+            })
+        
         return grading_session
 
     async def _call_gemma_api(self, content: str, context: dict) -> dict:
@@ -200,7 +236,9 @@ class AIGradingDAL:
             trigger_data=trigger_data
         )
         
-        await self.alerts_collection.insert_one(alert.model_dump())
+        result = await self.alerts_collection.insert_one(alert.model_dump(exclude={"id"}))
+        alert.id = str(result.inserted_id)
+        self._push_alert(alert)
         
         # If severity is high or critical, notify NGO immediately
         if severity in ["high", "critical"]:
@@ -221,9 +259,11 @@ class AIGradingDAL:
         # For now, we'll just log it
         print(f"NGO ALERT: {alert.alert_type} - {alert.message}")
 
-    async def update_streak(self, user_id: str, student_id: str, streak_type: str, successful: bool = True):
-        """Update user's streak"""
-        today = datetime.now().date()
+    async def update_streak(self, user_id: str, student_id: str, streak_type: str,
+                            successful: bool = True) -> Optional[UserStreak]:
+        """Update user's streak, returning it unless nothing changed"""
+        # Dates are stored as midnight datetimes, BSON has no date-only type
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
         # Find existing streak
         streak = await self.streaks_collection.find_one({
@@ -242,8 +282,8 @@ class AIGradingDAL:
                 longest_streak=1 if successful else 0,
                 last_activity_date=today if successful else None
             )
-            await self.streaks_collection.insert_one(new_streak.model_dump())
-            return
+            await self.streaks_collection.insert_one(new_streak.model_dump(exclude={"id"}))
+            return new_streak
 
         # Update existing streak
         streak_obj = UserStreak(**streak)
@@ -254,7 +294,7 @@ class AIGradingDAL:
                 streak_obj.current_streak += 1
             elif streak_obj.last_activity_date == today:
                 # Same day, don't change streak
-                return
+                return None
             else:
                 # Streak broken, start over
                 streak_obj.current_streak = 1
@@ -278,8 +318,68 @@ class AIGradingDAL:
         
         await self.streaks_collection.update_one(
             {"user_id": user_id, "student_id": student_id, "streak_type": streak_type},
-            {"$set": streak_obj.model_dump()}
+            {"$set": streak_obj.model_dump(exclude={"id"})}
         )
+        return streak_obj
+
+    async def record_streak_activity_many(self, activities: List[Tuple[str, str, str, datetime]]) -> List[UserStreak]:
+        """Count many (user_id, student_id, streak_type, active_at) into streaks in one bulk write,
+        returning the streaks they touched.
+
+        A streak only moves forward from its last active day, so replaying an
+        activity, e.g. from a redelivered event, leaves it as it is.
+        """
+        days = defaultdict(set)
+        for user_id, student_id, streak_type, active_at in activities:
+            days[(user_id, student_id, streak_type)].add(active_at.replace(hour=0, minute=0, second=0, microsecond=0))
+        if not days:
+            return []
+
+        now = datetime.now()
+        # Ordered, since a streak's days must apply oldest first
+        await self.streaks_collection.bulk_write([
+            UpdateOne({"user_id": user_id, "student_id": student_id, "streak_type": streak_type},
+                      _streak_update(day, now), upsert=True)
+            for (user_id, student_id, streak_type), key_days in days.items()
+            for day in sorted(key_days)
+        ])
+        cursor = self.streaks_collection.find({"$or": [
+            {"user_id": user_id, "student_id": student_id, "streak_type": streak_type}
+            for user_id, student_id, streak_type in days
+        ]}, projection=db_projection(UserStreak))
+        return [from_db(UserStreak, streak_data) async for streak_data in cursor]
+
+    async def rollover_streaks(self) -> int:
+        """Break streaks with no activity yesterday or today, alerting parents as update_streak does"""
+        yesterday = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        lapsed = {"last_activity_date": {"$lt": yesterday}, "current_streak": {"$gt": 0}}
+        now = datetime.now()
+        alerts = []
+        async for streak_data in self.streaks_collection.find(lapsed, projection={"_id": 1}):
+            # Only the run that breaks a streak alerts on it, and one extended since the scan no longer matches
+            streak_data = await self.streaks_collection.find_one_and_update(
+                {"_id": streak_data["_id"], **lapsed},
+                {"$set": {"current_streak": 0, "updated_at": now}},
+                return_document=ReturnDocument.BEFORE
+            )
+            if streak_data is None:
+                continue
+            streak = UserStreak(**streak_data)
+            alerts.append(PerformanceAlert(
+                student_id=streak.student_id,
+                parent_id=streak.user_id,
+                alert_type="streak_broken",
+                severity="low",
+                message=f"{streak.streak_type.replace('_', ' ').title()} streak of {streak.current_streak} days was broken.",
+                trigger_data={"streak_type": streak.streak_type, "broken_streak": streak.current_streak}
+            ).model_dump(exclude={"id"}))
+        if not alerts:
+            return 0
+        result = await self.alerts_collection.insert_many(alerts, ordered=False)
+        if self.push_hub:
+            for alert_data, alert_id in zip(alerts, result.inserted_ids):
+                self._push_alert(from_db(PerformanceAlert, {**alert_data, "_id": alert_id}))
+        return len(alerts)
 
     async def get_user_alerts(self, user_id: str, unresolved_only: bool = True) -> List[PerformanceAlert]:
         """Get alerts for a user"""
@@ -287,23 +387,27 @@ class AIGradingDAL:
         if unresolved_only:
             query["is_resolved"] = False
         
-        cursor = self.alerts_collection.find(query).sort("created_at", -1)
-        alerts = []
-        async for alert_data in cursor:
-            alerts.append(PerformanceAlert(**alert_data))
-        
-        return alerts
+        cursor = self.alerts_collection.find(query, projection=db_projection(PerformanceAlert)).sort("created_at", -1)
+        return [from_db(PerformanceAlert, alert_data) async for alert_data in cursor]
 
     async def resolve_alert(self, alert_id: str) -> bool:
         """Mark an alert as resolved"""
-        result = await self.alerts_collection.update_one(
+        alert_data = await self.alerts_collection.find_one_and_update(
             {"_id": ObjectId(alert_id)},
             {"$set": {
                 "is_resolved": True,
                 "resolved_at": datetime.now()
-            }}
+            }},
+            projection={"parent_id": 1}
         )
-        return result.modified_count > 0
+        if alert_data and self.push_hub:
+            self.push_hub.publish(alerts_topic(alert_data["parent_id"]), "alert_resolved", {"_id": alert_id}, key=alert_id)
+        return alert_data is not None
+
+    def _push_alert(self, alert: PerformanceAlert):
+        if self.push_hub:
+            self.push_hub.publish(alerts_topic(alert.parent_id), "alert",
+                                  alert.model_dump(mode="json", by_alias=True), key=alert.id)
 
     async def get_student_analytics(self, student_id: str) -> dict:
         """Get comprehensive analytics for a student"""
@@ -338,3 +442,22 @@ class AIGradingDAL:
             "improvement_trend": improvement_trend,
             "total_submissions": len(recent_scores)
         }
+
+
+def _streak_update(day: datetime, now: datetime) -> list:
+    """Pipeline update counting activity on `day` into a streak, creating it if needed"""
+    last = "$last_activity_date"
+    return [
+        {"$set": {
+            "current_streak": {"$switch": {"branches": [
+                {"case": {"$eq": [{"$ifNull": [last, None]}, None]}, "then": 1},
+                # Already counted, or older than the streak's last day
+                {"case": {"$gte": [last, day]}, "then": "$current_streak"},
+                {"case": {"$eq": [last, day - timedelta(days=1)]}, "then": {"$add": ["$current_streak", 1]}},
+            ], "default": 1}},
+            "last_activity_date": {"$max": [{"$ifNull": [last, day]}, day]},
+            "created_at": {"$ifNull": ["$created_at", now]},
+            "updated_at": now
+        }},
+        {"$set": {"longest_streak": {"$max": [{"$ifNull": ["$longest_streak", 0]}, "$current_streak"]}}}
+    ]
@@ -0,0 +1,200 @@
+# Analytics Cube: grading scores pre-aggregated by school, week, subject and criterion
+from .models import CubeCell
+from .leaderboard import period_start
+from .events import EventBus, SUBMISSION_GRADED
+from .indexes import declare_index, declare_query
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from typing import Dict, List, Optional
+from collections import defaultdict
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+OVERALL = "overall"
+UNKNOWN_SCHOOL = "unknown"
+# A claim older than this is taken over; matches the event bus lease
+CLAIM_TIMEOUT_SECONDS = 60
+
+class AnalyticsCube:
+    INDEXES = [
+        declare_index("cube_collection", ("school", 1), ("week", 1), ("subject", 1), ("criterion", 1), unique=True),
+        declare_index("cube_collection", ("criterion", 1), ("week", 1)),
+        declare_index("ai_grading_collection", ("cube_batch", 1)),
+    ]
+    QUERIES = [
+        declare_query("cube_collection", {"criterion": "overall", "week": {"$gte": datetime(2025, 1, 1)}}),
+        declare_query("cube_collection", {"school": "demo", "week": {"$gte": datetime(2025, 1, 1)}}),
+        declare_query("ai_grading_collection", {"cube_batch": "demo"}),
+    ]
+
+    def __init__(self,
+                 cube_collection: AsyncIOMotorCollection,
+                 ai_grading_collection: AsyncIOMotorCollection,
+                 submissions_collection: AsyncIOMotorCollection,
+                 student_collection: AsyncIOMotorCollection):
+        self.cube_collection = cube_collection
+        self.ai_grading_collection = ai_grading_collection
+        self.submissions_collection = submissions_collection
+        self.student_collection = student_collection
+
+    # Incremental updates
+    def register(self, event_bus: EventBus):
+        event_bus.subscribe(SUBMISSION_GRADED, self.on_submission_graded)
+
+    async def on_submission_graded(self, events: List[dict]):
+        await self.add_sessions([event["session_id"] for event in events if event.get("session_id")])
+
+    async def add_sessions(self, session_ids: List[str]) -> int:
+        """Count grading sessions into the cube, skipping any already counted"""
+        if not session_ids:
+            return 0
+        # Claim the sessions first so redelivered events can't count them twice; a claim
+        # still unapplied after the timeout belonged to a delivery that died, and is taken over
+        object_ids = [ObjectId(sid) for sid in session_ids]
+        batch = str(uuid4())
+        now = datetime.now()
+        await self.ai_grading_collection.update_many(
+            {"_id": {"$in": object_ids}, "$or": [
+                {"cube_batch": None},
+                {"cube_applied": False, "cube_claimed_at": {"$lt": now - timedelta(seconds=CLAIM_TIMEOUT_SECONDS)}}
+            ]},
+            {"$set": {"cube_batch": batch, "cube_applied": False, "cube_claimed_at": now}}
+        )
+        sessions = await self.ai_grading_collection.find(
+            {"cube_batch": batch},
+            projection={"submission_id": 1, "subject": 1, "adjusted_score": 1, "grading_criteria": 1, "created_at": 1}
+        ).to_list(length=len(session_ids))
+        try:
+            counted = await self._apply(sessions)
+        except Exception:
+            # Release the claim so the retried event can count these sessions straight away
+            await self.ai_grading_collection.update_many({"cube_batch": batch}, {"$set": {"cube_batch": None}})
+            raise
+        if sessions:
+            await self.ai_grading_collection.update_many({"cube_batch": batch}, {"$set": {"cube_applied": True}})
+
+        # Fail, so the event is retried, while another delivery still holds some of the sessions
+        claimed_elsewhere = await self.ai_grading_collection.count_documents(
+            {"_id": {"$in": object_ids}, "cube_applied": False}
+        )
+        if claimed_elsewhere:
+            raise RuntimeError(f"{claimed_elsewhere} grading sessions are still being counted by another delivery")
+        return counted
+
+    async def _apply(self, sessions: List[dict]) -> int:
+        """$inc the cells touched by a batch of sessions, one upsert per cell"""
+        if not sessions:
+            return 0
+        schools = await self._schools([session["submission_id"] for session in sessions])
+        cells = defaultdict(lambda: [0, 0.0])
+        for session in sessions:
+            key = (
+                schools.get(session["submission_id"], UNKNOWN_SCHOOL),
+                period_start("this_week", session["created_at"]),
+                session.get("subject") or "English",
+            )
+            scores = {**session.get("grading_criteria", {}), OVERALL: session["adjusted_score"]}
+            for criterion, score in scores.items():
+                cell = cells[key + (criterion,)]
+                cell[0] += 1
+                cell[1] += score
+
+        await self.cube_collection.bulk_write([
+            UpdateOne(
+                {"school": school, "week": week, "subject": subject, "criterion": criterion},
+                {"$inc": {"count": count, "sum": total}},
+                upsert=True
+            )
+            for (school, week, subject, criterion), (count, total) in cells.items()
+        ], ordered=False)
+        return len(sessions)
+
+    async def _schools(self, submission_ids: List[str]) -> Dict[str, str]:
+        """Resolve submission -> school through the submitting student"""
+        student_ids = {}
+        cursor = self.submissions_collection.find(
+            {"_id": {"$in": [ObjectId(sid) for sid in set(submission_ids)]}}, projection={"student_id": 1}
+        )
+        async for submission in cursor:
+            student_ids[str(submission["_id"])] = submission["student_id"]
+
+        schools_by_student = {}
+        object_ids = [ObjectId(sid) for sid in set(student_ids.values()) if ObjectId.is_valid(sid)]
+        async for student in self.student_collection.find({"_id": {"$in": object_ids}}, projection={"school": 1}):
+            schools_by_student[str(student["_id"])] = student.get("school")
+
+        return {
+            submission_id: schools_by_student[student_id]
+            for submission_id, student_id in student_ids.items()
+            if schools_by_student.get(student_id)
+        }
+
+    async def rebuild(self, batch_size: int = 1000) -> int:
+        """Recompute the cube from every grading session (backfill).
+
+        Sessions graded while the rebuild runs are counted by the normal
+        incremental path; run it when grading is quiet, since a session counted
+        between the claim and the reset below would be dropped.
+        """
+        rebuild_batch = f"rebuild:{uuid4()}"
+        await self.ai_grading_collection.update_many(
+            {}, {"$set": {"cube_batch": rebuild_batch, "cube_applied": True}}
+        )
+        await self.cube_collection.delete_many({})
+
+        counted = 0
+        batch = []
+        cursor = self.ai_grading_collection.find(
+            {"cube_batch": rebuild_batch},
+            projection={"submission_id": 1, "subject": 1, "adjusted_score": 1, "grading_criteria": 1, "created_at": 1},
+            batch_size=batch_size
+        )
+        async for session in cursor:
+            batch.append(session)
+            if len(batch) >= batch_size:
+                counted += await self._apply(batch)
+                batch = []
+        counted += await self._apply(batch)
+        return counted
+
+    # Queries
+    async def get_subject_comparison(self, start: datetime = None, end: datetime = None,
+                                     school: str = None) -> Dict[str, Dict[str, float]]:
+        """Average score per subject and criterion"""
+        totals = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        async for cell in self._cells(start, end, school=school):
+            total = totals[cell.subject][cell.criterion]
+            total[0] += cell.count
+            total[1] += cell.sum
+        return {
+            subject: {criterion: total / count for criterion, (count, total) in criteria.items() if count}
+            for subject, criteria in totals.items()
+        }
+
+    async def get_regional_trends(self, start: datetime = None, end: datetime = None,
+                                  subject: str = None, criterion: str = OVERALL) -> Dict[str, List[dict]]:
+        """Weekly average per school for one criterion"""
+        totals = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        async for cell in self._cells(start, end, subject=subject, criterion=criterion):
+            total = totals[cell.school][cell.week]
+            total[0] += cell.count
+            total[1] += cell.sum
+        return {
+            school: [
+                {"week": week, "average": total / count, "count": count}
+                for week, (count, total) in sorted(weeks.items())
+            ]
+            for school, weeks in totals.items()
+        }
+
+    async def _cells(self, start: Optional[datetime], end: Optional[datetime], **filters):
+        query = {field: value for field, value in filters.items() if value is not None}
+        if start or end:
+            query["week"] = {}
+            if start:
+                query["week"]["$gte"] = period_start("this_week", start)
+            if end:
+                query["week"]["$lt"] = end
+        async for cell in self.cube_collection.find(query, projection={"_id": 0}):
+            yield CubeCell(**cell)
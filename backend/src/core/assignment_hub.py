@@ -2,7 +2,10 @@
 from .models import Assignment, AssignmentSubmission, AssignmentFeedback, AssignmentDiscussion
 from bson import ObjectId
 from pymongo import ReturnDocument
+from datetime import timedelta
+import asyncio
 import os
+import time
 from uuid import uuid4
 import shutil
 
@@ -45,3 +48,24 @@ class AssignmentDAL:
     async def delete_assignment(self, assignment_id: str) -> bool:
         result = await self.assignment_collection.delete_one({"_id": ObjectId(assignment_id)})
         return result.deleted_count > 0
+
+    async def cleanup_stale_uploads(self, max_age: timedelta = timedelta(hours=24)) -> int:
+        """Delete uploaded files no assignment refers to, e.g. left by failed inserts or deleted assignments"""
+        referenced = set(await self.assignment_collection.distinct("path"))
+        # Younger files may belong to an upload whose insert hasn't landed yet
+        cutoff = time.time() - max_age.total_seconds()
+        return await asyncio.to_thread(self._remove_unreferenced, referenced, cutoff)
+
+    def _remove_unreferenced(self, referenced: set, cutoff: float) -> int:
+        removed = 0
+        with os.scandir(self.upload_dir) as entries:
+            for entry in entries:
+                path = os.path.join(self.upload_dir, entry.name)
+                if not entry.is_file() or path in referenced or entry.stat().st_mtime > cutoff:
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
@@ -0,0 +1,64 @@
+# Buffered, batched inserts for append-only logs
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError
+from typing import Callable, List, Optional
+import asyncio
+
+
+class BufferedWriter:
+    """Collects documents in memory and writes them with insert_many.
+
+    Used for append-only logs that don't need to be on the request path.
+    A batch is flushed when it reaches `max_batch` documents or every
+    `flush_interval` seconds, whichever comes first.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, max_batch: int = 500, flush_interval: float = 1.0):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._buffer: List[dict] = []
+        self._task: Optional[asyncio.Task] = None
+        self._flushes: set = set()
+
+    def write(self, document: dict):
+        self._buffer.append(document)
+        if len(self._buffer) >= self.max_batch:
+            # Keep a reference so the flush task isn't garbage collected
+            task = asyncio.create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    def pending(self, predicate: Callable[[dict], bool]) -> List[dict]:
+        """Documents written but not flushed yet that match `predicate`"""
+        return [document for document in self._buffer if predicate(document)]
+
+    async def flush(self):
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+        except BulkWriteError as exc:
+            # Retry failed documents, except ones already written by an earlier attempt
+            failed = [batch[error["index"]] for error in exc.details["writeErrors"] if error["code"] != 11000]
+            self._buffer = failed + self._buffer
+        except Exception as exc:
+            print(f"Buffered write to {self.collection.name} failed, retrying later: {exc}")
+            self._buffer = batch + self._buffer
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
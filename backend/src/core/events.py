@@ -0,0 +1,154 @@
+# In-process Gamification Event Bus
+from .models import OutboxEvent
+from .indexes import declare_index, declare_query
+from motor.motor_asyncio import AsyncIOMotorCollection
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from collections import defaultdict
+from datetime import datetime, timedelta
+from uuid import uuid4
+import asyncio
+
+# Event types
+SUBMISSION_GRADED = "submission_graded"
+STREAK_EXTENDED = "streak_extended"
+HOURS_VERIFIED = "hours_verified"
+
+Handler = Callable[[List[dict]], Awaitable[None]]
+
+
+class EventBus:
+    """Publishes events to an outbox collection and dispatches them in batches.
+
+    Publishing is a single insert, so it can happen on the request path (or
+    inside the caller's transaction). A background dispatcher claims pending
+    events with a lease, hands each handler all events of its type at once,
+    and marks them done. Delivery is at-least-once: events whose handler
+    fails, or whose worker dies mid-batch, are retried, so handlers must be
+    idempotent.
+    """
+
+    INDEXES = [
+        declare_index("outbox_collection", ("status", 1), ("available_at", 1)),
+        declare_index("outbox_collection", ("claim_token", 1)),
+        # Keep processed events for a week for auditing
+        declare_index("outbox_collection", ("processed_at", 1),
+                      expireAfterSeconds=7 * 24 * 3600, partialFilterExpression={"status": "done"}),
+    ]
+    QUERIES = [
+        declare_query("outbox_collection", {"status": "pending", "available_at": {"$lte": datetime(2025, 1, 1)}},
+                      [("available_at", 1)]),
+        declare_query("outbox_collection", {"claim_token": "demo"}),
+    ]
+
+    def __init__(self,
+                 outbox_collection: AsyncIOMotorCollection,
+                 batch_size: int = 200,
+                 poll_interval: float = 1.0,
+                 lease_seconds: int = 60,
+                 max_attempts: int = 5):
+        self.outbox_collection = outbox_collection
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, event_type: str, handler: Handler):
+        """Register a batch handler: it receives the payloads of a batch of events"""
+        self.handlers[event_type].append(handler)
+
+    # Publishing
+    async def publish(self, event_type: str, payload: dict, session=None) -> str:
+        event = OutboxEvent(event_type=event_type, payload=payload)
+        result = await self.outbox_collection.insert_one(event.model_dump(exclude={"id"}), session=session)
+        self._wakeup.set()
+        return str(result.inserted_id)
+
+    async def publish_many(self, events: List[Tuple[str, dict]], session=None):
+        if not events:
+            return
+        documents = [
+            OutboxEvent(event_type=event_type, payload=payload).model_dump(exclude={"id"})
+            for event_type, payload in events
+        ]
+        await self.outbox_collection.insert_many(documents, ordered=False, session=session)
+        self._wakeup.set()
+
+    # Dispatching
+    async def dispatch_once(self) -> int:
+        """Claim and process one batch of events, returning its size"""
+        now = datetime.now()
+        claimable = {"$or": [
+            {"status": "pending", "available_at": {"$lte": now}},
+            # Events of a worker that died mid-batch
+            {"status": "processing", "claimed_at": {"$lt": now - timedelta(seconds=self.lease_seconds)}}
+        ]}
+        candidates = await self.outbox_collection.find(claimable, projection={"_id": 1}) \
+            .sort("available_at", 1).limit(self.batch_size).to_list(length=self.batch_size)
+        if not candidates:
+            return 0
+
+        # Another worker may claim some of the same events; the token tells us which we got
+        claim_token = str(uuid4())
+        await self.outbox_collection.update_many(
+            {"_id": {"$in": [event["_id"] for event in candidates]}, **claimable},
+            {"$set": {"status": "processing", "claim_token": claim_token, "claimed_at": now}}
+        )
+        events = await self.outbox_collection.find({"claim_token": claim_token}).to_list(length=None)
+
+        by_type = defaultdict(list)
+        for event in events:
+            by_type[event["event_type"]].append(event)
+
+        for event_type, batch in by_type.items():
+            try:
+                for handler in self.handlers.get(event_type, []):
+                    await handler([event["payload"] for event in batch])
+            except Exception as exc:
+                print(f"Event handler for {event_type} failed: {exc}")
+                await self._retry(batch)
+            else:
+                await self.outbox_collection.update_many(
+                    {"_id": {"$in": [event["_id"] for event in batch]}},
+                    {"$set": {"status": "done", "processed_at": datetime.now()}}
+                )
+        return len(events)
+
+    async def _retry(self, batch: List[dict]):
+        """Put failed events back with exponential backoff, giving up after max_attempts"""
+        now = datetime.now()
+        for event in batch:
+            attempts = event["attempts"] + 1
+            await self.outbox_collection.update_one(
+                {"_id": event["_id"]},
+                {"$set": {
+                    "status": "failed" if attempts >= self.max_attempts else "pending",
+                    "attempts": attempts,
+                    "available_at": now + timedelta(seconds=2 ** attempts),
+                    "claim_token": None
+                }}
+            )
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                # Drain full batches before waiting again
+                while await self.dispatch_once() == self.batch_size:
+                    pass
+            except Exception as exc:
+                print(f"Event dispatch failed: {exc}")
@@ -0,0 +1,180 @@
+# Family Points Leaderboard
+from .models import FamilyPointsEntry
+from .leaderboard import LeaderboardEngine
+from .push import PushHub, school_leaderboard_topic
+from .indexes import declare_index, declare_query
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import datetime
+
+# Points awarded to a family per activity
+POINT_REWARDS = {
+    "assignment_completion": 10,
+    "perfect_score": 5,
+    "streak_bonus": 3,
+}
+
+class FamilyPointsDAL:
+    INDEXES = [
+        # An award for the same (family, source, reference) is only counted once
+        declare_index("points_collection", ("student_id", 1), ("source", 1), ("reference_id", 1),
+                      unique=True, partialFilterExpression={"reference_id": {"$type": "string"}}),
+        declare_index("points_collection", ("created_at", 1)),
+    ]
+    QUERIES = [
+        declare_query("points_collection", {"created_at": {"$gte": datetime(2025, 1, 1)}}),
+    ]
+
+    def __init__(self,
+                 points_collection: AsyncIOMotorCollection,
+                 leaderboard_collection: AsyncIOMotorCollection,
+                 student_collection: AsyncIOMotorCollection,
+                 push_hub: PushHub = None):
+        self.points_collection = points_collection
+        self.student_collection = student_collection
+        self.push_hub = push_hub
+        self.leaderboard = LeaderboardEngine(
+            leaderboard_collection, "family_points", rebuild_source=self._leaderboard_rows
+        )
+        if push_hub:
+            self.leaderboard.on_flush(self._push_standings)
+        # student_id -> {"school", "student_name", "guardian_name"}
+        self._families: Dict[str, Optional[dict]] = {}
+
+    # Awarding points
+    async def award_points(self, student_id: str, source: str, points: int = None,
+                           reference_id: str = None) -> bool:
+        """Award points to a family, returning False if it was already awarded"""
+        return await self.award_points_many([(student_id, source, points, reference_id)]) == 1
+
+    async def award_points_many(self, awards: List[Tuple[str, str, Optional[int], Optional[str]]]) -> int:
+        """Award many (student_id, source, points, reference_id) in one insert"""
+        families = await self._get_families(list({student_id for student_id, _, _, _ in awards}))
+        entries = []
+        for student_id, source, points, reference_id in awards:
+            family = families.get(student_id)
+            if not family:
+                continue
+            entries.append(FamilyPointsEntry(
+                student_id=student_id,
+                school=family["school"],
+                points=points if points is not None else POINT_REWARDS.get(source, 0),
+                source=source,
+                reference_id=reference_id
+            ))
+        if not entries:
+            return 0
+
+        documents = [entry.model_dump() for entry in entries]
+        duplicates = []
+        try:
+            await self.points_collection.insert_many(documents, ordered=False)
+        except BulkWriteError as exc:
+            # Redelivered awards hit the unique index; anything else is a real failure
+            errors = exc.details["writeErrors"]
+            if any(error["code"] != 11000 for error in errors):
+                raise
+            duplicates = [documents[error["index"]] for error in errors]
+            failed = {error["index"] for error in errors}
+            documents = [document for index, document in enumerate(documents) if index not in failed]
+
+        if duplicates:
+            # A duplicate whose entry was stored but never counted was cut off before the standings write
+            documents += await self.points_collection.find({"applied": False, "$or": [
+                {"student_id": document["student_id"], "source": document["source"],
+                 "reference_id": document["reference_id"]}
+                for document in duplicates
+            ]}).to_list(None)
+        if not documents:
+            return 0
+
+        # Persist the standings before the award is acked; a buffered increment would be lost with the worker
+        await self.leaderboard.record_now([
+            (document["student_id"], document["points"], document["created_at"], document["school"])
+            for document in documents
+        ])
+        await self.points_collection.update_many(
+            {"_id": {"$in": [document["_id"] for document in documents]}}, {"$set": {"applied": True}}
+        )
+        return len(documents)
+
+    # Leaderboard
+    async def get_school_leaderboard(self, school: str, period: str = "all_time", limit: int = 10) -> List[dict]:
+        """Get a school's family leaderboard from the in-memory standings"""
+        rows = self.leaderboard.top(limit, period, partition=school)
+        families = await self._get_families([row["member_id"] for row in rows])
+        return [self._leaderboard_entry(row, families) for row in rows]
+
+    async def get_family_rank(self, student_id: str, period: str = "all_time") -> Optional[dict]:
+        """Get a family's position on their school's leaderboard"""
+        families = await self._get_families([student_id])
+        family = families.get(student_id)
+        if not family:
+            return None
+        row = self.leaderboard.rank(student_id, period, partition=family["school"])
+        if not row:
+            return None
+        return self._leaderboard_entry(row, families)
+
+    async def _push_standings(self, changed: Set[Tuple[str, str]]):
+        """Push the top of each school board that moved"""
+        for school, period in changed:
+            if school:
+                self.push_hub.publish(school_leaderboard_topic(school), "leaderboard",
+                                      await self.get_school_leaderboard(school, period), key=period)
+
+    def _leaderboard_entry(self, row: dict, families: Dict[str, Optional[dict]]) -> dict:
+        family = families.get(row["member_id"]) or {}
+        return {
+            "student_id": row["member_id"],
+            "student_name": family.get("student_name"),
+            "guardian_name": family.get("guardian_name"),
+            "school": family.get("school"),
+            "total_points": int(row["score"]),
+            "award_count": row["count"],
+            "rank": row["rank"]
+        }
+
+    async def _get_families(self, student_ids: List[str]) -> Dict[str, Optional[dict]]:
+        """Resolve school and names, querying only the families not cached yet"""
+        missing = [sid for sid in student_ids if sid not in self._families]
+        if missing:
+            object_ids = []
+            for sid in missing:
+                try:
+                    object_ids.append(ObjectId(sid))
+                except InvalidId:
+                    continue
+            cursor = self.student_collection.find(
+                {"_id": {"$in": object_ids}}, projection={"name": 1, "guardian_name": 1, "school": 1}
+            )
+            async for student in cursor:
+                self._families[str(student["_id"])] = {
+                    "school": student.get("school"),
+                    "student_name": student.get("name"),
+                    "guardian_name": student.get("guardian_name")
+                }
+            for sid in missing:
+                self._families.setdefault(sid, None)
+        return {sid: self._families[sid] for sid in student_ids}
+
+    async def _leaderboard_rows(self, since: Optional[datetime]):
+        """Aggregate points per family and school, used to rebuild the standings"""
+        pipeline = []
+        if since:
+            pipeline.append({"$match": {"created_at": {"$gte": since}}})
+        pipeline.append({"$group": {
+            "_id": {"student_id": "$student_id", "school": "$school"},
+            "total_points": {"$sum": "$points"},
+            "award_count": {"$sum": 1}
+        }})
+        async for row in self.points_collection.aggregate(pipeline):
+            yield {
+                "member_id": row["_id"]["student_id"],
+                "partition": row["_id"]["school"],
+                "score": row["total_points"],
+                "count": row["award_count"]
+            }
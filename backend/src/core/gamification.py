@@ -0,0 +1,108 @@
+# Gamification consumers: XP, streaks and badges applied from the event bus
+from .events import EventBus, SUBMISSION_GRADED, STREAK_EXTENDED, HOURS_VERIFIED
+from .pet_game import PetGameDAL, get_exp_reward
+from .ai_grading import AIGradingDAL
+from .time_auction import TimeAuctionDAL
+from .family_points import FamilyPointsDAL
+from .score_history import ScoreHistoryDAL
+from bson import ObjectId
+from typing import List
+from collections import defaultdict
+from datetime import datetime
+
+PERFECT_SCORE = 100
+SUBMISSION_STREAK = "assignment_submission"
+
+
+class GamificationConsumers:
+    """Batch handlers that turn gamification events into grouped writes"""
+
+    def __init__(self,
+                 event_bus: EventBus,
+                 pet_game_dal: PetGameDAL,
+                 ai_grading_dal: AIGradingDAL,
+                 time_auction_dal: TimeAuctionDAL,
+                 family_points_dal: FamilyPointsDAL,
+                 score_history_dal: ScoreHistoryDAL):
+        self.event_bus = event_bus
+        self.pet_game_dal = pet_game_dal
+        self.ai_grading_dal = ai_grading_dal
+        self.time_auction_dal = time_auction_dal
+        self.family_points_dal = family_points_dal
+        self.score_history_dal = score_history_dal
+
+    def register(self):
+        self.event_bus.subscribe(SUBMISSION_GRADED, self.on_submission_graded)
+        self.event_bus.subscribe(STREAK_EXTENDED, self.on_streak_extended)
+        self.event_bus.subscribe(HOURS_VERIFIED, self.on_hours_verified)
+
+    async def on_submission_graded(self, events: List[dict]):
+        """Record the score, award completion XP and family points, and extend submission streaks"""
+        submission_ids = [ObjectId(event["submission_id"]) for event in events]
+        submissions = {}
+        cursor = self.ai_grading_dal.submissions_collection.find(
+            {"_id": {"$in": submission_ids}}, projection={"student_id": 1, "parent_id": 1, "submitted_at": 1}
+        )
+        async for submission in cursor:
+            submissions[str(submission["_id"])] = submission
+
+        awards = []
+        points = []
+        scores = []
+        activities = []
+        for event in events:
+            submission = submissions.get(event["submission_id"])
+            if not submission:
+                continue
+            parent_id, student_id = submission["parent_id"], submission["student_id"]
+            awards.append((parent_id, "assignment_completion", get_exp_reward("assignment_completion"),
+                           f"Submission {event['submission_id']} graded", event["submission_id"]))
+            points.append((student_id, "assignment_completion", None, event["submission_id"]))
+            scores.append((student_id, event["score"], None, event["submission_id"]))
+            if event["score"] >= PERFECT_SCORE:
+                awards.append((parent_id, "perfect_score", get_exp_reward("perfect_score"), None, event["submission_id"]))
+                points.append((student_id, "perfect_score", None, event["submission_id"]))
+            # Keyed on the submission's own day, so a redelivery on a later day changes nothing
+            activities.append((parent_id, student_id, SUBMISSION_STREAK, submission.get("submitted_at") or datetime.now()))
+
+        await self.pet_game_dal.add_experience_many(awards)
+        await self.family_points_dal.award_points_many(points)
+        await self.score_history_dal.record_scores_many(scores)
+
+        # Published whenever a streak stands extended on a day of this batch; the bonus dedupes by day
+        days = defaultdict(set)
+        for parent_id, student_id, _, submitted_at in activities:
+            days[(parent_id, student_id)].add(submitted_at.date())
+        extended = [
+            (STREAK_EXTENDED, {
+                "user_id": streak.user_id,
+                "student_id": streak.student_id,
+                "streak_type": streak.streak_type,
+                "current_streak": streak.current_streak,
+                "date": streak.last_activity_date.date().isoformat()
+            })
+            for streak in await self.ai_grading_dal.record_streak_activity_many(activities)
+            if streak.current_streak > 1 and streak.last_activity_date.date() in days[(streak.user_id, streak.student_id)]
+        ]
+        await self.event_bus.publish_many(extended)
+
+    async def on_streak_extended(self, events: List[dict]):
+        """Award the streak bonus XP and family points"""
+        # One streak bonus per user, student and day
+        awards = [
+            (event["user_id"], "streak_bonus", get_exp_reward("streak_bonus"),
+             f"{event['current_streak']} day {event['streak_type'].replace('_', ' ')} streak",
+             f"{event['streak_type']}:{event['student_id']}:{event['date']}")
+            for event in events
+        ]
+        await self.pet_game_dal.add_experience_many(awards)
+        # One streak bonus per family and day
+        points = [
+            (event["student_id"], "streak_bonus", None, f"{event['streak_type']}:{event['date']}")
+            for event in events
+        ]
+        await self.family_points_dal.award_points_many(points)
+
+    async def on_hours_verified(self, events: List[dict]):
+        """Award the badges newly verified hours crossed, in one write for the batch"""
+        await self.time_auction_dal.evaluate_badges_many(events)
@@ -0,0 +1,70 @@
+# Declarative index registry and query-plan audit
+from typing import List, NamedTuple, Optional, Tuple
+
+class IndexSpec(NamedTuple):
+    collection: str  # attribute of the declaring component holding the collection
+    keys: List[Tuple[str, int]]
+    options: dict
+
+class QuerySpec(NamedTuple):
+    collection: str
+    filter: dict
+    sort: Optional[List[Tuple[str, int]]]
+
+def declare_index(collection: str, *keys: Tuple[str, int], **options) -> IndexSpec:
+    """Declare an index, e.g. declare_index("student_collection", ("username", 1), unique=True)"""
+    return IndexSpec(collection, list(keys), options)
+
+def declare_query(collection: str, filter: dict, sort: List[Tuple[str, int]] = None) -> QuerySpec:
+    """Declare a representative query, explained by the index audit"""
+    return QuerySpec(collection, filter, sort)
+
+
+async def apply_indexes(*components) -> int:
+    """Create every index the components declare in INDEXES; safe to run on every startup"""
+    created = set()
+    for component in components:
+        for spec in getattr(component, "INDEXES", []):
+            collection = getattr(component, spec.collection)
+            # Components sharing a collection may declare the same index
+            key = (collection.full_name, tuple(spec.keys), repr(sorted(spec.options.items())))
+            if key in created:
+                continue
+            await collection.create_index(spec.keys, **spec.options)
+            created.add(key)
+    return len(created)
+
+async def audit_queries(*components) -> List[dict]:
+    """Explain each component's QUERIES and report the plan stages used"""
+    results = []
+    for component in components:
+        for spec in getattr(component, "QUERIES", []):
+            collection = getattr(component, spec.collection)
+            cursor = collection.find(spec.filter)
+            if spec.sort:
+                cursor = cursor.sort(spec.sort)
+            explain = await cursor.explain()
+            stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+            results.append({
+                "component": type(component).__name__,
+                "collection": collection.name,
+                "filter": spec.filter,
+                "sort": spec.sort,
+                "stages": stages,
+                "collection_scan": "COLLSCAN" in stages
+            })
+    return results
+
+def plan_stages(plan: dict) -> List[str]:
+    """Flatten a winning plan into its stage names, outermost first"""
+    stages = []
+    while plan:
+        # Slot-based engine plans nest the classic plan under queryPlan
+        plan = plan.get("queryPlan", plan)
+        stages.append(plan["stage"])
+        if "inputStages" in plan:
+            for child in plan["inputStages"]:
+                stages.extend(plan_stages(child))
+            break
+        plan = plan.get("inputStage")
+    return stages
@@ -0,0 +1,287 @@
+# Per-request Database Instrumentation (PyMongo command monitoring)
+from .indexes import plan_stages
+from pymongo import monitoring
+from typing import Dict, List, NamedTuple, Optional
+from collections import defaultdict, deque
+from contextvars import ContextVar
+import asyncio
+import json
+import threading
+import time
+
+# Commands whose query plan can be explained, and where their filter lives
+EXPLAINABLE = {"find": "filter", "count": "query", "distinct": "query", "findAndModify": "query",
+               "aggregate": "pipeline", "update": "updates", "delete": "deletes"}
+BACKGROUND_ROUTE = "(background)"
+RECENT_LATENCIES = 1000  # per route, for percentiles
+SHAPE_LENGTH = 200
+
+
+class CommandRecord(NamedTuple):
+    command_name: str
+    collection: Optional[str]
+    shape: str  # the filter with values replaced, e.g. {"student_id": 1, "month": {"$gte": 1}}
+    duration_ms: float
+    failed: bool
+
+
+class RequestTrace:
+    """Mongo commands issued while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.commands: List[CommandRecord] = []  # appended from Motor's executor threads
+        self.explain: Dict[tuple, dict] = {}  # plan key -> command to explain
+        self.token = None
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Attributes each command to the request that issued it.
+
+    Motor runs PyMongo on executor threads but copies the caller's context,
+    so the current request's trace is visible here.
+    """
+
+    def __init__(self, instrumentation: "RequestInstrumentation"):
+        self.instrumentation = instrumentation
+        self._inflight: Dict[tuple, tuple] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        trace = _current_trace.get()
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get("collection")  # getMore
+        shape = command_shape(event.command_name, event.command)
+        explain = None
+        if trace and self.instrumentation.wants_plan(collection, event.command_name, shape):
+            explain = (event.database_name, explain_command(event.command_name, event.command))
+        self._inflight[(event.connection_id, event.request_id)] = (trace, collection, shape, explain)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        inflight = self._inflight.pop((event.connection_id, event.request_id), None)
+        if not inflight:
+            return
+        trace, collection, shape, explain = inflight
+        record = CommandRecord(event.command_name, collection, shape, event.duration_micros / 1000, failed)
+        if trace is None:
+            self.instrumentation.record_background(record)
+            return
+        trace.commands.append(record)
+        if explain:
+            trace.explain[(collection, event.command_name, shape)] = explain
+
+
+class RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent_ms = deque(maxlen=RECENT_LATENCIES)
+        self.round_trips = 0
+        self.max_round_trips = 0
+        self.db_ms = 0.0
+        # (command, collection, shape) -> [count, total_ms, max_ms, failures]
+        self.commands: Dict[tuple, List[float]] = defaultdict(lambda: [0, 0.0, 0.0, 0])
+
+    def add_commands(self, commands: List[CommandRecord]):
+        for command in commands:
+            stats = self.commands[(command.command_name, command.collection, command.shape)]
+            stats[0] += 1
+            stats[1] += command.duration_ms
+            stats[2] = max(stats[2], command.duration_ms)
+            stats[3] += command.failed
+            self.db_ms += command.duration_ms
+        self.round_trips += len(commands)
+
+
+class RequestInstrumentation:
+    """Per-route latency and Mongo round-trip aggregates for this worker process.
+
+    Requests slower than `slow_request_ms` or making more than
+    `round_trip_budget` commands are logged. With `explain_plans`, each new
+    query shape is explained once, off the request path, so the aggregates
+    show which index (or collection scan) serves it.
+    """
+
+    def __init__(self, slow_request_ms: float = None, round_trip_budget: int = None, explain_plans: bool = False):
+        self.slow_request_ms = slow_request_ms
+        self.round_trip_budget = round_trip_budget
+        self.explain_plans = explain_plans
+        self.monitor = CommandMonitor(self)
+        self.client = None  # set once connected, for explains
+        self.routes: Dict[str, RouteStats] = defaultdict(RouteStats)
+        self.plans: Dict[tuple, Optional[str]] = {}  # plan key -> summary, None while being explained
+        self._explains = set()
+        self._lock = threading.Lock()
+
+    # Request lifecycle
+    def begin(self) -> RequestTrace:
+        trace = RequestTrace()
+        trace.token = _current_trace.set(trace)
+        return trace
+
+    def finish(self, trace: RequestTrace, route: str, status: int):
+        _current_trace.reset(trace.token)
+        latency_ms = (time.perf_counter() - trace.started) * 1000
+        commands = list(trace.commands)
+        with self._lock:
+            stats = self.routes[route]
+            stats.requests += 1
+            stats.errors += status >= 500
+            stats.total_ms += latency_ms
+            stats.max_ms = max(stats.max_ms, latency_ms)
+            stats.recent_ms.append(latency_ms)
+            stats.max_round_trips = max(stats.max_round_trips, len(commands))
+            stats.add_commands(commands)
+
+        if (self.slow_request_ms and latency_ms > self.slow_request_ms) or \
+                (self.round_trip_budget and len(commands) > self.round_trip_budget):
+            self._log_request(route, status, latency_ms, commands)
+        for key, (database_name, command) in trace.explain.items():
+            if key not in self.plans:
+                self.plans[key] = None
+                # Created after the trace is reset, so the explain itself counts as background work
+                task = asyncio.get_running_loop().create_task(self._explain(key, database_name, command))
+                self._explains.add(task)
+                task.add_done_callback(self._explains.discard)
+
+    def record_background(self, record: CommandRecord):
+        """Commands issued outside a request: event handlers, flushes, refresh jobs"""
+        with self._lock:
+            stats = self.routes[BACKGROUND_ROUTE]
+            stats.add_commands([record])
+
+    # Reporting
+    def route_stats(self, limit: int = 10) -> List[dict]:
+        """Per-route aggregates, chattiest routes first"""
+        with self._lock:
+            rows = [self._route_row(route, stats, limit) for route, stats in self.routes.items()]
+        rows.sort(key=lambda row: row["round_trips"]["mean"] or 0, reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self.routes.clear()
+
+    def _route_row(self, route: str, stats: RouteStats, limit: int) -> dict:
+        recent = sorted(stats.recent_ms)
+        commands = sorted(stats.commands.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return {
+            "route": route,
+            "requests": stats.requests,
+            "errors": stats.errors,
+            "latency_ms": {
+                "mean": _round(stats.total_ms / stats.requests) if stats.requests else None,
+                "p50": _round(recent[len(recent) // 2]) if recent else None,
+                "p95": _round(recent[min(len(recent) - 1, len(recent) * 95 // 100)]) if recent else None,
+                "max": _round(stats.max_ms)
+            },
+            "round_trips": {
+                "total": stats.round_trips,
+                "mean": _round(stats.round_trips / stats.requests) if stats.requests else None,
+                "max": stats.max_round_trips
+            },
+            "db_ms": _round(stats.db_ms),
+            "db_share": _round(stats.db_ms / stats.total_ms) if stats.total_ms else None,
+            "commands": [{
+                "command": command_name,
+                "collection": collection,
+                "shape": shape,
+                "count": count,
+                "total_ms": _round(total_ms),
+                "max_ms": _round(max_ms),
+                "failures": failures,
+                "plan": self.plans.get((collection, command_name, shape))
+            } for (command_name, collection, shape), (count, total_ms, max_ms, failures) in commands]
+        }
+
+    def _log_request(self, route: str, status: int, latency_ms: float, commands: List[CommandRecord]):
+        counts = defaultdict(int)
+        for command in commands:
+            counts[f"{command.command_name} {command.collection}"] += 1
+        chattiest = ", ".join(f"{name} x{count}" for name, count in
+                              sorted(counts.items(), key=lambda item: item[1], reverse=True)[:5])
+        print(f"Slow request {route} ({status}): {latency_ms:.0f} ms, {len(commands)} round trips, "
+              f"{sum(command.duration_ms for command in commands):.0f} ms in Mongo [{chattiest}]")
+
+    # Query plans
+    def wants_plan(self, collection: Optional[str], command_name: str, shape: str) -> bool:
+        return (self.explain_plans and self.client is not None and command_name in EXPLAINABLE
+                and (collection, command_name, shape) not in self.plans)
+
+    async def _explain(self, key: tuple, database_name: str, command: dict):
+        try:
+            explain = await self.client[database_name].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+            self.plans[key] = plan_summary(explain)
+        except Exception as exc:
+            self.plans[key] = f"explain failed: {exc}"
+
+
+def command_shape(command_name: str, command: dict) -> str:
+    """The command's filter with every value replaced, so similar queries group together"""
+    field = EXPLAINABLE.get(command_name)
+    if not field or field not in command:
+        return ""
+    target = command[field]
+    if command_name in ("update", "delete"):
+        target = target[0].get("q", {}) if target else {}
+    elif command_name == "aggregate":
+        target = [_shape(stage) if "$match" in stage else next(iter(stage), "") for stage in target]
+    else:
+        target = _shape(target)
+    if command.get("sort"):
+        target = {"filter": target, "sort": list(command["sort"])}
+    return json.dumps(target, sort_keys=True, default=str)[:SHAPE_LENGTH]
+
+def explain_command(command_name: str, command: dict) -> dict:
+    """The command without session and transaction fields, and with a single update or delete statement"""
+    explain = {key: value for key, value in command.items()
+               if not key.startswith("$") and key not in ("lsid", "txnNumber", "autocommit", "startTransaction",
+                                                          "readConcern", "writeConcern")}
+    if command_name in ("update", "delete"):
+        explain[EXPLAINABLE[command_name]] = explain[EXPLAINABLE[command_name]][:1]
+    return explain
+
+def plan_summary(explain: dict) -> str:
+    """Winning plan stages and the indexes they use, e.g. 'FETCH <- IXSCAN (student_id_1_month_1)'"""
+    planner = explain.get("queryPlanner")
+    if planner is None:
+        # Aggregations that can't push down to the query layer nest the plan in their first stage
+        cursor = (explain.get("stages") or [{}])[0].get("$cursor", {})
+        planner = cursor.get("queryPlanner")
+    if planner is None:
+        return "no query plan"
+    winning_plan = planner["winningPlan"]
+    indexes = _index_names(winning_plan)
+    summary = " <- ".join(plan_stages(winning_plan))
+    return f"{summary} ({', '.join(indexes)})" if indexes else summary
+
+def _index_names(plan: dict) -> List[str]:
+    plan = plan.get("queryPlan", plan)
+    names = [plan["indexName"]] if "indexName" in plan else []
+    for child in plan.get("inputStages", []) + ([plan["inputStage"]] if "inputStage" in plan else []):
+        names.extend(_index_names(child))
+    return names
+
+def _shape(value):
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        shapes = [_shape(item) for item in value if isinstance(item, (dict, list))]
+        return shapes[:1] if shapes else 1
+    return 1
+
+def _round(value: float) -> float:
+    return round(value, 2)
@@ -0,0 +1,278 @@
+# In-memory Leaderboard Engine
+from .indexes import declare_index, declare_query
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime, timedelta
+import asyncio
+
+PERIODS = ("all_time", "this_month", "this_week")
+DEFAULT_PARTITION = "all"
+
+def period_start(period: str, now: datetime = None) -> Optional[datetime]:
+    """Get the start of the window a period covers (None for all_time)"""
+    now = now or datetime.now()
+    if period == "this_month":
+        return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if period == "this_week":
+        start_of_week = now - timedelta(days=now.weekday())
+        return start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
+    return None
+
+
+class Standings:
+    """Sorted standings of one leaderboard window"""
+
+    def __init__(self, window_start: Optional[datetime]):
+        self.window_start = window_start
+        self.scores: Dict[str, List[float]] = {}  # member_id -> [score, count]
+        self._order: List[Tuple[float, str]] = []  # (-score, member_id), ascending
+
+    def add(self, member_id: str, score: float, count: int = 1):
+        entry = self.scores.get(member_id)
+        if entry:
+            del self._order[bisect_left(self._order, (-entry[0], member_id))]
+        else:
+            entry = self.scores[member_id] = [0.0, 0]
+        entry[0] += score
+        entry[1] += count
+        insort(self._order, (-entry[0], member_id))
+
+    def top(self, k: int) -> List[dict]:
+        return [self._row(member_id, position) for position, (_, member_id) in enumerate(self._order[:k])]
+
+    def rank(self, member_id: str) -> Optional[dict]:
+        entry = self.scores.get(member_id)
+        if not entry:
+            return None
+        return self._row(member_id, bisect_left(self._order, (-entry[0], member_id)))
+
+    def _row(self, member_id: str, position: int) -> dict:
+        score, count = self.scores[member_id]
+        return {"member_id": member_id, "score": score, "count": count, "rank": position + 1}
+
+    def __len__(self):
+        return len(self._order)
+
+
+class LeaderboardEngine:
+    """Per-partition, per-period standings kept in memory and updated incrementally.
+
+    Increments are buffered and flushed to the standings collection with $inc,
+    after which the in-memory state is reloaded, so several workers converge
+    and a restart doesn't need a full rebuild.
+    """
+
+    INDEXES = [
+        declare_index("standings_collection", ("board", 1), ("period", 1), ("window_start", 1),
+                      ("partition", 1), ("member_id", 1), unique=True),
+    ]
+    QUERIES = [
+        declare_query("standings_collection", {"board": "demo", "period": "all_time", "window_start": None}),
+    ]
+
+    def __init__(self,
+                 standings_collection: AsyncIOMotorCollection,
+                 board: str,
+                 rebuild_source: Callable[[Optional[datetime]], AsyncIterator[dict]] = None,
+                 periods: Tuple[str, ...] = PERIODS,
+                 flush_interval: float = 30.0):
+        self.standings_collection = standings_collection
+        self.board = board
+        self.rebuild_source = rebuild_source
+        self.periods = periods
+        self.flush_interval = flush_interval
+        self.boards: Dict[Tuple[str, str], Standings] = {}
+        # (partition, period, window_start, member_id) -> [score, count]
+        self._pending: Dict[tuple, List[float]] = defaultdict(lambda: [0.0, 0])
+        self._listeners: List[Callable[[Set[Tuple[str, str]]], Awaitable]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def on_flush(self, listener: Callable[[Set[Tuple[str, str]]], Awaitable]):
+        """Call `listener` with the (partition, period) standings each flush changed, once reloaded"""
+        self._listeners.append(listener)
+
+    def _standings(self, partition: str, period: str) -> Standings:
+        """Get the current window's standings, rolling over stale windows"""
+        window_start = period_start(period)
+        standings = self.boards.get((partition, period))
+        if standings is None or standings.window_start != window_start:
+            standings = self.boards[(partition, period)] = Standings(window_start)
+        return standings
+
+    # Updates
+    def record(self, member_id: str, score: float, at: datetime = None,
+               partition: str = DEFAULT_PARTITION, count: int = 1):
+        """Add a member's score to every period window containing `at`"""
+        for key in self._windows(member_id, at, partition):
+            self._standings(key[0], key[1]).add(member_id, score, count)
+            pending = self._pending[key]
+            pending[0] += score
+            pending[1] += count
+
+    async def record_now(self, records: List[Tuple[str, float, datetime, str]]):
+        """Add many (member_id, score, at, partition) and persist them before returning"""
+        # For callers that can't ack their source until the standings are stored
+        increments: Dict[tuple, List[float]] = defaultdict(lambda: [0.0, 0])
+        for member_id, score, at, partition in records:
+            for key in self._windows(member_id, at, partition):
+                increments[key][0] += score
+                increments[key][1] += 1
+        if not increments:
+            return
+        await self.standings_collection.bulk_write(self._increment_operations(increments), ordered=False)
+        for (partition, period, _, member_id), (score, count) in increments.items():
+            self._standings(partition, period).add(member_id, score, count)
+        await self._notify({(partition, period) for partition, period, _, _ in increments})
+
+    def _windows(self, member_id: str, at: Optional[datetime], partition: str) -> List[tuple]:
+        """Keys of the current period windows containing `at`"""
+        at = at or datetime.now()
+        keys = []
+        for period in self.periods:
+            window_start = self._standings(partition, period).window_start
+            if window_start is None or at >= window_start:
+                keys.append((partition, period, window_start, member_id))
+        return keys
+
+    # Queries
+    def top(self, k: int = 10, period: str = "all_time", partition: str = DEFAULT_PARTITION) -> List[dict]:
+        return self._standings(partition, period).top(k)
+
+    def rank(self, member_id: str, period: str = "all_time", partition: str = DEFAULT_PARTITION) -> Optional[dict]:
+        return self._standings(partition, period).rank(member_id)
+
+    # Persistence
+    async def flush(self):
+        """Persist buffered increments and reload the merged standings"""
+        pending, self._pending = self._pending, defaultdict(lambda: [0.0, 0])
+        if pending:
+            try:
+                await self.standings_collection.bulk_write(self._increment_operations(pending), ordered=False)
+            except Exception:
+                # Keep the increments for the next flush
+                for key, (score, count) in pending.items():
+                    self._pending[key][0] += score
+                    self._pending[key][1] += count
+                raise
+        await self.load()
+
+        await self._notify({(partition, period) for partition, period, _, _ in pending})
+
+    def _increment_operations(self, increments: Dict[tuple, List[float]]) -> List[UpdateOne]:
+        now = datetime.now()
+        return [
+            UpdateOne(
+                {"board": self.board, "partition": partition, "period": period,
+                 "window_start": window_start, "member_id": member_id},
+                {"$inc": {"score": score, "count": count}, "$set": {"updated_at": now}},
+                upsert=True
+            )
+            for (partition, period, window_start, member_id), (score, count) in increments.items()
+        ]
+
+    async def _notify(self, changed: Set[Tuple[str, str]]):
+        if not changed:
+            return
+        for listener in self._listeners:
+            try:
+                await listener(changed)
+            except Exception as exc:
+                print(f"Leaderboard flush listener failed for {self.board}: {exc}")
+
+    async def prune_windows(self, now: datetime = None) -> int:
+        """Delete persisted standings of windows that have rolled over"""
+        # In memory, stale windows are replaced lazily by _standings
+        now = now or datetime.now()
+        deleted = 0
+        for period in self.periods:
+            window_start = period_start(period, now)
+            if window_start is not None:
+                result = await self.standings_collection.delete_many(
+                    {"board": self.board, "period": period, "window_start": {"$lt": window_start}}
+                )
+                deleted += result.deleted_count
+        return deleted
+
+    async def load(self) -> int:
+        """Load the current windows from the standings collection"""
+        boards: Dict[Tuple[str, str], Standings] = {}
+        windows = {period: period_start(period) for period in self.periods}
+        query = {"board": self.board, "$or": [
+            {"period": period, "window_start": window_start} for period, window_start in windows.items()
+        ]}
+        cursor = self.standings_collection.find(
+            query, projection={"_id": 0, "partition": 1, "period": 1, "member_id": 1, "score": 1, "count": 1}
+        )
+        async for row in cursor:
+            key = (row["partition"], row["period"])
+            if key not in boards:
+                boards[key] = Standings(windows[row["period"]])
+            boards[key].add(row["member_id"], row["score"], row["count"])
+
+        # Increments recorded while the reload was in flight are not persisted yet
+        for (partition, period, window_start, member_id), (score, count) in self._pending.items():
+            if window_start == windows[period]:
+                if (partition, period) not in boards:
+                    boards[(partition, period)] = Standings(window_start)
+                boards[(partition, period)].add(member_id, score, count)
+
+        self.boards = boards
+        return sum(len(standings) for standings in boards.values())
+
+    async def rebuild(self, batch_size: int = 1000) -> int:
+        """Recompute the current windows from the source of truth.
+
+        Rows are written with their absolute totals, not increments, so
+        workers rebuilding at the same time (e.g. all starting on an empty
+        collection) write the same values instead of adding theirs up.
+        """
+        if not self.rebuild_source:
+            return 0
+        # The source already includes anything recorded but not flushed yet
+        self._pending.clear()
+        now = datetime.now()
+        operations = []
+        changed = set()
+        for period in self.periods:
+            window_start = period_start(period)
+            async for row in self.rebuild_source(window_start):
+                partition = row.get("partition", DEFAULT_PARTITION)
+                changed.add((partition, period))
+                operations.append(UpdateOne(
+                    {"board": self.board, "partition": partition, "period": period,
+                     "window_start": window_start, "member_id": row["member_id"]},
+                    {"$set": {"score": row["score"], "count": row["count"], "updated_at": now}},
+                    upsert=True
+                ))
+                if len(operations) >= batch_size:
+                    await self.standings_collection.bulk_write(operations, ordered=False)
+                    operations = []
+        if operations:
+            await self.standings_collection.bulk_write(operations, ordered=False)
+        loaded = await self.load()
+        await self._notify(changed)
+        return loaded
+
+    # Background persistence
+    async def start(self):
+        """Load persisted standings (rebuilding if there are none) and start flushing"""
+        if await self.load() == 0:
+            await self.rebuild()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as exc:
+                print(f"Leaderboard flush failed for {self.board}: {exc}")
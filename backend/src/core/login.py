@@ -1,11 +1,23 @@
 # Functions related to login features
 from .models import Student, Volunteer, Admin
+from .indexes import declare_index, declare_query
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorCollection
 from pymongo import ReturnDocument
 
 
 class LoginDAL:
+    INDEXES = [
+        declare_index("student_collection", ("username", 1)),
+        declare_index("volunteer_collection", ("username", 1)),
+        declare_index("admin_collection", ("username", 1)),
+    ]
+    QUERIES = [
+        declare_query("student_collection", {"username": "demo"}),
+        declare_query("volunteer_collection", {"username": "demo"}),
+        declare_query("admin_collection", {"username": "demo"}),
+    ]
+
     def __init__(self, student_collection: AsyncIOMotorCollection, volunteer_collection: AsyncIOMotorCollection, admin_collection: AsyncIOMotorCollection):
         self.student_collection = student_collection
         self.volunteer_collection = volunteer_collection
@@ -0,0 +1,428 @@
+# Volunteer Matching: suggested families for each volunteer, precomputed from family needs and volunteer profiles
+from .models import FamilyNeeds, FamilySuggestion, VolunteerHourLedger, VolunteerSuggestions, db_projection, from_db
+from .events import EventBus, SUBMISSION_GRADED, HOURS_VERIFIED
+from .indexes import declare_index, declare_query
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReplaceOne, UpdateOne
+from typing import Dict, List, NamedTuple, Optional, Set
+from collections import defaultdict
+from datetime import datetime, timedelta
+from heapq import heappush, heapreplace
+from uuid import uuid4
+import math
+
+class VolunteerProfile(NamedTuple):
+    skills: List[float]     # share of their verified hours helping with each of CRITERIA, summing to 1
+    urgency_weight: float   # 0.5-1: experienced, well rated volunteers lean towards urgent families
+    languages: Set[str]
+
+
+class VolunteerMatchingDAL:
+    """Ranks the families each volunteer could help best, ahead of time.
+
+    A family's needs (weak grading criteria and open alerts) and a
+    volunteer's profile (what they have helped with, how experienced and well
+    rated they are, the languages they speak) are kept as feature vectors,
+    and each volunteer's top families at their school are stored so the
+    dashboard reads them with one lookup. A nightly job recomputes
+    everything; in between, graded submissions update the families concerned
+    and mark the volunteers whose lists they could change as stale, and
+    newly verified hours do the same for that volunteer. A frequent job
+    re-ranks just the stale volunteers.
+    """
+
+    INDEXES = [
+        declare_index("needs_collection", ("school", 1)),
+        declare_index("suggestions_collection", ("school", 1), ("cutoff", 1)),
+        declare_index("suggestions_collection", ("suggestions.student_id", 1)),
+        declare_index("suggestions_collection", ("stale_at", 1)),
+        declare_index("volunteer_collection", ("school", 1)),
+        declare_index("alerts_collection", ("student_id", 1), ("is_resolved", 1)),
+    ]
+    QUERIES = [
+        declare_query("needs_collection", {"school": "demo"}),
+        declare_query("suggestions_collection", {"school": "demo", "cutoff": {"$lt": 0.5}}),
+        declare_query("suggestions_collection", {"suggestions.student_id": {"$in": ["demo"]}}),
+        declare_query("suggestions_collection", {"stale_at": {"$lte": datetime(2025, 1, 1)}}),
+        declare_query("volunteer_collection", {"school": "demo"}),
+        declare_query("alerts_collection", {"student_id": {"$in": ["demo"]}, "is_resolved": False}),
+    ]
+
+    def __init__(self,
+                 needs_collection: AsyncIOMotorCollection,
+                 suggestions_collection: AsyncIOMotorCollection,
+                 student_collection: AsyncIOMotorCollection,
+                 volunteer_collection: AsyncIOMotorCollection,
+                 submissions_collection: AsyncIOMotorCollection,
+                 ai_grading_collection: AsyncIOMotorCollection,
+                 alerts_collection: AsyncIOMotorCollection,
+                 volunteer_hours_collection: AsyncIOMotorCollection,
+                 ledger_collection: AsyncIOMotorCollection,
+                 suggestion_limit: int = 10):
+        self.needs_collection = needs_collection
+        self.suggestions_collection = suggestions_collection
+        self.student_collection = student_collection
+        self.volunteer_collection = volunteer_collection
+        self.submissions_collection = submissions_collection
+        self.ai_grading_collection = ai_grading_collection
+        self.alerts_collection = alerts_collection
+        self.volunteer_hours_collection = volunteer_hours_collection
+        self.ledger_collection = ledger_collection
+        self.suggestion_limit = suggestion_limit
+
+    # Reads
+    async def get_suggestions(self, volunteer_id: str, limit: int = 10) -> List[FamilySuggestion]:
+        """Get a volunteer's suggested families, best match first"""
+        entry = await self.suggestions_collection.find_one(
+            {"_id": volunteer_id}, projection={"_id": 0, "suggestions": {"$slice": limit}}
+        )
+        return [from_db(FamilySuggestion, suggestion) for suggestion in (entry or {}).get("suggestions", [])]
+
+    # Incremental updates
+    def register(self, event_bus: EventBus):
+        event_bus.subscribe(SUBMISSION_GRADED, self.on_submission_graded)
+        event_bus.subscribe(HOURS_VERIFIED, self.on_hours_verified)
+
+    async def on_submission_graded(self, events: List[dict]):
+        submission_ids = [ObjectId(event["submission_id"]) for event in events]
+        student_ids = await self.submissions_collection.distinct("student_id", {"_id": {"$in": submission_ids}})
+        await self.refresh_families(student_ids)
+
+    async def on_hours_verified(self, events: List[dict]):
+        now = datetime.now()
+        volunteer_ids = {event["volunteer_id"] for event in events}
+        await self.suggestions_collection.bulk_write([
+            UpdateOne({"_id": volunteer_id}, {"$set": {"stale_at": now}}, upsert=True)
+            for volunteer_id in volunteer_ids
+        ], ordered=False)
+
+    # Family needs
+    async def refresh_families(self, student_ids: List[str] = None, chunk_size: int = 500,
+                               now: datetime = None) -> int:
+        """Recompute the needs of some students' families (all if None), returning how many have needs.
+
+        A partial refresh also marks stale the volunteers whose suggestions
+        the changes could reorder: those listing one of the families, and
+        those at the family's school whose last suggestion it could now beat.
+        """
+        now = now or datetime.now()
+        run_id = str(uuid4())
+        query = {} if student_ids is None else {
+            "_id": {"$in": [ObjectId(sid) for sid in student_ids if ObjectId.is_valid(sid)]}
+        }
+        needy = 0
+        changed = []  # kept only for a partial refresh, to mark volunteers stale
+        chunk = []
+        cursor = self.student_collection.find(
+            query, projection={"name": 1, "guardian_name": 1, "school": 1, "home_language": 1}
+        )
+        async for student in cursor:
+            chunk.append(student)
+            if len(chunk) >= chunk_size:
+                families = await self._score_chunk(chunk, run_id, now)
+                needy += len(families)
+                changed.extend(families if student_ids is not None else [])
+                chunk = []
+        if chunk:
+            families = await self._score_chunk(chunk, run_id, now)
+            needy += len(families)
+            changed.extend(families if student_ids is not None else [])
+
+        if student_ids is None:
+            # Drop students who no longer exist; a concurrent partial refresh may have written newer rows
+            await self.needs_collection.delete_many({"run_id": {"$ne": run_id}, "updated_at": {"$lt": now}})
+        elif student_ids:
+            await self._mark_stale(student_ids, changed, now)
+        return needy
+
+    async def _score_chunk(self, students: List[dict], run_id: str, now: datetime) -> List[FamilyNeeds]:
+        student_ids = [str(student["_id"]) for student in students]
+        criteria, parents = await self._recent_criteria(student_ids, now - timedelta(days=LOOKBACK_DAYS))
+        severities = defaultdict(list)
+        cursor = self.alerts_collection.find(
+            {"student_id": {"$in": student_ids}, "is_resolved": False},
+            projection={"_id": 0, "student_id": 1, "parent_id": 1, "severity": 1}
+        )
+        async for alert in cursor:
+            severities[alert["student_id"]].append(alert["severity"])
+            parents.setdefault(alert["student_id"], alert["parent_id"])
+
+        # Columns for the chunk, one value per student
+        averages = [
+            {criterion: total / count for criterion, (count, total) in criteria[sid].items()}
+            for sid in student_ids
+        ]
+        needs = score_needs(averages)
+        urgency = score_urgency([severities[sid] for sid in student_ids])
+
+        families = []
+        for index, student in enumerate(students):
+            if not needs[index] and not urgency[index]:
+                continue
+            families.append(FamilyNeeds(
+                student_id=student_ids[index],
+                parent_id=parents.get(student_ids[index]),
+                student_name=student.get("name"),
+                guardian_name=student.get("guardian_name"),
+                school=student.get("school") or UNKNOWN_SCHOOL,
+                language=student.get("home_language"),
+                needs=needs[index],
+                urgency=urgency[index],
+                open_alerts=len(severities[student_ids[index]]),
+                run_id=run_id,
+                updated_at=now
+            ))
+        if families:
+            await self.needs_collection.bulk_write([
+                ReplaceOne({"_id": family.student_id}, family.model_dump(), upsert=True) for family in families
+            ], ordered=False)
+        needy = {family.student_id for family in families}
+        await self.needs_collection.delete_many({"_id": {"$in": [sid for sid in student_ids if sid not in needy]}})
+        return families
+
+    async def _recent_criteria(self, student_ids: List[str], since: datetime) -> tuple:
+        """Per student: criterion -> [count, total] over graded submissions since `since`, and their parent"""
+        submissions = {}
+        parents = {}
+        cursor = self.submissions_collection.find(
+            {"student_id": {"$in": student_ids}, "status": "graded", "submitted_at": {"$gte": since}},
+            projection={"student_id": 1, "parent_id": 1}
+        )
+        async for submission in cursor:
+            submissions[str(submission["_id"])] = submission["student_id"]
+            parents[submission["student_id"]] = submission.get("parent_id")
+
+        criteria = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        cursor = self.ai_grading_collection.find(
+            {"submission_id": {"$in": list(submissions)}},
+            projection={"_id": 0, "submission_id": 1, "grading_criteria": 1}
+        )
+        async for session in cursor:
+            totals = criteria[submissions[session["submission_id"]]]
+            for criterion, score in session.get("grading_criteria", {}).items():
+                total = totals[criterion]
+                total[0] += 1
+                total[1] += score
+        return criteria, parents
+
+    async def _mark_stale(self, student_ids: List[str], families: List[FamilyNeeds], now: datetime):
+        best = {}
+        for family in families:
+            best[family.school] = max(best.get(family.school, 0.0), family_bound(family))
+        conditions = [{"suggestions.student_id": {"$in": student_ids}}]
+        conditions += [{"school": school, "cutoff": {"$lt": bound}} for school, bound in best.items()]
+        await self.suggestions_collection.update_many({"$or": conditions}, {"$set": {"stale_at": now}})
+
+    # Ranking
+    async def refresh(self, now: datetime = None) -> int:
+        """Recompute every family's needs and every volunteer's suggestions, returning how many volunteers were ranked"""
+        now = now or datetime.now()
+        await self.refresh_families(now=now)
+        run_id = str(uuid4())
+        ranked = 0
+        for school in await self.volunteer_collection.distinct("school"):
+            volunteers = await self.volunteer_collection.find(
+                {"school": school}, projection=VOLUNTEER_PROJECTION
+            ).to_list(length=None)
+            ranked += await self._rank(school, volunteers, now, run_id)
+        await self.suggestions_collection.delete_many({"run_id": {"$ne": run_id}, "computed_at": {"$lt": now}})
+        return ranked
+
+    async def refresh_stale(self, now: datetime = None) -> int:
+        """Re-rank the volunteers marked stale, returning how many were ranked"""
+        now = now or datetime.now()
+        stale_ids = await self.suggestions_collection.distinct("_id", {"stale_at": {"$lte": now}})
+        volunteers = await self.volunteer_collection.find(
+            {"_id": {"$in": [ObjectId(vid) for vid in stale_ids if ObjectId.is_valid(vid)]}},
+            projection=VOLUNTEER_PROJECTION
+        ).to_list(length=None)
+        by_school = defaultdict(list)
+        for volunteer in volunteers:
+            by_school[volunteer.get("school") or UNKNOWN_SCHOOL].append(volunteer)
+
+        ranked = 0
+        for school, school_volunteers in by_school.items():
+            ranked += await self._rank(school, school_volunteers, now)
+        # Volunteers that no longer exist
+        found = {str(volunteer["_id"]) for volunteer in volunteers}
+        await self.suggestions_collection.delete_many({"_id": {"$in": [vid for vid in stale_ids if vid not in found]}})
+        return ranked
+
+    async def _rank(self, school: str, volunteers: List[dict], computed_at: datetime, run_id: str = None) -> int:
+        """Rank one school's families for some of its volunteers and store their suggestions"""
+        if not volunteers:
+            return 0
+        families = [
+            from_db(FamilyNeeds, family)
+            async for family in self.needs_collection.find({"school": school}, projection=db_projection(FamilyNeeds))
+        ]
+        profiles = await self._profiles(volunteers)
+        rankings = rank_families(profiles, families, self.suggestion_limit)
+
+        volunteer_ids = [str(volunteer["_id"]) for volunteer in volunteers]
+        operations = []
+        for volunteer_id, profile, ranking in zip(volunteer_ids, profiles, rankings):
+            entry = VolunteerSuggestions(
+                volunteer_id=volunteer_id,
+                school=school,
+                suggestions=[
+                    FamilySuggestion(
+                        student_id=families[index].student_id,
+                        parent_id=families[index].parent_id,
+                        student_name=families[index].student_name,
+                        guardian_name=families[index].guardian_name,
+                        language=families[index].language,
+                        score=round(score, 3),
+                        reasons=match_reasons(profile, families[index])
+                    )
+                    for score, index in ranking
+                ],
+                cutoff=ranking[-1][0] if len(ranking) >= self.suggestion_limit else 0.0,
+                computed_at=computed_at,
+                run_id=run_id
+            )
+            operations.append(UpdateOne(
+                {"_id": entry.volunteer_id}, {"$set": entry.model_dump(exclude={"stale_at"})}, upsert=True
+            ))
+        await self.suggestions_collection.bulk_write(operations, ordered=False)
+        # Changes since this ranking started leave the volunteer stale for the next run
+        await self.suggestions_collection.update_many(
+            {"_id": {"$in": volunteer_ids}, "stale_at": {"$lte": computed_at}},
+            {"$set": {"stale_at": None}}
+        )
+        return len(operations)
+
+    async def _profiles(self, volunteers: List[dict]) -> List[VolunteerProfile]:
+        volunteer_ids = [str(volunteer["_id"]) for volunteer in volunteers]
+        hours = defaultdict(dict)
+        cursor = self.volunteer_hours_collection.aggregate([
+            {"$match": {"volunteer_id": {"$in": volunteer_ids}, "is_verified": True}},
+            {"$group": {
+                "_id": {"volunteer_id": "$volunteer_id", "activity_type": "$activity_type"},
+                "hours": {"$sum": "$hours_earned"}
+            }}
+        ])
+        async for row in cursor:
+            hours[row["_id"]["volunteer_id"]][row["_id"]["activity_type"]] = row["hours"]
+
+        quality = {}
+        cursor = self.ledger_collection.find(
+            {"_id": {"$in": volunteer_ids}}, projection={"rating_total": 1, "rating_count": 1}
+        )
+        async for ledger in cursor:
+            quality[ledger["_id"]] = VolunteerHourLedger(
+                volunteer_id=ledger["_id"], rating_total=ledger.get("rating_total", 0.0),
+                rating_count=ledger.get("rating_count", 0)
+            ).quality_score
+
+        return volunteer_profiles(
+            [hours[vid] for vid in volunteer_ids],
+            [quality.get(vid, DEFAULT_QUALITY) for vid in volunteer_ids],
+            [volunteer.get("languages") or [] for volunteer in volunteers]
+        )
+
+
+def score_needs(averages: List[Dict[str, float]]) -> List[Dict[str, float]]:
+    """Needs per family: how far each criterion's recent average falls below TARGET_SCORE, as 0-1"""
+    return [
+        {criterion: round((TARGET_SCORE - average) / TARGET_SCORE, 3)
+         for criterion, average in family.items() if criterion in CRITERIA and average < TARGET_SCORE}
+        for family in averages
+    ]
+
+def score_urgency(severities: List[List[str]]) -> List[float]:
+    """Urgency per family: its open alerts weighted by severity, capped at 1"""
+    return [round(min(1.0, sum(ALERT_WEIGHTS.get(severity, 0.0) for severity in family)), 2)
+            for family in severities]
+
+def volunteer_profiles(activity_hours: List[Dict[str, float]], quality_scores: List[float],
+                       languages: List[List[str]]) -> List[VolunteerProfile]:
+    """Profiles per volunteer from their verified hours by activity, quality score (1-5) and languages"""
+    profiles = []
+    for hours, quality, spoken in zip(activity_hours, quality_scores, languages):
+        skills = [0.0] * len(CRITERIA)
+        for activity, activity_hours_earned in hours.items():
+            for index, share in enumerate(ACTIVITY_SKILLS.get(activity, GENERAL_SKILLS)):
+                skills[index] += activity_hours_earned * share
+        total = sum(skills)
+        skills = [skill / total for skill in skills] if total > 0 else list(GENERAL_SKILLS)
+        experience = min(1.0, math.log1p(sum(hours.values())) / math.log1p(EXPERIENCED_HOURS))
+        reliability = 0.5 * (min(max(quality, 1.0), 5.0) - 1) / 4 + 0.5 * experience
+        profiles.append(VolunteerProfile(skills, 0.5 + 0.5 * reliability, set(spoken)))
+    return profiles
+
+def rank_families(profiles: List[VolunteerProfile], families: List[FamilyNeeds], limit: int) -> List[List[tuple]]:
+    """Top `limit` (score, family index) per volunteer, best first.
+
+    A family scores the dot product of the volunteer's skills with its needs
+    plus its urgency times the volunteer's urgency weight, scaled by the
+    language match. Families are visited by their best possible score, so a
+    volunteer's scan stops once no remaining family can make their list.
+    """
+    needs = [[family.needs.get(criterion, 0.0) for criterion in CRITERIA] for family in families]
+    urgency = [URGENCY_WEIGHT * family.urgency for family in families]
+    bounds = [family_bound(family) for family in families]
+    order = sorted(range(len(families)), key=lambda index: (-bounds[index], families[index].student_id))
+
+    rankings = []
+    for profile in profiles:
+        best = []  # min-heap of (score, index)
+        for index in order:
+            if len(best) >= limit and bounds[index] <= best[0][0]:
+                break
+            score = language_factor(profile.languages, families[index].language) * (
+                sum(skill * need for skill, need in zip(profile.skills, needs[index]))
+                + profile.urgency_weight * urgency[index]
+            )
+            if score <= 0:
+                continue
+            if len(best) < limit:
+                heappush(best, (score, index))
+            elif score > best[0][0]:
+                heapreplace(best, (score, index))
+        rankings.append(sorted(best, key=lambda match: (-match[0], match[1])))
+    return rankings
+
+def family_bound(family: FamilyNeeds) -> float:
+    """The highest score any volunteer could give a family"""
+    return max(family.needs.values(), default=0.0) + URGENCY_WEIGHT * family.urgency
+
+def language_factor(languages: Set[str], language: Optional[str]) -> float:
+    if not languages or not language:
+        return UNKNOWN_LANGUAGE_FACTOR
+    return 1.0 if language in languages else OTHER_LANGUAGE_FACTOR
+
+def match_reasons(profile: VolunteerProfile, family: FamilyNeeds) -> List[str]:
+    reasons = []
+    fit = {criterion: skill * family.needs.get(criterion, 0.0) for criterion, skill in zip(CRITERIA, profile.skills)}
+    criterion = max(fit, key=fit.get)
+    if family.needs.get(criterion, 0.0) >= WEAK_NEED:
+        reasons.append(f"weak_{criterion}")
+    if family.open_alerts:
+        reasons.append("open_alerts")
+    if family.language and family.language in profile.languages:
+        reasons.append("same_language")
+    return reasons
+
+
+# Features and weights
+CRITERIA = ("content_relevance", "vocabulary_usage", "structure", "creativity")
+TARGET_SCORE = 75        # a criterion averaging below this is a need
+LOOKBACK_DAYS = 56       # window of graded submissions considered
+WEAK_NEED = 0.1          # need worth naming as a reason
+ALERT_WEIGHTS = {"low": 0.1, "medium": 0.3, "high": 0.6, "critical": 1.0}
+URGENCY_WEIGHT = 0.5     # urgency relative to a fully matching skill need
+# How each volunteer activity helps with the grading criteria (shares sum to 1)
+ACTIVITY_SKILLS = {
+    "tutoring": (0.4, 0.2, 0.4, 0.0),
+    "reading_buddy": (0.2, 0.6, 0.0, 0.2),
+    "mentoring": (0.3, 0.0, 0.3, 0.4),
+}
+GENERAL_SKILLS = (0.25, 0.25, 0.25, 0.25)
+EXPERIENCED_HOURS = 100  # verified hours at which experience stops counting
+DEFAULT_QUALITY = 3.0    # as VolunteerHourLedger.quality_score for unrated volunteers
+UNKNOWN_LANGUAGE_FACTOR = 0.8
+OTHER_LANGUAGE_FACTOR = 0.4
+UNKNOWN_SCHOOL = "unknown"
+VOLUNTEER_PROJECTION = {"school": 1, "languages": 1}
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing_extensions import List, Optional, Literal
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing_extensions import Any, Dict, List, Optional, Literal
 from uuid import uuid4
 from datetime import datetime
 
@@ -25,7 +25,7 @@ class Student(BaseModel):
     verification_code: str = "Code" # mocked for demo, else it would be str(uuid4())
     guardian_name: str
     school: str
-    scores: List[float] = []
+    home_language: Optional[str] = None
     badges: List[int] = []
     verified: bool = False
 
@@ -37,6 +37,7 @@ class Volunteer(BaseModel):
     phone_number: Optional[str] = None
     verification_code: str = "Code" # mocked for demo, else it would be str(uuid4())
     school: str
+    languages: List[str] = []
     volunteer_hours: float
     badges: List[str]
     verified: bool = False
@@ -84,4 +85,317 @@ class Comment(BaseModel):
     timestamp: datetime
 
 class Badge(BaseModel):
-    badge_path: str
\ No newline at end of file
+    badge_path: str
+
+# Score history, bucketed per student per month
+class ScoreSample(BaseModel):
+    score: float
+    recorded_at: datetime
+    source_id: Optional[str] = None  # e.g. the graded submission
+
+class ScoreBucket(BaseModel):
+    student_id: str
+    month: datetime  # first day of the month
+    count: int = 0
+    sum: float = 0.0
+    min: Optional[float] = None
+    max: Optional[float] = None
+    samples: List[ScoreSample] = []
+
+    @property
+    def average(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+# Time Auction
+RegistrationStatus = Literal["registered", "confirmed", "completed", "cancelled"]
+AllocationMode = Literal["first_come", "lottery"]
+EntryStatus = Literal["pending", "won", "lost"]
+
+class TimeAuctionExperience(BaseModel):
+    title: str
+    description: str
+    category: str
+    hours_required: float
+    max_participants: int
+    location: Optional[str] = None
+    is_virtual: bool = False
+    experience_date: datetime
+    registration_deadline: Optional[datetime] = None
+    organizer_name: str
+    organizer_credentials: Optional[str] = None
+    image_url: Optional[str] = None
+    is_active: bool = True
+    difficulty_level: Optional[str] = None
+    seats_taken: int = 0  # claimed atomically on registration
+    allocation_mode: AllocationMode = "first_come"
+    allocated_at: Optional[datetime] = None  # set once a lottery has been drawn
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+class VolunteerHourLog(BaseModel):
+    volunteer_id: str
+    activity_type: str
+    hours_earned: float
+    description: Optional[str] = None
+    is_verified: bool = False
+    verified_by: Optional[str] = None
+    verification_notes: Optional[str] = None
+    verified_at: Optional[datetime] = None
+    verification_batch: Optional[str] = None  # set by bulk verification
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class ExperienceRegistration(BaseModel):
+    experience_id: str
+    volunteer_id: str
+    hours_spent: float
+    registration_status: RegistrationStatus = "registered"
+    completion_rating: Optional[int] = None
+    feedback: Optional[str] = None
+    registered_at: datetime = Field(default_factory=datetime.now)
+    completed_at: Optional[datetime] = None
+
+class ExperienceEntry(BaseModel):
+    # Lottery entry, allocated in one batch at the registration deadline
+    experience_id: str
+    volunteer_id: str
+    bid_hours: float
+    entry_status: EntryStatus = "pending"
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class VolunteerBadge(BaseModel):
+    volunteer_id: str
+    badge_type: str
+    badge_level: str
+    hours_requirement: float
+    quality_score: float
+    earned_at: datetime = Field(default_factory=datetime.now)
+
+class VolunteerHourLedger(BaseModel):
+    # Materialized per-volunteer counters, keyed by volunteer_id as _id
+    volunteer_id: str
+    earned: float = 0.0     # verified hours
+    pending: float = 0.0    # logged but not yet verified
+    spent: float = 0.0      # hours spent on completed experiences
+    held: float = 0.0       # hours reserved by open registrations
+    available: float = 0.0  # earned - spent - held
+    rating_total: float = 0.0  # sum of completion ratings
+    rating_count: int = 0
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+    @property
+    def quality_score(self) -> float:
+        if self.rating_count > 0:
+            return self.rating_total / self.rating_count
+        return 3.0  # Default score for new volunteers
+
+# Admin watchlist
+WatchlistKind = Literal["performance", "engagement"]
+
+class WatchlistEntry(BaseModel):
+    # One ranked row per at-risk student, rewritten by each risk-scoring run
+    student_id: str
+    student_name: Optional[str] = None
+    guardian_name: Optional[str] = None
+    school: Optional[str] = None
+    risk_score: float
+    performance_risk: float = 0.0
+    engagement_risk: float = 0.0
+    reasons: List[str] = []
+    average_score: Optional[float] = None
+    score_change: Optional[float] = None  # latest recent score minus earliest
+    days_inactive: Optional[int] = None
+    current_streak: int = 0
+    run_id: str
+    scored_at: datetime = Field(default_factory=datetime.now)
+
+# Analytics cube
+class CubeCell(BaseModel):
+    # Pre-aggregated grading scores for one school, week, subject and criterion
+    school: str
+    week: datetime  # Monday of the week
+    subject: str
+    criterion: str  # a grading criterion, or "overall" for the adjusted score
+    count: int = 0
+    sum: float = 0.0
+
+    @property
+    def average(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+# Reports
+ReportName = Literal["kpi", "volunteer_hours", "experience_redemptions"]
+ReportFormat = Literal["csv", "columnar"]
+
+# Family Points
+class FamilyPointsEntry(BaseModel):
+    # Append-only points ledger; a family is a student together with their guardian
+    student_id: str
+    school: str
+    points: int
+    source: str
+    reference_id: Optional[str] = None  # makes awards for the same source idempotent
+    applied: bool = False  # set once counted into the standings
+    created_at: datetime = Field(default_factory=datetime.now)
+
+# Volunteer matching
+class FamilyNeeds(BaseModel):
+    # Feature vector of a family that could use help, keyed by student_id as _id; families without needs aren't stored
+    student_id: str
+    parent_id: Optional[str] = None
+    student_name: Optional[str] = None
+    guardian_name: Optional[str] = None
+    school: str
+    language: Optional[str] = None
+    needs: Dict[str, float] = {}  # criterion -> shortfall of its recent average below the target, 0-1
+    urgency: float = 0.0          # open alerts weighted by severity, 0-1
+    open_alerts: int = 0
+    run_id: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+class FamilySuggestion(BaseModel):
+    student_id: str
+    parent_id: Optional[str] = None
+    student_name: Optional[str] = None
+    guardian_name: Optional[str] = None
+    language: Optional[str] = None
+    score: float
+    reasons: List[str] = []
+
+class VolunteerSuggestions(BaseModel):
+    # A volunteer's ranked families, keyed by volunteer_id as _id
+    volunteer_id: str
+    school: str
+    suggestions: List[FamilySuggestion] = []
+    cutoff: float = 0.0  # score a family must beat to enter a full list
+    computed_at: datetime
+    stale_at: Optional[datetime] = None  # set when a change may reorder the list
+    run_id: Optional[str] = None
+
+
+class MongoModel(BaseModel):
+    # Exposes the document's _id as a string `id`; inserts should exclude it
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: Optional[str] = Field(default=None, alias="_id")
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def _stringify_id(cls, value):
+        return str(value) if value is not None else None
+
+
+# Fast reads: documents we wrote ourselves don't need validating again
+def db_projection(model: type[BaseModel]) -> dict:
+    """Projection fetching only the stored fields of a model"""
+    projection = {"_id": 0}
+    projection.update({field.alias or name: 1 for name, field in model.model_fields.items()})
+    return projection
+
+def from_db(model: type[BaseModel], document: dict) -> BaseModel:
+    """Build a model from a trusted stored document without validating it"""
+    if "_id" in document:
+        document["_id"] = str(document["_id"])
+    return model.model_construct(**document)
+
+
+# RPG Pet Game
+PetType = Literal["dragon", "cat", "dog", "bird", "rabbit"]
+
+class UserPet(MongoModel):
+    user_id: str
+    pet_name: str = "My Learning Buddy"
+    pet_type: PetType = "dragon"
+    level: int = 1
+    experience_points: int = 0
+    health: int = 100
+    happiness: int = 100
+    last_fed: datetime = Field(default_factory=datetime.now)
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+class ExperienceLog(MongoModel):
+    user_id: str
+    pet_id: Optional[str] = None
+    activity_type: str
+    exp_gained: int
+    description: Optional[str] = None
+    reference_id: Optional[str] = None  # makes awards for the same activity idempotent
+    applied: bool = True  # False while a referenced award's XP is not counted yet
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class PetItem(MongoModel):
+    name: str
+    type: str
+    rarity: str
+    cost_exp: int
+    effect_health: int = 0
+    effect_happiness: int = 0
+    description: Optional[str] = None
+    image_url: Optional[str] = None
+    is_available: bool = True
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class UserPetItem(MongoModel):
+    user_id: str
+    pet_id: Optional[str] = None
+    item_id: str
+    quantity: int = 0
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+# AI Grading & Performance Alerts
+AlertSeverity = Literal["low", "medium", "high", "critical"]
+
+class AIGradingSession(MongoModel):
+    submission_id: str
+    subject: Optional[str] = None
+    model_used: str
+    raw_score: float
+    adjusted_score: float
+    confidence_level: float
+    grading_criteria: Dict[str, float] = {}
+    ai_feedback: str
+    personalized_suggestions: str
+    processing_time_ms: int
+    cube_batch: Optional[str] = None  # set once claimed by the analytics cube
+    cube_applied: bool = False  # set once its scores are counted into the cube
+    cube_claimed_at: Optional[datetime] = None  # when cube_batch was set
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class PerformanceAlert(MongoModel):
+    student_id: str
+    parent_id: str
+    alert_type: str
+    severity: AlertSeverity
+    message: str
+    trigger_data: Dict[str, Any] = {}
+    is_resolved: bool = False
+    resolved_at: Optional[datetime] = None
+    sent_to_ngo: bool = False
+    ngo_notified_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class UserStreak(MongoModel):
+    user_id: str
+    student_id: str
+    streak_type: str
+    current_streak: int = 0
+    longest_streak: int = 0
+    last_activity_date: Optional[datetime] = None  # midnight of the last active day
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+
+# Gamification events
+EventStatus = Literal["pending", "processing", "done", "failed"]
+
+class OutboxEvent(MongoModel):
+    event_type: str
+    payload: Dict[str, Any] = {}
+    status: EventStatus = "pending"
+    attempts: int = 0
+    claim_token: Optional[str] = None
+    claimed_at: Optional[datetime] = None
+    available_at: datetime = Field(default_factory=datetime.now)
+    processed_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.now)
@@ -1,21 +1,56 @@
 # RPG Pet Game System
-from .models import UserPet, ExperienceLog, PetItem, UserPetItem
+from .models import UserPet, ExperienceLog, PetItem, UserPetItem, db_projection, from_db
+from .buffered_writer import BufferedWriter
+from .indexes import declare_index, declare_query
+from .push import PushHub, pet_topic
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorCollection
-from typing import List, Optional
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from typing import List, Optional, Tuple
+from collections import defaultdict
 import asyncio
 from datetime import datetime, timedelta
 
+ILLEGAL_OPERATION = 20  # server error code for transactions on a standalone mongod
+
+class _Rollback(Exception):
+    """Raised inside an inventory operation to undo its earlier steps"""
+
+
 class PetGameDAL:
+    INDEXES = [
+        # add_experience upserts by user_id, so concurrent first awards need this
+        declare_index("pet_collection", ("user_id", 1), unique=True),
+        declare_index("pet_collection", ("last_fed", 1)),
+        declare_index("user_pet_items_collection", ("user_id", 1), ("item_id", 1), unique=True),
+        declare_index("exp_log_collection", ("user_id", 1), ("created_at", -1)),
+        # An award for the same (user, activity, reference) is only counted once
+        declare_index("exp_log_collection", ("user_id", 1), ("activity_type", 1), ("reference_id", 1),
+                      unique=True, partialFilterExpression={"reference_id": {"$type": "string"}}),
+    ]
+    QUERIES = [
+        declare_query("pet_collection", {"user_id": "demo"}),
+        declare_query("user_pet_items_collection", {"user_id": "demo", "quantity": {"$gt": 0}}),
+        declare_query("exp_log_collection", {"user_id": "demo"}, [("created_at", -1)]),
+    ]
+
     def __init__(self, 
                  pet_collection: AsyncIOMotorCollection,
                  exp_log_collection: AsyncIOMotorCollection,
                  pet_items_collection: AsyncIOMotorCollection,
-                 user_pet_items_collection: AsyncIOMotorCollection):
+                 user_pet_items_collection: AsyncIOMotorCollection,
+                 push_hub: PushHub = None):
         self.pet_collection = pet_collection
         self.exp_log_collection = exp_log_collection
         self.pet_items_collection = pet_items_collection
         self.user_pet_items_collection = user_pet_items_collection
+        self.push_hub = push_hub
+        # Write paths return the whole pet only when its new state is pushed
+        self._pet_projection = None if push_hub else {"_id": 1}
+        # Experience logs are written off the request path in batches
+        self.exp_log_writer = BufferedWriter(exp_log_collection)
+        self._transactions_supported = True
 
     async def create_pet(self, user_id: str, pet_name: str = "My Learning Buddy", pet_type: str = "dragon") -> str:
         """Create a new pet for a user"""
@@ -24,172 +59,280 @@ class PetGameDAL:
             pet_name=pet_name,
             pet_type=pet_type
         )
-        result = await self.pet_collection.insert_one(new_pet.model_dump())
+        result = await self.pet_collection.insert_one(new_pet.model_dump(exclude={"id"}))
         return str(result.inserted_id)
 
     async def get_user_pet(self, user_id: str) -> Optional[UserPet]:
-        """Get user's pet"""
+        """Get user's pet, with time-based decay applied at read time"""
         pet_data = await self.pet_collection.find_one({"user_id": user_id})
         if pet_data:
-            return UserPet(**pet_data)
+            pet = UserPet(**pet_data)
+            pet.health, pet.happiness = effective_pet_status(pet, datetime.now())
+            return pet
         return None
 
+    def _experience_update(self, user_id: str, exp_gained: int, now: datetime) -> list:
+        """Pipeline update that creates the pet if needed, adds the XP, recomputes
+        the level server-side and applies the level-up bonus"""
+        defaults = UserPet(user_id=user_id).model_dump(exclude={"id", "user_id"})
+        # Fields in one $set all see the pet before it, so $level is still the old level
+        levelled_up = {"$gt": [level_expression("$experience_points"), "$level"]}
+        # Like feeding, the bonus lands on the decayed happiness and restarts decay
+        decayed_happiness = {"$max": [0, {"$subtract": ["$happiness", happiness_decay_expression(now)]}]}
+        return [
+            {"$set": {field: {"$ifNull": [f"${field}", {"$literal": value}]} for field, value in defaults.items()}},
+            {"$set": {"experience_points": {"$add": ["$experience_points", exp_gained]}}},
+            {"$set": {
+                "level": level_expression("$experience_points"),
+                # Level up bonus - restore health and happiness
+                "health": {"$cond": [levelled_up, {"$min": [100, {"$add": ["$health", 20]}]}, "$health"]},
+                "happiness": {"$cond": [levelled_up, {"$min": [100, {"$add": [decayed_happiness, 20]}]}, "$happiness"]},
+                "last_fed": {"$cond": [levelled_up, {"$literal": now}, "$last_fed"]},
+                "updated_at": {"$literal": now}
+            }}
+        ]
+
     async def add_experience(self, user_id: str, activity_type: str, exp_gained: int, description: str = None) -> bool:
         """Add experience to user's pet and level up if necessary"""
-        pet = await self.get_user_pet(user_id)
-        if not pet:
-            # Create pet if doesn't exist
-            pet_id = await self.create_pet(user_id)
-            pet = await self.get_user_pet(user_id)
+        # One atomic upsert, so concurrent awards can't lose XP
+        pet_data = await self.pet_collection.find_one_and_update(
+            {"user_id": user_id},
+            self._experience_update(user_id, exp_gained, datetime.now()),
+            projection=self._pet_projection,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._push_pet(pet_data)
         
         # Log the experience gain
         exp_log = ExperienceLog(
             user_id=user_id,
-            pet_id=pet.id,
+            pet_id=str(pet_data["_id"]),
             activity_type=activity_type,
             exp_gained=exp_gained,
             description=description
         )
-        await self.exp_log_collection.insert_one(exp_log.model_dump())
+        self.exp_log_writer.write(exp_log.model_dump(exclude={"id"}))
         
-        # Update pet's experience and level
-        new_exp = pet.experience_points + exp_gained
-        new_level = self._calculate_level(new_exp)
-        
-        update_data = {
-            "experience_points": new_exp,
-            "level": new_level,
-            "updated_at": datetime.now()
-        }
+        return True
+
+    async def add_experience_many(self, awards: List[Tuple[str, str, int, Optional[str], Optional[str]]]) -> int:
+        """Apply many (user_id, activity_type, exp_gained, description, reference_id) awards in one bulk write"""
+        # Referenced awards are logged first, so a redelivered one isn't counted twice
+        referenced = await self._log_referenced([award for award in awards if award[4] is not None])
+        totals = defaultdict(int)
+        for user_id, _, exp_gained, _, reference_id in awards:
+            if reference_id is None:
+                totals[user_id] += exp_gained
+        for log_data in referenced:
+            totals[log_data["user_id"]] += log_data["exp_gained"]
+        if not totals:
+            return 0
         
-        # Level up bonus - restore health and happiness
-        if new_level > pet.level:
-            update_data["health"] = min(100, pet.health + 20)
-            update_data["happiness"] = min(100, pet.happiness + 20)
+        # One upsert per user, so a user's level-up bonus applies at most once per batch
+        now = datetime.now()
+        await self.pet_collection.bulk_write([
+            UpdateOne({"user_id": user_id}, self._experience_update(user_id, exp_gained, now), upsert=True)
+            for user_id, exp_gained in totals.items()
+        ], ordered=False)
         
-        result = await self.pet_collection.update_one(
-            {"user_id": user_id},
-            {"$set": update_data}
+        pet_ids = {}
+        cursor = self.pet_collection.find(
+            {"user_id": {"$in": list(totals)}}, projection=None if self.push_hub else {"user_id": 1}
         )
+        async for pet_data in cursor:
+            pet_ids[pet_data["user_id"]] = str(pet_data["_id"])
+            self._push_pet(pet_data)
+        for user_id, activity_type, exp_gained, description, reference_id in awards:
+            if reference_id is not None:
+                continue
+            exp_log = ExperienceLog(
+                user_id=user_id,
+                pet_id=pet_ids.get(user_id),
+                activity_type=activity_type,
+                exp_gained=exp_gained,
+                description=description
+            )
+            self.exp_log_writer.write(exp_log.model_dump(exclude={"id"}))
+        if referenced:
+            await self.exp_log_collection.bulk_write([
+                UpdateOne({"_id": log_data["_id"]},
+                          {"$set": {"applied": True, "pet_id": pet_ids.get(log_data["user_id"])}})
+                for log_data in referenced
+            ], ordered=False)
         
-        return result.modified_count > 0
+        return len(totals)
+
+    async def _log_referenced(self, awards: List[Tuple[str, str, int, Optional[str], str]]) -> List[dict]:
+        """Insert the logs of referenced awards, returning those whose XP is still to be counted"""
+        if not awards:
+            return []
+        logs = [
+            ExperienceLog(
+                user_id=user_id,
+                activity_type=activity_type,
+                exp_gained=exp_gained,
+                description=description,
+                reference_id=reference_id,
+                applied=False
+            ).model_dump(exclude={"id"})
+            for user_id, activity_type, exp_gained, description, reference_id in awards
+        ]
+        failed = set()
+        try:
+            await self.exp_log_collection.insert_many(logs, ordered=False)
+        except BulkWriteError as exc:
+            # Redelivered awards hit the unique index; anything else is a real failure
+            errors = exc.details["writeErrors"]
+            if any(error["code"] != 11000 for error in errors):
+                raise
+            failed = {error["index"] for error in errors}
+
+        pending = [log_data for index, log_data in enumerate(logs) if index not in failed]
+        if failed:
+            # A duplicate whose XP was never counted was cut off before the pet update
+            pending += await self.exp_log_collection.find({"applied": False, "$or": [
+                {"user_id": logs[index]["user_id"], "activity_type": logs[index]["activity_type"],
+                 "reference_id": logs[index]["reference_id"]}
+                for index in failed
+            ]}).to_list(None)
+        return pending
 
     def _calculate_level(self, experience: int) -> int:
         """Calculate level based on experience points"""
         # Level 1: 0-99 exp, Level 2: 100-249 exp, Level 3: 250-499 exp, etc.
-        if experience < 100:
-            return 1
-        elif experience < 250:
-            return 2
-        elif experience < 500:
-            return 3
-        elif experience < 1000:
-            return 4
-        elif experience < 1750:
-            return 5
-        elif experience < 2750:
-            return 6
-        elif experience < 4000:
-            return 7
-        elif experience < 5500:
-            return 8
-        elif experience < 7500:
-            return 9
-        else:
-            return 10 + (experience - 7500) // 1000
+        for level, threshold in enumerate(LEVEL_THRESHOLDS, start=1):
+            if experience < threshold:
+                return level
+        return 10 + (experience - LEVEL_THRESHOLDS[-1]) // 1000
+
+    async def _atomically(self, operation) -> bool:
+        """Run `operation(session, undo)` in a transaction where the deployment supports one.
+
+        On a standalone server the operation runs without a session; if it then
+        raises, the compensating steps it appended to `undo` are applied instead.
+        """
+        undo = []
+        try:
+            if self._transactions_supported:
+                try:
+                    async with await self.pet_collection.database.client.start_session() as session:
+                        return await session.with_transaction(lambda session: operation(session, []))
+                except OperationFailure as exc:
+                    if exc.code != ILLEGAL_OPERATION:
+                        raise
+                    self._transactions_supported = False
+            return await operation(None, undo)
+        except Exception as exc:
+            for step in reversed(undo):
+                await step()
+            if isinstance(exc, _Rollback):
+                return False
+            raise
+
+    async def _get_item(self, item_id: str) -> Optional[PetItem]:
+        item_data = await self.pet_items_collection.find_one({"_id": ObjectId(item_id)})
+        if item_data:
+            return PetItem(**item_data)
+        return None
 
     async def feed_pet(self, user_id: str, item_id: str) -> bool:
         """Feed pet with an item"""
-        pet = await self.get_user_pet(user_id)
-        if not pet:
+        item = await self._get_item(item_id)
+        if not item:
             return False
         
-        # Check if user has the item
-        user_item = await self.user_pet_items_collection.find_one({
-            "user_id": user_id,
-            "item_id": item_id,
-            "quantity": {"$gt": 0}
-        })
+        now = datetime.now()
+        updated = {}
         
-        if not user_item:
-            return False
+        async def feed(session, undo) -> bool:
+            # Use up one item, only if the user still has one
+            result = await self.user_pet_items_collection.update_one(
+                {"user_id": user_id, "item_id": item_id, "quantity": {"$gt": 0}},
+                {"$inc": {"quantity": -1}},
+                session=session
+            )
+            if result.modified_count == 0:
+                return False
+            undo.append(lambda: self.user_pet_items_collection.update_one(
+                {"user_id": user_id, "item_id": item_id},
+                {"$inc": {"quantity": 1}}
+            ))
+            
+            # Apply item effects on top of the decayed happiness and restart decay
+            decayed_happiness = {"$max": [0, {"$subtract": ["$happiness", happiness_decay_expression(now)]}]}
+            updated["pet"] = await self.pet_collection.find_one_and_update(
+                {"user_id": user_id},
+                [{"$set": {
+                    "health": {"$min": [100, {"$add": ["$health", item.effect_health]}]},
+                    "happiness": {"$min": [100, {"$add": [decayed_happiness, item.effect_happiness]}]},
+                    "last_fed": now,
+                    "updated_at": now
+                }}],
+                projection=self._pet_projection,
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if updated["pet"] is None:
+                raise _Rollback()
+            return True
         
-        # Get item details
-        item_data = await self.pet_items_collection.find_one({"_id": ObjectId(item_id)})
-        if not item_data:
+        if not await self._atomically(feed):
             return False
-        
-        item = PetItem(**item_data)
-        
-        # Apply item effects
-        new_health = min(100, pet.health + item.effect_health)
-        new_happiness = min(100, pet.happiness + item.effect_happiness)
-        
-        # Update pet
-        await self.pet_collection.update_one(
-            {"user_id": user_id},
-            {"$set": {
-                "health": new_health,
-                "happiness": new_happiness,
-                "last_fed": datetime.now(),
-                "updated_at": datetime.now()
-            }}
-        )
-        
-        # Decrease item quantity
-        await self.user_pet_items_collection.update_one(
-            {"user_id": user_id, "item_id": item_id},
-            {"$inc": {"quantity": -1}}
-        )
-        
+        # Pushed once committed, so subscribers never see a rolled back state
+        self._push_pet(updated["pet"])
         return True
 
     async def buy_item(self, user_id: str, item_id: str) -> bool:
         """Buy an item with experience points"""
-        pet = await self.get_user_pet(user_id)
-        if not pet:
-            return False
-        
-        # Get item details
-        item_data = await self.pet_items_collection.find_one({"_id": ObjectId(item_id)})
-        if not item_data:
-            return False
-        
-        item = PetItem(**item_data)
-        
-        # Check if user has enough experience
-        if pet.experience_points < item.cost_exp:
+        item = await self._get_item(item_id)
+        if not item:
             return False
         
-        # Deduct experience points
-        await self.pet_collection.update_one(
-            {"user_id": user_id},
-            {"$inc": {"experience_points": -item.cost_exp},
-             "$set": {"updated_at": datetime.now()}}
-        )
-        
-        # Add item to user's inventory
-        existing_item = await self.user_pet_items_collection.find_one({
-            "user_id": user_id,
-            "item_id": item_id
-        })
+        now = datetime.now()
+        updated = {}
         
-        if existing_item:
+        async def purchase(session, undo) -> bool:
+            # Deduct experience points, only if the pet can afford the item
+            pet_data = updated["pet"] = await self.pet_collection.find_one_and_update(
+                {"user_id": user_id, "experience_points": {"$gte": item.cost_exp}},
+                {"$inc": {"experience_points": -item.cost_exp},
+                 "$set": {"updated_at": now}},
+                projection=self._pet_projection,
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if not pet_data:
+                return False
+            undo.append(lambda: self.pet_collection.update_one(
+                {"user_id": user_id},
+                {"$inc": {"experience_points": item.cost_exp}}
+            ))
+            
+            # Add item to user's inventory
+            new_user_item = UserPetItem(user_id=user_id, pet_id=str(pet_data["_id"]), item_id=item_id)
             await self.user_pet_items_collection.update_one(
                 {"user_id": user_id, "item_id": item_id},
-                {"$inc": {"quantity": 1}}
+                {"$inc": {"quantity": 1},
+                 "$setOnInsert": new_user_item.model_dump(exclude={"id", "user_id", "item_id", "quantity"})},
+                upsert=True,
+                session=session
             )
-        else:
-            new_user_item = UserPetItem(
-                user_id=user_id,
-                pet_id=pet.id,
-                item_id=item_id,
-                quantity=1
-            )
-            await self.user_pet_items_collection.insert_one(new_user_item.model_dump())
+            return True
         
+        if not await self._atomically(purchase):
+            return False
+        self._push_pet(updated["pet"])
         return True
 
+    def _push_pet(self, pet_data: dict):
+        """Push a pet's new state, with decay applied as get_user_pet does"""
+        if not self.push_hub:
+            return
+        pet = from_db(UserPet, pet_data)
+        pet.health, pet.happiness = effective_pet_status(pet, datetime.now())
+        self.push_hub.publish(pet_topic(pet.user_id), "pet", pet.model_dump(mode="json", by_alias=True))
+
     async def get_user_items(self, user_id: str) -> List[dict]:
         """Get all items owned by user"""
         pipeline = [
@@ -212,45 +355,83 @@ class PetGameDAL:
 
     async def get_shop_items(self) -> List[PetItem]:
         """Get all available items in the shop"""
-        cursor = self.pet_items_collection.find({"is_available": {"$ne": False}})
-        items = []
-        async for item_data in cursor:
-            items.append(PetItem(**item_data))
-        return items
+        cursor = self.pet_items_collection.find({"is_available": {"$ne": False}}, projection=db_projection(PetItem))
+        return [from_db(PetItem, item_data) async for item_data in cursor]
 
-    async def update_pet_status(self, user_id: str):
-        """Update pet's health and happiness based on time since last activity"""
-        pet = await self.get_user_pet(user_id)
-        if not pet:
-            return
-        
+    async def update_pet_status(self, user_id: str) -> Optional[UserPet]:
+        """Get pet's current health and happiness based on time since last activity"""
+        # Decay is a pure function of last_fed, so nothing needs to be written;
+        # feeding persists the decayed values when it resets last_fed
+        return await self.get_user_pet(user_id)
+
+    async def compact_idle_pets(self) -> int:
+        """Persist happiness for pets whose decay has bottomed out"""
+        # Once decay has taken happiness to zero it stays there until the pet is
+        # fed, so writing the zero is idempotent with the read-time decay
         now = datetime.now()
-        hours_since_fed = (now - pet.last_fed).total_seconds() / 3600
-        
-        # Decrease happiness over time if not fed
-        if hours_since_fed > 24:
-            happiness_loss = min(int(hours_since_fed / 24) * 10, pet.happiness)
-            new_happiness = max(0, pet.happiness - happiness_loss)
-            
-            await self.pet_collection.update_one(
-                {"user_id": user_id},
-                {"$set": {
-                    "happiness": new_happiness,
-                    "updated_at": now
-                }}
-            )
+        result = await self.pet_collection.update_many(
+            {
+                "happiness": {"$gt": 0},
+                "last_fed": {"$lt": now - timedelta(hours=DECAY_INTERVAL_HOURS)},
+                "$expr": {"$gte": [happiness_decay_expression(now), "$happiness"]}
+            },
+            {"$set": {"happiness": 0, "updated_at": now}}
+        )
+        return result.modified_count
 
     async def get_experience_history(self, user_id: str, limit: int = 10) -> List[ExperienceLog]:
         """Get user's recent experience gains"""
-        cursor = self.exp_log_collection.find(
-            {"user_id": user_id}
-        ).sort("created_at", -1).limit(limit)
+        # Include gains still waiting in the write buffer
+        logs = [from_db(ExperienceLog, dict(log_data)) for log_data in
+                self.exp_log_writer.pending(lambda log_data: log_data["user_id"] == user_id)[::-1][:limit]]
         
-        logs = []
-        async for log_data in cursor:
-            logs.append(ExperienceLog(**log_data))
+        if len(logs) < limit:
+            cursor = self.exp_log_collection.find(
+                {"user_id": user_id}, projection=db_projection(ExperienceLog)
+            ).sort("created_at", -1).limit(limit - len(logs))
+            
+            async for log_data in cursor:
+                logs.append(from_db(ExperienceLog, log_data))
         return logs
 
+# Happiness lost per full day without being fed
+DECAY_INTERVAL_HOURS = 24
+HAPPINESS_DECAY = 10
+
+def effective_pet_status(pet: UserPet, now: datetime) -> tuple:
+    """Get pet's (health, happiness) after decay since it was last fed"""
+    hours_since_fed = (now - pet.last_fed).total_seconds() / 3600
+    
+    # Decrease happiness over time if not fed
+    happiness = pet.happiness
+    if hours_since_fed > DECAY_INTERVAL_HOURS:
+        happiness_loss = int(hours_since_fed / DECAY_INTERVAL_HOURS) * HAPPINESS_DECAY
+        happiness = max(0, pet.happiness - happiness_loss)
+    return pet.health, happiness
+
+def happiness_decay_expression(now: datetime) -> dict:
+    """Aggregation expression for the happiness lost since last_fed"""
+    interval_ms = DECAY_INTERVAL_HOURS * 3600 * 1000
+    return {"$multiply": [
+        {"$floor": {"$divide": [{"$subtract": [now, "$last_fed"]}, interval_ms]}},
+        HAPPINESS_DECAY
+    ]}
+
+# Experience needed to leave each of levels 1-9; beyond that a level is 1000 exp
+LEVEL_THRESHOLDS = [100, 250, 500, 1000, 1750, 2750, 4000, 5500, 7500]
+
+def level_expression(experience: str) -> dict:
+    """Aggregation expression computing the level from an experience field"""
+    return {"$switch": {
+        "branches": [
+            {"case": {"$lt": [experience, threshold]}, "then": level}
+            for level, threshold in enumerate(LEVEL_THRESHOLDS, start=1)
+        ],
+        "default": {"$add": [10, {"$toInt": {"$floor": {
+            "$divide": [{"$subtract": [experience, LEVEL_THRESHOLDS[-1]]}, 1000]
+        }}}]}
+    }}
+
 # Experience points mapping for different activities
 EXP_REWARDS = {
     "assignment_completion": 50,
@@ -0,0 +1,250 @@
+# Push Hub: batched WebSocket fan-out of alerts, leaderboard moves, pet and volunteer updates
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+from collections import defaultdict
+from datetime import datetime
+from uuid import uuid4
+import asyncio
+import orjson
+
+Batch = Dict[str, List[dict]]  # topic -> events
+Deliver = Callable[[Batch], None]
+
+# Topics
+def alerts_topic(parent_id: str) -> str:
+    return f"alerts:{parent_id}"
+
+def pet_topic(user_id: str) -> str:
+    return f"pet:{user_id}"
+
+def school_leaderboard_topic(school: str) -> str:
+    return f"leaderboard:{school}"
+
+def volunteer_topic(volunteer_id: str) -> str:
+    return f"volunteer:{volunteer_id}"
+
+
+class MemoryBroadcast:
+    """Single-worker stand-in: batches go straight to this worker's subscribers"""
+
+    local = True
+
+    async def start(self, deliver: Deliver):
+        self.deliver = deliver
+
+    async def publish(self, batch: Batch):
+        self.deliver(batch)
+
+    async def stop(self):
+        pass
+
+
+class MongoBroadcast:
+    """Carries batches to every worker through a capped collection that each worker tails.
+
+    Capped collections keep insertion order and support tailable cursors on
+    a standalone mongod, unlike change streams. Old batches fall off the end
+    as new ones are written.
+    """
+
+    local = False
+
+    def __init__(self, broadcast_collection: AsyncIOMotorCollection, size_bytes: int = 16 * 1024 * 1024,
+                 retry_interval: float = 1.0, max_seen: int = 200_000):
+        self.broadcast_collection = broadcast_collection
+        self.size_bytes = size_bytes
+        self.retry_interval = retry_interval
+        # More ids than a capped collection of the default size holds
+        self.max_seen = max_seen
+        self.origin = uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver):
+        self.deliver = deliver
+        try:
+            await self.broadcast_collection.database.create_collection(
+                self.broadcast_collection.name, capped=True, size=self.size_bytes
+            )
+        except CollectionInvalid:
+            pass  # already created by another worker
+        self._task = asyncio.create_task(self._tail())
+
+    async def publish(self, batch: Batch):
+        # This worker's subscribers don't wait for the round trip
+        self.deliver(batch)
+        await self.broadcast_collection.insert_one({"origin": self.origin, "batch": batch})
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _tail(self):
+        # Workers insert in any _id order, so a reopened cursor can't resume
+        # from the last _id; it re-scans in natural order and skips ids already
+        # seen. Batches written before this worker started count as seen.
+        seen: Dict[Any, None] = {}
+        async for document in self.broadcast_collection.find({}, projection={"_id": 1}):
+            self._see(seen, document["_id"])
+        while True:
+            try:
+                cursor = self.broadcast_collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for document in cursor:
+                        if document["_id"] in seen:
+                            continue
+                        self._see(seen, document["_id"])
+                        if document["origin"] != self.origin:
+                            self.deliver(document["batch"])
+            except Exception as exc:
+                print(f"Push broadcast tail failed: {exc}")
+            # A tailable cursor on an empty collection dies at once; reopen it shortly
+            await asyncio.sleep(self.retry_interval)
+
+    def _see(self, seen: Dict[Any, None], document_id):
+        seen[document_id] = None
+        while len(seen) > self.max_seen:
+            del seen[next(iter(seen))]
+
+
+class PushConnection:
+    """One WebSocket client: its topics and a bounded queue of frames waiting to be sent"""
+
+    def __init__(self, websocket, max_frames: int):
+        self.websocket = websocket
+        self.topics: Set[str] = set()
+        self.frames: asyncio.Queue = asyncio.Queue(max_frames)
+
+
+class PushHub:
+    """Pushes DAL updates to WebSocket subscribers, batched and coalesced per topic.
+
+    publish() only buffers, so write paths don't wait on delivery. Within a
+    flush interval a later update with the same event and key replaces the
+    earlier one (the latest pet state or standings win; alerts are keyed by
+    id and all kept). Each flush is one broadcast, which every worker fans
+    out to its own connections as a single frame per connection. A client
+    too far behind is disconnected, and refetches when it reconnects.
+    """
+
+    def __init__(self, broadcast, flush_interval: float = 0.25, max_queued_frames: int = 100):
+        self.broadcast = broadcast
+        self.flush_interval = flush_interval
+        self.max_queued_frames = max_queued_frames
+        self.subscribers: Dict[str, Set[PushConnection]] = defaultdict(set)
+        # topic -> (event, key) -> event, in order of the latest update
+        self._pending: Dict[str, Dict[tuple, dict]] = defaultdict(dict)
+        self._task: Optional[asyncio.Task] = None
+
+    # Publishing
+    def publish(self, topic: str, event: str, data: Any, key: str = None):
+        """Queue an update for a topic; `data` must be JSON-serializable"""
+        if self.broadcast.local and topic not in self.subscribers:
+            return  # nobody anywhere is listening
+        pending = self._pending[topic]
+        pending.pop((event, key), None)
+        pending[(event, key)] = {"topic": topic, "event": event, "key": key, "data": data,
+                                 "at": datetime.now().isoformat()}
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, defaultdict(dict)
+        await self.broadcast.publish({topic: list(events.values()) for topic, events in pending.items()})
+
+    def deliver(self, batch: Batch):
+        """Fan a batch out to this worker's subscribers, one frame per connection"""
+        frames: Dict[PushConnection, List[bytes]] = defaultdict(list)
+        for topic, events in batch.items():
+            subscribers = self.subscribers.get(topic)
+            if not subscribers:
+                continue
+            # Encoded once per topic, not once per subscriber
+            encoded = [orjson.dumps(event) for event in events]
+            for connection in subscribers:
+                frames[connection].extend(encoded)
+        for connection, events in frames.items():
+            try:
+                connection.frames.put_nowait(b'{"events":[' + b",".join(events) + b"]}")
+            except asyncio.QueueFull:
+                self._disconnect(connection)
+                connection.frames.get_nowait()
+                connection.frames.put_nowait(None)
+
+    # Connections
+    async def serve(self, websocket, topics: Iterable[str] = ()):
+        """Run an accepted WebSocket until the client leaves or falls behind.
+
+        Clients change their topics with {"subscribe": [...]} and
+        {"unsubscribe": [...]} messages.
+        """
+        connection = PushConnection(websocket, self.max_queued_frames)
+        self.subscribe(connection, topics)
+        sender = asyncio.create_task(self._send(connection))
+        try:
+            while not sender.done():
+                message = await websocket.receive_json()
+                if isinstance(message, dict):
+                    self.unsubscribe(connection, message.get("unsubscribe") or [])
+                    self.subscribe(connection, message.get("subscribe") or [])
+        except Exception:
+            pass  # disconnected, or sent something that isn't JSON
+        finally:
+            sender.cancel()
+            self._disconnect(connection)
+
+    def subscribe(self, connection: PushConnection, topics: Iterable[str]):
+        for topic in topics:
+            if not isinstance(topic, str) or len(connection.topics) >= MAX_TOPICS_PER_CONNECTION:
+                continue
+            connection.topics.add(topic)
+            self.subscribers[topic].add(connection)
+
+    def unsubscribe(self, connection: PushConnection, topics: Iterable[str]):
+        for topic in topics:
+            if topic not in connection.topics:
+                continue
+            connection.topics.discard(topic)
+            self.subscribers[topic].discard(connection)
+            if not self.subscribers[topic]:
+                del self.subscribers[topic]
+
+    def _disconnect(self, connection: PushConnection):
+        self.unsubscribe(connection, list(connection.topics))
+
+    async def _send(self, connection: PushConnection):
+        while True:
+            frame = await connection.frames.get()
+            if frame is None:
+                # Fell too far behind: close with "try again later"
+                await connection.websocket.close(code=1013)
+                return
+            await connection.websocket.send_text(frame.decode())
+
+    # Background flushing
+    async def start(self):
+        await self.broadcast.start(self.deliver)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as exc:
+            print(f"Push flush failed: {exc}")
+        await self.broadcast.stop()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as exc:
+                print(f"Push flush failed: {exc}")
+
+
+MAX_TOPICS_PER_CONNECTION = 50
@@ -0,0 +1,222 @@
+# Donor KPI and annual report exports, streamed from Mongo cursors
+from .models import ReportFormat, ReportName
+from .score_history import month_start
+from motor.motor_asyncio import AsyncIOMotorCollection
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from datetime import datetime
+import csv
+import io
+import json
+import zlib
+
+KPI_COLUMNS = [
+    "month", "students_served", "submissions", "average_score", "score_improvement",
+    "volunteer_hours", "active_volunteers", "experiences_redeemed", "hours_redeemed"
+]
+VOLUNTEER_HOUR_COLUMNS = [
+    "id", "volunteer_id", "activity_type", "hours_earned", "is_verified", "verified_by", "created_at", "verified_at"
+]
+REDEMPTION_COLUMNS = [
+    "id", "experience_id", "volunteer_id", "hours_spent", "completion_rating", "registered_at", "completed_at"
+]
+REPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    # gzip-compressed JSON lines: a header line, then one {column: [values]} block per batch
+    "columnar": ("application/gzip", "columns.jsonl.gz"),
+}
+
+class ReportExporter:
+    """Streams reports in batches, so memory stays flat however long the history is"""
+
+    def __init__(self,
+                 submissions_collection: AsyncIOMotorCollection,
+                 score_buckets_collection: AsyncIOMotorCollection,
+                 volunteer_hours_collection: AsyncIOMotorCollection,
+                 registrations_collection: AsyncIOMotorCollection,
+                 batch_size: int = 1000):
+        self.submissions_collection = submissions_collection
+        self.score_buckets_collection = score_buckets_collection
+        self.volunteer_hours_collection = volunteer_hours_collection
+        self.registrations_collection = registrations_collection
+        self.batch_size = batch_size
+        self.reports = {
+            "kpi": (KPI_COLUMNS, self.kpi_rows),
+            "volunteer_hours": (VOLUNTEER_HOUR_COLUMNS, self.volunteer_hour_rows),
+            "experience_redemptions": (REDEMPTION_COLUMNS, self.redemption_rows),
+        }
+
+    # Streaming
+    def stream(self, report: ReportName, fmt: ReportFormat = "csv", start: datetime = None,
+               end: datetime = None) -> AsyncIterator[bytes]:
+        """Encode a report batch by batch in the requested format"""
+        columns, rows = self.reports[report]
+        batches = self._batches(rows(start, end))
+        if fmt == "columnar":
+            return _columnar_chunks(columns, batches)
+        return _csv_chunks(columns, batches)
+
+    async def _batches(self, rows: AsyncIterator[dict]) -> AsyncIterator[List[dict]]:
+        batch = []
+        async for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    # Detail reports
+    async def volunteer_hour_rows(self, start: datetime = None, end: datetime = None) -> AsyncIterator[dict]:
+        cursor = self.volunteer_hours_collection.find(
+            _date_range("created_at", start, end),
+            projection={"notes": 0, "description": 0, "verification_notes": 0, "verification_batch": 0},
+            batch_size=self.batch_size
+        ).sort("created_at", 1)
+        async for log in cursor:
+            log["id"] = str(log.pop("_id"))
+            yield log
+
+    async def redemption_rows(self, start: datetime = None, end: datetime = None) -> AsyncIterator[dict]:
+        query = {"registration_status": "completed", **_date_range("completed_at", start, end)}
+        cursor = self.registrations_collection.find(
+            query, projection={"feedback": 0}, batch_size=self.batch_size
+        ).sort("completed_at", 1)
+        async for registration in cursor:
+            registration["id"] = str(registration.pop("_id"))
+            yield registration
+
+    # KPI summary
+    async def kpi_rows(self, start: datetime = None, end: datetime = None) -> AsyncIterator[dict]:
+        """One row per month plus a total row; every figure is aggregated server-side in one pass"""
+        months: Dict[str, dict] = {}
+        totals = {"month": "total"}
+
+        def merge(result: dict):
+            for row in result["by_month"]:
+                months.setdefault(_month_key(row.pop("_id")), {}).update(row)
+            if result["total"]:
+                total = result["total"][0]
+                total.pop("_id")
+                totals.update(total)
+
+        merge(await self._facet(self.submissions_collection, _date_range("submitted_at", start, end), "$submitted_at", {
+            "submissions": {"$sum": 1}
+        }, distinct=("students_served", "$student_id")))
+        # Buckets are keyed by month, so include the month `start` falls in
+        bucket_start = month_start(start) if start else None
+        merge(await self._facet(self.score_buckets_collection, _date_range("month", bucket_start, end), "$month", {
+            "score_sum": {"$sum": "$sum"},
+            "score_count": {"$sum": "$count"}
+        }))
+        merge(await self._facet(
+            self.volunteer_hours_collection, {"is_verified": True, **_date_range("created_at", start, end)},
+            "$created_at", {
+                "volunteer_hours": {"$sum": "$hours_earned"}
+            }, distinct=("active_volunteers", "$volunteer_id")))
+        merge(await self._facet(
+            self.registrations_collection,
+            {"registration_status": "completed", **_date_range("completed_at", start, end)},
+            "$completed_at", {
+                "experiences_redeemed": {"$sum": 1},
+                "hours_redeemed": {"$sum": "$hours_spent"}
+            }))
+        totals["score_improvement"] = await self._score_improvement(bucket_start, end)
+
+        for month in sorted(months):
+            yield _kpi_row(month, months[month])
+        yield _kpi_row("total", totals)
+
+    async def _facet(self, collection: AsyncIOMotorCollection, match: dict, date_field: str,
+                     accumulators: dict, distinct: Tuple[str, str] = None) -> dict:
+        """Group by month and overall in a single pass over the matching documents.
+
+        `distinct` is an (output field, expression) pair counting the expression's
+        distinct values. Each branch first groups per value and then counts the
+        groups, so no document has to hold the values themselves; the
+        accumulators must be $sums to be added up across the groups.
+        """
+        month = {"year": {"$year": date_field}, "month": {"$month": date_field}}
+        if distinct:
+            field, value = distinct
+            regroup = {**{name: {"$sum": f"${name}"} for name in accumulators}, field: {"$sum": 1}}
+            by_month = [
+                {"$group": {"_id": {**month, "value": value}, **accumulators}},
+                {"$group": {"_id": {"year": "$_id.year", "month": "$_id.month"}, **regroup}}
+            ]
+            total = [{"$group": {"_id": value, **accumulators}}, {"$group": {"_id": None, **regroup}}]
+        else:
+            by_month = [{"$group": {"_id": month, **accumulators}}]
+            total = [{"$group": {"_id": None, **accumulators}}]
+        pipeline = [
+            {"$match": match},
+            {"$facet": {"by_month": by_month, "total": total}}
+        ]
+        async for result in collection.aggregate(pipeline):
+            return result
+        return {"by_month": [], "total": []}
+
+    async def _score_improvement(self, start: Optional[datetime], end: Optional[datetime]) -> Optional[float]:
+        """Average change between each student's first and last monthly average in the range"""
+        pipeline = [
+            {"$match": {"count": {"$gt": 0}, **_date_range("month", start, end)}},
+            {"$sort": {"month": 1}},
+            {"$group": {
+                "_id": "$student_id",
+                "first": {"$first": {"$divide": ["$sum", "$count"]}},
+                "last": {"$last": {"$divide": ["$sum", "$count"]}},
+                "months": {"$sum": 1}
+            }},
+            {"$match": {"months": {"$gte": 2}}},
+            {"$group": {"_id": None, "improvement": {"$avg": {"$subtract": ["$last", "$first"]}}}}
+        ]
+        async for result in self.score_buckets_collection.aggregate(pipeline):
+            return result["improvement"]
+        return None
+
+
+def _date_range(field: str, start: Optional[datetime], end: Optional[datetime]) -> dict:
+    if not start and not end:
+        return {}
+    bounds = {}
+    if start:
+        bounds["$gte"] = start
+    if end:
+        bounds["$lt"] = end
+    return {field: bounds}
+
+def _month_key(key: dict) -> str:
+    return f"{key['year']:04d}-{key['month']:02d}"
+
+def _kpi_row(month: str, values: dict) -> dict:
+    row = {column: values.get(column, 0) for column in KPI_COLUMNS}
+    row["month"] = month
+    row["average_score"] = values["score_sum"] / values["score_count"] if values.get("score_count") else None
+    row["score_improvement"] = values.get("score_improvement")
+    return row
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+async def _csv_chunks(columns: List[str], batches: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in batches:
+        writer.writerows([_cell(row.get(column)) for column in columns] for row in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+async def _columnar_chunks(columns: List[str], batches: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    yield compressor.compress((json.dumps({"columns": columns}) + "\n").encode())
+    async for batch in batches:
+        block = {column: [_cell(row.get(column)) for row in batch] for column in columns}
+        chunk = compressor.compress((json.dumps(block, default=str) + "\n").encode())
+        if chunk:
+            yield chunk
+    yield compressor.flush()
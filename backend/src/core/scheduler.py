@@ -0,0 +1,253 @@
+# Job Scheduler: cron-like periodic jobs, run by one worker at a time through a Mongo lease
+from .indexes import declare_index, declare_query
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import DuplicateKeyError
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from datetime import datetime, timedelta
+from uuid import uuid4
+import asyncio
+import random
+import socket
+import os
+
+JobFunc = Callable[[], Awaitable]
+
+
+class CronSchedule:
+    """A five-field cron expression: minute hour day-of-month month day-of-week (0 = Sunday).
+
+    Fields take `*`, numbers, ranges `a-b`, lists `a,b` and steps `*/n` or `a-b/n`.
+    """
+
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expected 5 cron fields, got {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, self.FIELDS)
+        )
+        # As in cron, a restricted day-of-month and day-of-week match if either does
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def next_after(self, moment: datetime) -> datetime:
+        """The first matching minute strictly after `moment`"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                month = candidate.replace(day=1, hour=0, minute=0)
+                candidate = (month + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+
+class Job:
+    def __init__(self, name: str, schedule: str, func: JobFunc, jitter: float, lease_seconds: int):
+        self.name = name
+        self.schedule = CronSchedule(schedule)
+        self.func = func
+        self.jitter = jitter
+        self.lease_seconds = lease_seconds
+        self.next_run: Optional[datetime] = None
+
+
+class JobScheduler:
+    """Runs registered jobs on their schedules in every worker; a lease in Mongo lets only one execute each run.
+
+    A worker claims a scheduled run by taking the job's lease document,
+    which also records the run it was taken for, so a run is executed once
+    even if another worker's jittered start comes after the first finished.
+    The lease is renewed while the job runs; if the worker dies, it expires
+    and the next scheduled run goes ahead elsewhere. Every run is recorded
+    in the runs collection.
+    """
+
+    INDEXES = [
+        declare_index("runs_collection", ("job", 1), ("started_at", -1)),
+        # Keep a month of run history
+        declare_index("runs_collection", ("started_at", 1), expireAfterSeconds=30 * 24 * 3600),
+    ]
+    QUERIES = [
+        declare_query("runs_collection", {"job": "demo"}, [("started_at", -1)]),
+    ]
+
+    def __init__(self,
+                 locks_collection: AsyncIOMotorCollection,
+                 runs_collection: AsyncIOMotorCollection,
+                 default_jitter: float = 30.0,
+                 default_lease_seconds: int = 300):
+        self.locks_collection = locks_collection
+        self.runs_collection = runs_collection
+        self.default_jitter = default_jitter
+        self.default_lease_seconds = default_lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._running: Set[asyncio.Task] = set()
+
+    def add(self, name: str, schedule: str, func: JobFunc, jitter: float = None, lease_seconds: int = None):
+        """Register a job, e.g. add("watchlist_refresh", "0 */6 * * *", watchlist_dal.refresh)"""
+        self.jobs[name] = Job(
+            name, schedule, func,
+            self.default_jitter if jitter is None else jitter,
+            lease_seconds or self.default_lease_seconds
+        )
+
+    # Running
+    async def run_now(self, name: str) -> Optional[dict]:
+        """Run a job immediately, returning its run record (None if another worker holds the lease)"""
+        return await self._run_job(self.jobs[name], datetime.now())
+
+    async def _run_job(self, job: Job, scheduled_for: datetime) -> Optional[dict]:
+        token = await self._acquire(job, scheduled_for)
+        if not token:
+            return None
+
+        run = {
+            "job": job.name,
+            "owner": self.owner,
+            "scheduled_for": scheduled_for,
+            "started_at": datetime.now(),
+            "status": "running"
+        }
+        heartbeat = asyncio.create_task(self._renew(job, token))
+        try:
+            result = await job.func()
+            run["status"] = "succeeded"
+            run["result"] = result if isinstance(result, (int, float, str, type(None))) else repr(result)[:500]
+        except Exception as exc:
+            run["status"] = "failed"
+            run["error"] = repr(exc)[:500]
+            print(f"Scheduled job {job.name} failed: {exc}")
+        finally:
+            heartbeat.cancel()
+            await self._release(job, token)
+        run["finished_at"] = datetime.now()
+        run["duration_ms"] = int((run["finished_at"] - run["started_at"]).total_seconds() * 1000)
+        await self.runs_collection.insert_one(dict(run))
+        return run
+
+    # Lease
+    async def _acquire(self, job: Job, scheduled_for: datetime) -> Optional[str]:
+        """Take the job's lease for a run, unless it is held or that run already happened"""
+        now = datetime.now()
+        token = uuid4().hex
+        try:
+            await self.locks_collection.update_one(
+                {
+                    "_id": job.name,
+                    "lease_until": {"$not": {"$gt": now}},
+                    "scheduled_for": {"$not": {"$gte": scheduled_for}}
+                },
+                {"$set": {
+                    "owner": self.owner,
+                    "token": token,
+                    "scheduled_for": scheduled_for,
+                    "lease_until": now + timedelta(seconds=job.lease_seconds)
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The lease exists and didn't match: someone else has (or had) this run
+            return None
+        return token
+
+    async def _renew(self, job: Job, token: str):
+        while True:
+            await asyncio.sleep(job.lease_seconds / 3)
+            result = await self.locks_collection.update_one(
+                {"_id": job.name, "token": token},
+                {"$set": {"lease_until": datetime.now() + timedelta(seconds=job.lease_seconds)}}
+            )
+            if not result.matched_count:
+                print(f"Scheduled job {job.name} lost its lease")
+                return
+
+    async def _release(self, job: Job, token: str):
+        await self.locks_collection.update_one(
+            {"_id": job.name, "token": token}, {"$set": {"lease_until": datetime.now()}}
+        )
+
+    # Status
+    async def status(self, history: int = 5) -> List[dict]:
+        """Each job's schedule, next run and most recent runs"""
+        leases = {lease["_id"]: lease async for lease in self.locks_collection.find({"_id": {"$in": list(self.jobs)}})}
+        jobs = []
+        for job in self.jobs.values():
+            lease = leases.get(job.name, {})
+            runs = await self.runs_collection.find(
+                {"job": job.name}, projection={"_id": 0}
+            ).sort("started_at", -1).limit(history).to_list(length=history)
+            jobs.append({
+                "name": job.name,
+                "schedule": job.schedule.expression,
+                "next_run": job.next_run or job.schedule.next_after(datetime.now()),
+                "lease_owner": lease.get("owner") if lease.get("lease_until", datetime.min) > datetime.now() else None,
+                "recent_runs": runs
+            })
+        return jobs
+
+    # Background loop
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._loop(job)) for job in self.jobs.values()]
+
+    async def stop(self):
+        tasks = self._tasks + list(self._running)
+        for task in tasks:
+            task.cancel()
+        # Let interrupted jobs release their leases before the client closes
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop(self, job: Job):
+        while True:
+            job.next_run = job.schedule.next_after(datetime.now())
+            # Jitter spreads the workers' lease attempts (and the jobs sharing a minute) apart
+            delay = (job.next_run - datetime.now()).total_seconds() + random.uniform(0, job.jitter)
+            await asyncio.sleep(max(0.0, delay))
+            # Run detached so a long job doesn't delay the next schedule computation
+            task = asyncio.create_task(self._run_safely(job, job.next_run))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_safely(self, job: Job, scheduled_for: datetime):
+        try:
+            await self._run_job(job, scheduled_for)
+        except Exception as exc:
+            print(f"Scheduled job {job.name} could not run: {exc}")
+
+
+def _parse_field(field: str, low: int, high: int) -> Set[int]:
+    values = set()
+    for part in field.split(","):
+        part, _, step = part.partition("/")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-"))
+        else:
+            start = end = int(part)
+            if step:
+                end = high
+        if not low <= start <= end <= high:
+            raise ValueError(f"Cron field {field!r} is outside {low}-{high}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return values
@@ -0,0 +1,190 @@
+# Student Score History (bucket pattern: one document per student per month)
+from .models import ScoreBucket, ScoreSample
+from .indexes import declare_index, declare_query
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from typing import List, Optional, Tuple
+from datetime import datetime
+
+class ScoreHistoryDAL:
+    INDEXES = [
+        declare_index("buckets_collection", ("student_id", 1), ("month", 1), unique=True),
+    ]
+    QUERIES = [
+        declare_query("buckets_collection", {"student_id": "demo", "month": {"$gte": datetime(2025, 1, 1)}}, [("month", 1)]),
+    ]
+
+    def __init__(self,
+                 buckets_collection: AsyncIOMotorCollection,
+                 student_collection: AsyncIOMotorCollection):
+        self.buckets_collection = buckets_collection
+        self.student_collection = student_collection
+
+    # Recording
+    async def record_score(self, student_id: str, score: float, recorded_at: datetime = None,
+                           source_id: str = None) -> bool:
+        """Add a score to the student's bucket, returning False if source_id was already recorded"""
+        query, update = _bucket_update(student_id, [ScoreSample(
+            score=score, recorded_at=recorded_at or datetime.now(), source_id=source_id
+        )])
+        # A concurrent first sample of the month can win the bucket's upsert; retry against it once
+        for _ in range(2):
+            try:
+                await self.buckets_collection.update_one(query, update, upsert=True)
+                return True
+            except DuplicateKeyError:
+                continue
+        # The bucket exists and already holds this source_id
+        return False
+
+    async def record_scores_many(self, scores: List[Tuple[str, float, Optional[datetime], Optional[str]]]) -> int:
+        """Add many (student_id, score, recorded_at, source_id) in one bulk write"""
+        now = datetime.now()
+        operations = [
+            UpdateOne(*_bucket_update(student_id, [ScoreSample(
+                score=score, recorded_at=recorded_at or now, source_id=source_id
+            )]), upsert=True)
+            for student_id, score, recorded_at, source_id in scores
+        ]
+        recorded = 0
+        # Like record_score, retry duplicate keys once in case they lost a concurrent bucket upsert
+        for _ in range(2):
+            if not operations:
+                break
+            try:
+                result = await self.buckets_collection.bulk_write(operations, ordered=False)
+                return recorded + result.modified_count + result.upserted_count
+            except BulkWriteError as exc:
+                errors = exc.details["writeErrors"]
+                if any(error["code"] != 11000 for error in errors):
+                    raise
+                recorded += exc.details["nModified"] + exc.details["nUpserted"]
+                operations = [operations[error["index"]] for error in errors]
+        return recorded
+
+    # Queries
+    async def get_score_history(self, student_id: str, start: datetime = None, end: datetime = None) -> List[ScoreSample]:
+        """Get a student's scores recorded in [start, end), oldest first"""
+        samples = []
+        async for bucket in self._buckets(student_id, start, end):
+            samples.extend(
+                sample for sample in bucket.samples
+                if (start is None or sample.recorded_at >= start) and (end is None or sample.recorded_at < end)
+            )
+        samples.sort(key=lambda sample: sample.recorded_at)
+        return samples
+
+    async def get_score_summary(self, student_id: str, start: datetime = None, end: datetime = None) -> dict:
+        """Get count/sum/min/max/average of the scores in [start, end)"""
+        count, total, low, high = 0, 0.0, None, None
+        async for bucket in self._buckets(student_id, start, end):
+            if (start is None or bucket.month >= start) and (end is None or next_month(bucket.month) <= end):
+                # Whole month inside the range: use the precomputed aggregates
+                values = [bucket.min, bucket.max] if bucket.count else []
+                bucket_count, bucket_sum = bucket.count, bucket.sum
+            else:
+                values = [
+                    sample.score for sample in bucket.samples
+                    if (start is None or sample.recorded_at >= start) and (end is None or sample.recorded_at < end)
+                ]
+                bucket_count, bucket_sum = len(values), sum(values)
+            if not bucket_count:
+                continue
+            count += bucket_count
+            total += bucket_sum
+            low = min(values) if low is None else min(low, *values)
+            high = max(values) if high is None else max(high, *values)
+
+        return {
+            "count": count,
+            "sum": total,
+            "min": low,
+            "max": high,
+            "average": total / count if count else None
+        }
+
+    async def _buckets(self, student_id: str, start: Optional[datetime], end: Optional[datetime]):
+        """Iterate the buckets overlapping [start, end)"""
+        query = {"student_id": student_id}
+        if start or end:
+            query["month"] = {}
+            if start:
+                query["month"]["$gte"] = month_start(start)
+            if end:
+                query["month"]["$lt"] = end
+        cursor = self.buckets_collection.find(query, projection={"_id": 0}).sort("month", 1)
+        async for bucket_data in cursor:
+            yield ScoreBucket(**bucket_data)
+
+    # Migration
+    async def migrate_embedded_scores(self, batch_size: int = 500) -> int:
+        """Move legacy Student.scores arrays into buckets and drop them from the student documents.
+
+        The embedded scores carry no timestamps, so they are filed under the
+        month the student document was created. Safe to re-run: a student's
+        legacy scores are only pushed once.
+        """
+        migrated = 0
+        cursor = self.student_collection.find({"scores.0": {"$exists": True}}, projection={"scores": 1})
+        batch = []
+        async for student in cursor:
+            batch.append(student)
+            if len(batch) >= batch_size:
+                migrated += await self._migrate_batch(batch)
+                batch = []
+        if batch:
+            migrated += await self._migrate_batch(batch)
+        return migrated
+
+    async def _migrate_batch(self, students: List[dict]) -> int:
+        operations = []
+        for student in students:
+            student_id = str(student["_id"])
+            recorded_at = student["_id"].generation_time.replace(tzinfo=None)
+            samples = [
+                ScoreSample(score=float(score), recorded_at=recorded_at, source_id=f"legacy:{student_id}:{index}")
+                for index, score in enumerate(student["scores"])
+            ]
+            operations.append(UpdateOne(*_bucket_update(student_id, samples), upsert=True))
+
+        try:
+            await self.buckets_collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as exc:
+            # Duplicate keys are students migrated by an earlier, interrupted run
+            if any(error["code"] != 11000 for error in exc.details["writeErrors"]):
+                raise
+        await self.student_collection.update_many(
+            {"_id": {"$in": [student["_id"] for student in students]}}, {"$unset": {"scores": ""}}
+        )
+        return len(students)
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def next_month(month: datetime) -> datetime:
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+def _bucket_update(student_id: str, samples: List[ScoreSample]) -> Tuple[dict, dict]:
+    """Filter and update that append samples (all in one month) to their bucket.
+
+    Samples with a source_id are only appended if the first one isn't in the
+    bucket yet; when the bucket exists, the filter misses and the upsert
+    fails on the unique index instead of recording twice. Two first samples
+    of a month racing to upsert the bucket fail the same way, so callers
+    retry a duplicate key once before treating it as already recorded.
+    """
+    scores = [sample.score for sample in samples]
+    query = {"student_id": student_id, "month": month_start(samples[0].recorded_at)}
+    if samples[0].source_id:
+        query["samples.source_id"] = {"$ne": samples[0].source_id}
+    update = {
+        "$push": {"samples": {"$each": [sample.model_dump() for sample in samples]}},
+        "$inc": {"count": len(scores), "sum": sum(scores)},
+        "$min": {"min": min(scores)},
+        "$max": {"max": max(scores)}
+    }
+    return query, update
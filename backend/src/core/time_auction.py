@@ -1,22 +1,74 @@
 # Time Auction Volunteer System
-from .models import TimeAuctionExperience, VolunteerHourLog, ExperienceRegistration, VolunteerBadge
+from .models import TimeAuctionExperience, VolunteerHourLog, ExperienceRegistration, VolunteerBadge, VolunteerHourLedger, ExperienceEntry, db_projection, from_db
+from .leaderboard import LeaderboardEngine
+from .events import EventBus, HOURS_VERIFIED
+from .indexes import declare_index, declare_query
+from .push import PushHub, volunteer_topic
 from bson import ObjectId
+from bson.errors import InvalidId
 from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from typing import List, Optional, Dict
 from datetime import datetime, timedelta
+from collections import defaultdict
+from uuid import uuid4
+import asyncio
+import random
+
+EMPTY_LEDGER = {"earned": 0.0, "pending": 0.0, "spent": 0.0, "held": 0.0, "rating_total": 0.0, "rating_count": 0}
+LEDGER_SNAPSHOT = {**{field: 1 for field in EMPTY_LEDGER}, "available": 1, "updated_at": 1}
 
 class TimeAuctionDAL:
+    INDEXES = [
+        # One registration per volunteer per experience, enforced by the server
+        declare_index("registrations_collection", ("experience_id", 1), ("volunteer_id", 1), unique=True),
+        declare_index("registrations_collection", ("volunteer_id", 1), ("registered_at", -1)),
+        # Lets badge awards be idempotent upserts
+        declare_index("badges_collection", ("volunteer_id", 1), ("badge_type", 1), ("badge_level", 1), unique=True),
+        # Keyset pagination of the pending verification queue
+        declare_index("volunteer_hours_collection", ("is_verified", 1), ("created_at", -1), ("_id", -1)),
+        declare_index("volunteer_hours_collection", ("volunteer_id", 1), ("is_verified", 1)),
+        declare_index("entries_collection", ("experience_id", 1), ("volunteer_id", 1), unique=True),
+        declare_index("experiences_collection", ("allocation_mode", 1), ("allocated_at", 1), ("registration_deadline", 1)),
+        declare_index("experiences_collection", ("is_active", 1), ("experience_date", 1), ("registration_deadline", 1)),
+    ]
+    QUERIES = [
+        declare_query("experiences_collection", {"is_active": True, "registration_deadline": {"$gte": datetime(2025, 1, 1)}},
+                      [("experience_date", 1)]),
+        declare_query("experiences_collection", {"allocation_mode": "lottery", "allocated_at": None,
+                                                 "registration_deadline": {"$lte": datetime(2025, 1, 1)}}),
+        declare_query("volunteer_hours_collection", {"volunteer_id": "demo", "is_verified": True}),
+        declare_query("volunteer_hours_collection", {"is_verified": False}, [("created_at", -1), ("_id", -1)]),
+        declare_query("registrations_collection", {"volunteer_id": "demo"}, [("registered_at", -1)]),
+        declare_query("badges_collection", {"volunteer_id": "demo"}),
+        declare_query("entries_collection", {"experience_id": "demo", "entry_status": "pending"}),
+    ]
+
     def __init__(self, 
                  experiences_collection: AsyncIOMotorCollection,
                  volunteer_hours_collection: AsyncIOMotorCollection,
                  registrations_collection: AsyncIOMotorCollection,
                  badges_collection: AsyncIOMotorCollection,
-                 users_collection: AsyncIOMotorCollection):
+                 users_collection: AsyncIOMotorCollection,
+                 ledger_collection: AsyncIOMotorCollection,
+                 leaderboard_collection: AsyncIOMotorCollection,
+                 entries_collection: AsyncIOMotorCollection,
+                 event_bus: EventBus = None,
+                 push_hub: PushHub = None):
         self.experiences_collection = experiences_collection
         self.volunteer_hours_collection = volunteer_hours_collection
         self.registrations_collection = registrations_collection
         self.badges_collection = badges_collection
         self.users_collection = users_collection
+        self.ledger_collection = ledger_collection
+        self.entries_collection = entries_collection
+        self.event_bus = event_bus
+        self.push_hub = push_hub
+        self.leaderboard = LeaderboardEngine(
+            leaderboard_collection, "volunteer_hours", rebuild_source=self._leaderboard_rows
+        )
+        self._volunteer_names: Dict[str, Optional[str]] = {}
 
     # Experience Management
     async def create_experience(self, experience_data: dict) -> str:
@@ -65,102 +117,269 @@ class TimeAuctionDAL:
             description=description
         )
         result = await self.volunteer_hours_collection.insert_one(hour_log.model_dump())
-        
-        # Update volunteer badges
-        await self._update_volunteer_badges(volunteer_id)
+        # Unverified hours don't count towards badges yet
+        await self._adjust_ledger(volunteer_id, pending=hours_earned)
         
         return str(result.inserted_id)
 
     async def verify_volunteer_hours(self, log_id: str, verified_by: str, 
                                    verification_notes: str = None) -> bool:
         """Verify logged volunteer hours"""
-        result = await self.volunteer_hours_collection.update_one(
-            {"_id": ObjectId(log_id)},
+        log_data = await self.volunteer_hours_collection.find_one_and_update(
+            {"_id": ObjectId(log_id), "is_verified": False},
             {"$set": {
                 "is_verified": True,
                 "verified_by": verified_by,
                 "verification_notes": verification_notes,
                 "verified_at": datetime.now()
-            }}
+            }},
+            projection={"volunteer_id": 1, "hours_earned": 1, "created_at": 1}
         )
+        if not log_data:
+            return False
         
-        if result.modified_count > 0:
-            # Get volunteer ID and update badges
-            log_data = await self.volunteer_hours_collection.find_one({"_id": ObjectId(log_id)})
-            if log_data:
-                await self._update_volunteer_badges(log_data["volunteer_id"])
+        await self._apply_verified_hours(log_data["volunteer_id"], log_data["hours_earned"])
+        self.leaderboard.record(log_data["volunteer_id"], log_data["hours_earned"], at=log_data["created_at"])
         
-        return result.modified_count > 0
+        return True
 
     async def get_volunteer_hours_balance(self, volunteer_id: str) -> float:
         """Get volunteer's total verified hours balance"""
-        pipeline = [
-            {"$match": {"volunteer_id": volunteer_id, "is_verified": True}},
-            {"$group": {"_id": None, "total_hours": {"$sum": "$hours_earned"}}}
-        ]
-        
-        result = await self.volunteer_hours_collection.aggregate(pipeline).to_list(1)
-        return result[0]["total_hours"] if result else 0.0
+        ledger = await self.get_hour_ledger(volunteer_id)
+        return ledger.earned
 
     async def get_volunteer_hours_spent(self, volunteer_id: str) -> float:
         """Get volunteer's total hours spent on experiences"""
-        pipeline = [
-            {"$match": {"volunteer_id": volunteer_id, "registration_status": "completed"}},
-            {"$group": {"_id": None, "total_spent": {"$sum": "$hours_spent"}}}
+        ledger = await self.get_hour_ledger(volunteer_id)
+        return ledger.spent
+
+    async def get_available_hours(self, volunteer_id: str) -> float:
+        """Get volunteer's available hours (earned - spent - held)"""
+        ledger = await self.get_hour_ledger(volunteer_id)
+        return max(0, ledger.available)
+
+    # Hour Ledger
+    async def get_hour_ledger(self, volunteer_id: str) -> VolunteerHourLedger:
+        """Get volunteer's materialized hour ledger (single point lookup)"""
+        ledger_data = await self.ledger_collection.find_one({"_id": volunteer_id})
+        if ledger_data:
+            return VolunteerHourLedger(**ledger_data)
+        return VolunteerHourLedger(volunteer_id=volunteer_id)
+
+    async def _adjust_ledger(self, volunteer_id: str, earned: float = 0.0,
+                           pending: float = 0.0, spent: float = 0.0, held: float = 0.0,
+                           rating_total: float = 0.0, rating_count: int = 0) -> VolunteerHourLedger:
+        """Atomically apply counter deltas to a volunteer's ledger and return the result"""
+        ledger_data = await self.ledger_collection.find_one_and_update(
+            {"_id": volunteer_id},
+            {"$inc": {
+                "earned": earned,
+                "pending": pending,
+                "spent": spent,
+                "held": held,
+                "available": earned - spent - held,
+                "rating_total": rating_total,
+                "rating_count": rating_count
+            },
+             "$set": {"updated_at": datetime.now()},
+             "$setOnInsert": {"volunteer_id": volunteer_id}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        ledger = VolunteerHourLedger(**ledger_data)
+        if self.push_hub:
+            self.push_hub.publish(volunteer_topic(volunteer_id), "hours", {
+                **ledger.model_dump(mode="json", exclude={"rating_total", "rating_count"}),
+                "quality_score": ledger.quality_score
+            })
+        return ledger
+
+    async def reconcile_hour_ledgers(self, volunteer_id: str = None, batch_size: int = 1000,
+                                     attempts: int = 3) -> int:
+        """Rebuild hour ledgers from the raw hour logs and registrations.
+
+        Safe while serving: a ledger is only overwritten if no live adjustment
+        changed it since it was read, before the raw data was; ledgers that
+        were adjusted meanwhile are recomputed in another pass.
+        """
+        volunteer_ids = [volunteer_id] if volunteer_id else None
+        reconciled = 0
+        for _ in range(attempts):
+            written, volunteer_ids = await self._reconcile_ledgers(volunteer_ids, batch_size)
+            reconciled += written
+            if not volunteer_ids:
+                return reconciled
+        print(f"Hour ledger reconcile skipped {len(volunteer_ids)} ledgers still being adjusted")
+        return reconciled
+
+    async def backfill_hour_ledgers(self) -> int:
+        """Build the ledgers from the raw data if there are none yet, e.g. on the first start with ledgers"""
+        if await self.ledger_collection.find_one({}, projection={"_id": 1}):
+            return 0
+        return await self.reconcile_hour_ledgers()
+
+    async def _reconcile_ledgers(self, volunteer_ids: Optional[List[str]], batch_size: int) -> tuple:
+        """One reconcile pass over some volunteers (all if None), returning (ledgers written, ids to retry)"""
+        match = {"volunteer_id": {"$in": volunteer_ids}} if volunteer_ids is not None else {}
+        # Any adjustment after this read changes the ledger, so the conditional write below skips it
+        snapshots = {
+            ledger_data["_id"]: ledger_data
+            async for ledger_data in self.ledger_collection.find(
+                {"_id": {"$in": volunteer_ids}} if volunteer_ids is not None else {}, projection=LEDGER_SNAPSHOT
+            )
+        }
+        # Listed volunteers are reset even if they have no logs left
+        ledgers: Dict[str, dict] = {vid: dict(EMPTY_LEDGER) for vid in volunteer_ids or []}
+        
+        hours_pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"volunteer_id": "$volunteer_id", "is_verified": "$is_verified"},
+                "hours": {"$sum": "$hours_earned"}
+            }}
         ]
+        async for row in self.volunteer_hours_collection.aggregate(hours_pipeline):
+            ledger = ledgers.setdefault(row["_id"]["volunteer_id"], dict(EMPTY_LEDGER))
+            ledger["earned" if row["_id"]["is_verified"] else "pending"] += row["hours"]
         
-        result = await self.registrations_collection.aggregate(pipeline).to_list(1)
-        return result[0]["total_spent"] if result else 0.0
+        # Completed registrations are spent, open ones still hold their hours
+        spent_pipeline = [
+            {"$match": {**match, "registration_status": {"$in": ["registered", "confirmed", "completed"]}}},
+            {"$group": {
+                "_id": {"volunteer_id": "$volunteer_id", "completed": {"$eq": ["$registration_status", "completed"]}},
+                "hours": {"$sum": "$hours_spent"},
+                "rating_total": {"$sum": "$completion_rating"},
+                "rating_count": {"$sum": {"$cond": [{"$gt": ["$completion_rating", None]}, 1, 0]}}
+            }}
+        ]
+        async for row in self.registrations_collection.aggregate(spent_pipeline):
+            ledger = ledgers.setdefault(row["_id"]["volunteer_id"], dict(EMPTY_LEDGER))
+            if row["_id"]["completed"]:
+                # Only completed experiences contribute to the quality score
+                ledger["spent"] += row["hours"]
+                ledger["rating_total"] += row["rating_total"]
+                ledger["rating_count"] += row["rating_count"]
+            else:
+                ledger["held"] += row["hours"]
+        
+        # Truncated to BSON's millisecond precision so it compares equal once stored
+        reconciled_at = datetime.now()
+        reconciled_at = reconciled_at.replace(microsecond=reconciled_at.microsecond // 1000 * 1000)
+        retry = []
+        operations, batch_ids = [], []
+        for vid, counters in ledgers.items():
+            ledger = VolunteerHourLedger(
+                volunteer_id=vid,
+                available=counters["earned"] - counters["spent"] - counters["held"],
+                updated_at=reconciled_at,
+                **counters
+            )
+            if vid in snapshots:
+                # Matches only if the ledger is exactly as read
+                operations.append(ReplaceOne(snapshots[vid], ledger.model_dump()))
+            else:
+                operations.append(UpdateOne({"_id": vid}, {"$setOnInsert": ledger.model_dump()}, upsert=True))
+            batch_ids.append(vid)
+            if len(operations) >= batch_size:
+                retry += await self._write_reconciled(operations, batch_ids, reconciled_at)
+                operations, batch_ids = [], []
+        if operations:
+            retry += await self._write_reconciled(operations, batch_ids, reconciled_at)
+        
+        return len(ledgers) - len(retry), retry
 
-    async def get_available_hours(self, volunteer_id: str) -> float:
-        """Get volunteer's available hours (earned - spent)"""
-        earned = await self.get_volunteer_hours_balance(volunteer_id)
-        spent = await self.get_volunteer_hours_spent(volunteer_id)
-        return max(0, earned - spent)
+    async def _write_reconciled(self, operations: list, volunteer_ids: List[str],
+                                reconciled_at: datetime) -> List[str]:
+        """Write reconciled ledgers, returning the volunteers whose ledger changed under the reconcile"""
+        await self.ledger_collection.bulk_write(operations, ordered=False)
+        return await self.ledger_collection.distinct(
+            "_id", {"_id": {"$in": volunteer_ids}, "updated_at": {"$ne": reconciled_at}}
+        )
+
+    async def _hold_hours(self, volunteer_id: str, hours: float) -> bool:
+        """Atomically reserve hours from the volunteer's available balance"""
+        if hours <= 0:
+            return True
+        result = await self.ledger_collection.update_one(
+            {"_id": volunteer_id, "available": {"$gte": hours}},
+            {"$inc": {"held": hours, "available": -hours},
+             "$set": {"updated_at": datetime.now()}}
+        )
+        return result.modified_count > 0
 
     # Experience Registration
     async def register_for_experience(self, volunteer_id: str, experience_id: str) -> bool:
         """Register volunteer for an experience"""
-        # Check if experience exists and is available
-        experience = await self.get_experience(experience_id)
-        if not experience or not experience.is_active:
-            return False
-        
-        # Check registration deadline
-        if experience.registration_deadline and datetime.now() > experience.registration_deadline:
-            return False
-        
-        # Check if volunteer has enough hours
-        available_hours = await self.get_available_hours(volunteer_id)
-        if available_hours < experience.hours_required:
+        # Claim a seat: the filter checks availability, deadline and capacity
+        # so concurrent sign-ups can never oversell the experience
+        now = datetime.now()
+        experience = await self.experiences_collection.find_one_and_update(
+            {
+                "_id": ObjectId(experience_id),
+                "is_active": True,
+                "allocation_mode": {"$ne": "lottery"},
+                "$or": [
+                    {"registration_deadline": None},
+                    {"registration_deadline": {"$gte": now}}
+                ],
+                "$expr": {"$lt": [{"$ifNull": ["$seats_taken", 0]}, "$max_participants"]}
+            },
+            {"$inc": {"seats_taken": 1}},
+            projection={"hours_required": 1}
+        )
+        if not experience:
             return False
         
-        # Check if already registered
-        existing = await self.registrations_collection.find_one({
-            "experience_id": experience_id,
-            "volunteer_id": volunteer_id
-        })
-        if existing:
+        # Hold the hours on the volunteer's balance
+        hours_required = experience["hours_required"]
+        if not await self._hold_hours(volunteer_id, hours_required):
+            await self._release_seat(experience_id)
             return False
         
-        # Check participant limit
-        current_registrations = await self.registrations_collection.count_documents({
-            "experience_id": experience_id,
-            "registration_status": {"$in": ["registered", "confirmed"]}
-        })
-        
-        if current_registrations >= experience.max_participants:
-            return False
-        
-        # Create registration
+        # Create registration; the unique index rejects duplicate sign-ups
         registration = ExperienceRegistration(
             experience_id=experience_id,
             volunteer_id=volunteer_id,
-            hours_spent=experience.hours_required
+            hours_spent=hours_required
         )
+        try:
+            await self.registrations_collection.insert_one(registration.model_dump())
+        except DuplicateKeyError:
+            await self._adjust_ledger(volunteer_id, held=-hours_required)
+            await self._release_seat(experience_id)
+            return False
         
-        result = await self.registrations_collection.insert_one(registration.model_dump())
-        return result.inserted_id is not None
+        return True
+
+    async def _release_seat(self, experience_id: str):
+        """Give a claimed seat back to the experience"""
+        await self.experiences_collection.update_one(
+            {"_id": ObjectId(experience_id), "seats_taken": {"$gt": 0}},
+            {"$inc": {"seats_taken": -1}}
+        )
+
+    async def reconcile_seat_counts(self) -> int:
+        """Rebuild experience seat counters from the registrations"""
+        pipeline = [
+            {"$match": {"registration_status": {"$ne": "cancelled"}}},
+            {"$group": {"_id": "$experience_id", "seats": {"$sum": 1}}}
+        ]
+        operations = []
+        experience_ids = []
+        async for row in self.registrations_collection.aggregate(pipeline):
+            experience_ids.append(ObjectId(row["_id"]))
+            operations.append(UpdateOne(
+                {"_id": experience_ids[-1]},
+                {"$set": {"seats_taken": row["seats"]}}
+            ))
+        
+        if operations:
+            await self.experiences_collection.bulk_write(operations, ordered=False)
+        await self.experiences_collection.update_many(
+            {"_id": {"$nin": experience_ids}},
+            {"$set": {"seats_taken": 0}}
+        )
+        return len(operations)
 
     async def confirm_registration(self, registration_id: str) -> bool:
         """Confirm a registration (admin action)"""
@@ -183,20 +402,54 @@ class TimeAuctionDAL:
         if feedback:
             update_data["feedback"] = feedback
         
-        result = await self.registrations_collection.update_one(
-            {"_id": ObjectId(registration_id)},
-            {"$set": update_data}
+        # Only the transition into "completed" moves hours into spent
+        registration = await self.registrations_collection.find_one_and_update(
+            {"_id": ObjectId(registration_id), "registration_status": {"$ne": "completed"}},
+            {"$set": update_data},
+            projection={"volunteer_id": 1, "hours_spent": 1, "registration_status": 1},
+            return_document=ReturnDocument.BEFORE
         )
+        if not registration:
+            return False
         
-        return result.modified_count > 0
+        hours = registration["hours_spent"]
+        # Convert the hold taken at registration into spent hours
+        held = 0.0 if registration["registration_status"] == "cancelled" else -hours
+        ledger = await self._adjust_ledger(
+            registration["volunteer_id"], spent=hours, held=held,
+            rating_total=rating or 0, rating_count=1 if rating else 0
+        )
+        if rating:
+            await self._update_volunteer_badges(ledger, rating_delta=rating, rating_count_delta=1)
+        return True
 
     async def cancel_registration(self, registration_id: str) -> bool:
         """Cancel a registration"""
-        result = await self.registrations_collection.update_one(
-            {"_id": ObjectId(registration_id)},
-            {"$set": {"registration_status": "cancelled"}}
+        registration = await self.registrations_collection.find_one_and_update(
+            {"_id": ObjectId(registration_id), "registration_status": {"$ne": "cancelled"}},
+            {"$set": {"registration_status": "cancelled"}},
+            projection={"experience_id": 1, "volunteer_id": 1, "hours_spent": 1,
+                        "registration_status": 1, "completion_rating": 1},
+            return_document=ReturnDocument.BEFORE
         )
-        return result.modified_count > 0
+        if not registration:
+            return False
+        
+        hours = registration["hours_spent"]
+        if registration["registration_status"] == "completed":
+            # Refund hours that had already been spent and drop the rating
+            rating = registration.get("completion_rating")
+            ledger = await self._adjust_ledger(
+                registration["volunteer_id"], spent=-hours,
+                rating_total=-(rating or 0), rating_count=-1 if rating else 0
+            )
+            if rating:
+                await self._update_volunteer_badges(ledger, rating_delta=-rating, rating_count_delta=-1)
+        else:
+            # Release the hold and the seat
+            await self._adjust_ledger(registration["volunteer_id"], held=-hours)
+        await self._release_seat(registration["experience_id"])
+        return True
 
     async def get_volunteer_registrations(self, volunteer_id: str) -> List[dict]:
         """Get all registrations for a volunteer with experience details"""
@@ -215,85 +468,238 @@ class TimeAuctionDAL:
         cursor = self.registrations_collection.aggregate(pipeline)
         return await cursor.to_list(length=None)
 
-    # Badge System
-    async def _update_volunteer_badges(self, volunteer_id: str):
-        """Update volunteer's badges based on their hours and performance"""
-        total_hours = await self.get_volunteer_hours_balance(volunteer_id)
-        
-        # Calculate quality score based on ratings
-        quality_score = await self._calculate_quality_score(volunteer_id)
-        
-        # Define badge requirements
-        badge_tiers = [
-            {"type": "helper", "hours": 10, "quality": 3.0},
-            {"type": "mentor", "hours": 25, "quality": 3.5},
-            {"type": "expert", "hours": 50, "quality": 4.0},
-            {"type": "champion", "hours": 100, "quality": 4.5},
-            {"type": "legend", "hours": 200, "quality": 4.8}
-        ]
+    # Lottery Allocation
+    async def enter_experience_lottery(self, volunteer_id: str, experience_id: str,
+                                     bid_hours: float = None) -> bool:
+        """Enter a lottery-mode experience; seats are allocated at the deadline"""
+        experience = await self.experiences_collection.find_one(
+            {"_id": ObjectId(experience_id), "is_active": True,
+             "allocation_mode": "lottery", "allocated_at": None},
+            projection={"hours_required": 1, "registration_deadline": 1}
+        )
+        if not experience:
+            return False
+        if experience.get("registration_deadline") and datetime.now() > experience["registration_deadline"]:
+            return False
+        
+        # Volunteers may bid more than the minimum to improve their odds
+        bid_hours = max(bid_hours or 0, experience["hours_required"])
+        entry = ExperienceEntry(experience_id=experience_id, volunteer_id=volunteer_id, bid_hours=bid_hours)
+        try:
+            await self.entries_collection.insert_one(entry.model_dump())
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def allocate_due_experiences(self) -> Dict[str, List[str]]:
+        """Draw every lottery whose registration deadline has passed"""
+        cursor = self.experiences_collection.find(
+            {"allocation_mode": "lottery", "allocated_at": None,
+             "registration_deadline": {"$lte": datetime.now()}},
+            projection={"_id": 1}
+        )
+        allocations = {}
+        async for experience in cursor:
+            experience_id = str(experience["_id"])
+            allocations[experience_id] = await self.allocate_experience(experience_id)
+        return allocations
+
+    async def allocate_experience(self, experience_id: str, seed: int = None) -> List[str]:
+        """Assign the seats of a lottery experience in one batch"""
+        # Claim the draw so only one worker allocates each experience
+        experience = await self.experiences_collection.find_one_and_update(
+            {"_id": ObjectId(experience_id), "allocation_mode": "lottery", "allocated_at": None},
+            {"$set": {"allocated_at": datetime.now()}},
+            projection={"hours_required": 1, "max_participants": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not experience:
+            return []
+        
+        entries = await self.entries_collection.find(
+            {"experience_id": experience_id, "entry_status": "pending"},
+            projection={"volunteer_id": 1, "bid_hours": 1}
+        ).to_list(length=None)
+        volunteer_ids = [entry["volunteer_id"] for entry in entries]
+        
+        ledgers = {}
+        async for ledger_data in self.ledger_collection.find({"_id": {"$in": volunteer_ids}}):
+            ledgers[ledger_data["_id"]] = VolunteerHourLedger(**ledger_data)
         
-        badge_levels = ["bronze", "silver", "gold", "platinum", "diamond"]
-        
-        for badge_tier in badge_tiers:
-            if total_hours >= badge_tier["hours"] and quality_score >= badge_tier["quality"]:
-                # Determine badge level based on hours
-                level_index = min(len(badge_levels) - 1, int(total_hours / badge_tier["hours"]) - 1)
-                badge_level = badge_levels[level_index]
-                
-                # Check if badge already exists
-                existing_badge = await self.badges_collection.find_one({
-                    "volunteer_id": volunteer_id,
-                    "badge_type": badge_tier["type"],
-                    "badge_level": badge_level
-                })
-                
-                if not existing_badge:
-                    badge = VolunteerBadge(
-                        volunteer_id=volunteer_id,
-                        badge_type=badge_tier["type"],
-                        badge_level=badge_level,
-                        hours_requirement=badge_tier["hours"],
-                        quality_score=quality_score
-                    )
-                    await self.badges_collection.insert_one(badge.model_dump())
-
-    async def _calculate_quality_score(self, volunteer_id: str) -> float:
-        """Calculate volunteer's quality score based on ratings and feedback"""
+        # Previous completed or open registrations count against fairness
+        prior_wins = defaultdict(int)
         pipeline = [
-            {"$match": {
-                "volunteer_id": volunteer_id,
-                "registration_status": "completed",
-                "completion_rating": {"$exists": True}
-            }},
-            {"$group": {
-                "_id": None,
-                "avg_rating": {"$avg": "$completion_rating"},
-                "count": {"$sum": 1}
-            }}
+            {"$match": {"volunteer_id": {"$in": volunteer_ids}, "registration_status": {"$ne": "cancelled"}}},
+            {"$group": {"_id": "$volunteer_id", "count": {"$sum": 1}}}
         ]
+        async for row in self.registrations_collection.aggregate(pipeline):
+            prior_wins[row["_id"]] = row["count"]
         
-        result = await self.registrations_collection.aggregate(pipeline).to_list(1)
-        
-        if result and result[0]["count"] > 0:
-            return float(result[0]["avg_rating"])
+        candidates = rank_lottery_entries(
+            entries, ledgers, prior_wins, experience["hours_required"],
+            random.Random(seed if seed is not None else experience_id)
+        )
         
-        return 3.0  # Default score for new volunteers
+        # Hold hours for the best-ranked entrants, moving down the list
+        # whenever a balance changed since it was read
+        seats = experience["max_participants"]
+        winners = []
+        position = 0
+        while len(winners) < seats and position < len(candidates):
+            batch = candidates[position:position + seats - len(winners)]
+            position += len(batch)
+            held = await asyncio.gather(*[
+                self._hold_hours(entry["volunteer_id"], entry["bid_hours"]) for entry in batch
+            ])
+            winners.extend(entry for entry, ok in zip(batch, held) if ok)
+        
+        registrations = [
+            ExperienceRegistration(
+                experience_id=experience_id,
+                volunteer_id=entry["volunteer_id"],
+                hours_spent=entry["bid_hours"]
+            ).model_dump()
+            for entry in winners
+        ]
+        if registrations:
+            try:
+                await self.registrations_collection.insert_many(registrations, ordered=False)
+            except BulkWriteError as exc:
+                # Release holds for entrants that somehow already had a registration
+                failed = {error["index"] for error in exc.details["writeErrors"]}
+                for index in failed:
+                    await self._adjust_ledger(winners[index]["volunteer_id"], held=-winners[index]["bid_hours"])
+                winners = [entry for index, entry in enumerate(winners) if index not in failed]
+        
+        winner_ids = [entry["volunteer_id"] for entry in winners]
+        if entries:
+            await self.entries_collection.update_many(
+                {"experience_id": experience_id, "volunteer_id": {"$in": winner_ids}},
+                {"$set": {"entry_status": "won"}}
+            )
+            await self.entries_collection.update_many(
+                {"experience_id": experience_id, "entry_status": "pending"},
+                {"$set": {"entry_status": "lost"}}
+            )
+        await self.experiences_collection.update_one(
+            {"_id": ObjectId(experience_id)},
+            {"$set": {"seats_taken": len(winners)}}
+        )
+        return winner_ids
+
+    # Badge System
+    async def _update_volunteer_badges(self, ledger: VolunteerHourLedger, earned_delta: float = 0.0,
+                                     rating_delta: float = 0.0, rating_count_delta: int = 0):
+        """Award badges whose thresholds were crossed by the latest ledger change"""
+        await self._write_badges(self._crossed_badges(ledger, earned_delta, rating_delta, rating_count_delta))
+
+    async def evaluate_badges_many(self, verifications: List[dict]) -> int:
+        """Award badges for many verifications in one bulk write.
+
+        Each verification carries the ledger totals its own update left
+        behind, so crossings are found even when later verifications for the
+        same volunteer have already moved the ledger on.
+        """
+        # Verifications published before the totals were carried fall back to the current ledger
+        current = {}
+        legacy = [verification["volunteer_id"] for verification in verifications if "earned" not in verification]
+        if legacy:
+            async for ledger_data in self.ledger_collection.find({"_id": {"$in": legacy}}):
+                current[ledger_data["_id"]] = VolunteerHourLedger(**ledger_data)
+
+        badges = {}
+        for verification in verifications:
+            if "earned" in verification:
+                ledger = VolunteerHourLedger(
+                    volunteer_id=verification["volunteer_id"],
+                    earned=verification["earned"],
+                    rating_total=verification["rating_total"],
+                    rating_count=verification["rating_count"]
+                )
+            else:
+                ledger = current.get(verification["volunteer_id"])
+                if not ledger:
+                    continue
+            for badge in self._crossed_badges(ledger, earned_delta=verification["hours"]):
+                badges[(badge.volunteer_id, badge.badge_type, badge.badge_level)] = badge
+        await self._write_badges(list(badges.values()))
+        return len(badges)
+
+    async def reevaluate_badges(self, batch_size: int = 1000) -> int:
+        """Award any badge a volunteer's ledger qualifies for but is missing, e.g. after thresholds change"""
+        awarded = 0
+        badges = []
+        async for ledger_data in self.ledger_collection.find({"earned": {"$gt": 0}}):
+            ledger = VolunteerHourLedger(**ledger_data)
+            # Measured from an empty ledger, every badge the current totals earn is "crossed"
+            badges.extend(self._crossed_badges(
+                ledger, earned_delta=ledger.earned,
+                rating_delta=ledger.rating_total, rating_count_delta=ledger.rating_count
+            ))
+            if len(badges) >= batch_size:
+                awarded += await self._write_badges(badges)
+                badges = []
+        return awarded + await self._write_badges(badges)
+
+    async def _write_badges(self, badges: List[VolunteerBadge]) -> int:
+        """Upsert badges in one round trip, returning how many were new"""
+        if not badges:
+            return 0
+        # The unique index makes re-awarding a no-op
+        result = await self.badges_collection.bulk_write([
+            UpdateOne(
+                {"volunteer_id": badge.volunteer_id, "badge_type": badge.badge_type, "badge_level": badge.badge_level},
+                {"$setOnInsert": badge.model_dump()},
+                upsert=True
+            )
+            for badge in badges
+        ], ordered=False)
+        if self.push_hub:
+            for index in result.upserted_ids:
+                badge = badges[index]
+                self.push_hub.publish(volunteer_topic(badge.volunteer_id), "badge", badge.model_dump(mode="json"),
+                                      key=f"{badge.badge_type}:{badge.badge_level}")
+        return result.upserted_count
+
+    def _crossed_badges(self, ledger: VolunteerHourLedger, earned_delta: float = 0.0,
+                        rating_delta: float = 0.0, rating_count_delta: int = 0) -> List[VolunteerBadge]:
+        """Badges for thresholds crossed between the previous and current ledger"""
+        previous = ledger.model_copy(update={
+            "earned": ledger.earned - earned_delta,
+            "rating_total": ledger.rating_total - rating_delta,
+            "rating_count": ledger.rating_count - rating_count_delta
+        })
+        earned_badges = get_badge_levels(ledger.earned, ledger.quality_score)
+        if earned_badges <= get_badge_levels(previous.earned, previous.quality_score):
+            return []
+        
+        return [
+            VolunteerBadge(
+                volunteer_id=ledger.volunteer_id,
+                badge_type=badge_type,
+                badge_level=badge_level,
+                hours_requirement=hours_requirement,
+                quality_score=ledger.quality_score
+            )
+            for badge_type, badge_level, hours_requirement in sorted(earned_badges)
+        ]
 
     async def get_volunteer_badges(self, volunteer_id: str) -> List[VolunteerBadge]:
         """Get all badges for a volunteer"""
-        cursor = self.badges_collection.find({"volunteer_id": volunteer_id}).sort("earned_at", -1)
-        badges = []
-        async for badge_data in cursor:
-            badges.append(VolunteerBadge(**badge_data))
-        return badges
+        cursor = self.badges_collection.find(
+            {"volunteer_id": volunteer_id}, projection=db_projection(VolunteerBadge)
+        ).sort("earned_at", -1)
+        return [from_db(VolunteerBadge, badge_data) async for badge_data in cursor]
 
     async def get_volunteer_stats(self, volunteer_id: str) -> dict:
         """Get comprehensive volunteer statistics"""
-        total_hours = await self.get_volunteer_hours_balance(volunteer_id)
-        spent_hours = await self.get_volunteer_hours_spent(volunteer_id)
-        available_hours = total_hours - spent_hours
+        ledger = await self.get_hour_ledger(volunteer_id)
+        total_hours = ledger.earned
+        spent_hours = ledger.spent
+        available_hours = ledger.available
+        held_hours = ledger.held
         
-        quality_score = await self._calculate_quality_score(volunteer_id)
+        quality_score = ledger.quality_score
         badges = await self.get_volunteer_badges(volunteer_id)
         
         # Get activity breakdown
@@ -318,6 +724,7 @@ class TimeAuctionDAL:
             "total_hours": total_hours,
             "spent_hours": spent_hours,
             "available_hours": available_hours,
+            "held_hours": held_hours,
             "quality_score": quality_score,
             "badges_count": len(badges),
             "latest_badge": badges[0] if badges else None,
@@ -326,16 +733,44 @@ class TimeAuctionDAL:
 
     # Leaderboard
     async def get_volunteer_leaderboard(self, period: str = "all_time", limit: int = 10) -> List[dict]:
-        """Get volunteer leaderboard"""
+        """Get volunteer leaderboard from the in-memory standings"""
+        rows = self.leaderboard.top(limit, period)
+        names = await self._get_volunteer_names([row["member_id"] for row in rows])
+        return [self._leaderboard_entry(row, names) for row in rows]
+
+    async def get_volunteer_rank(self, volunteer_id: str, period: str = "all_time") -> Optional[dict]:
+        """Get a volunteer's own leaderboard position"""
+        row = self.leaderboard.rank(volunteer_id, period)
+        if not row:
+            return None
+        names = await self._get_volunteer_names([volunteer_id])
+        return self._leaderboard_entry(row, names)
+
+    def _leaderboard_entry(self, row: dict, names: Dict[str, Optional[str]]) -> dict:
+        return {
+            "volunteer_id": row["member_id"],
+            "name": names.get(row["member_id"]),
+            "total_hours": row["score"],
+            "activity_count": row["count"],
+            "rank": row["rank"]
+        }
+
+    async def _get_volunteer_names(self, volunteer_ids: List[str]) -> Dict[str, Optional[str]]:
+        """Resolve display names, querying only the ones not cached yet"""
+        missing = [vid for vid in volunteer_ids if vid not in self._volunteer_names]
+        if missing:
+            cursor = self.users_collection.find({"_id": {"$in": missing}}, projection={"full_name": 1})
+            async for user in cursor:
+                self._volunteer_names[user["_id"]] = user.get("full_name")
+            for vid in missing:
+                self._volunteer_names.setdefault(vid, None)
+        return {vid: self._volunteer_names[vid] for vid in volunteer_ids}
+
+    async def _leaderboard_rows(self, since: Optional[datetime]):
+        """Aggregate verified hours per volunteer, used to rebuild the standings"""
         match_stage = {"is_verified": True}
-        
-        if period == "this_month":
-            start_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            match_stage["created_at"] = {"$gte": start_of_month}
-        elif period == "this_week":
-            start_of_week = datetime.now() - timedelta(days=datetime.now().weekday())
-            start_of_week = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
-            match_stage["created_at"] = {"$gte": start_of_week}
+        if since:
+            match_stage["created_at"] = {"$gte": since}
         
         pipeline = [
             {"$match": match_stage},
@@ -343,41 +778,140 @@ class TimeAuctionDAL:
                 "_id": "$volunteer_id",
                 "total_hours": {"$sum": "$hours_earned"},
                 "activity_count": {"$sum": 1}
-            }},
-            {"$lookup": {
-                "from": "users",
-                "localField": "_id",
-                "foreignField": "_id",
-                "as": "user"
-            }},
-            {"$unwind": "$user"},
-            {"$sort": {"total_hours": -1}},
-            {"$limit": limit},
-            {"$project": {
-                "volunteer_id": "$_id",
-                "name": "$user.full_name",
-                "total_hours": 1,
-                "activity_count": 1
             }}
         ]
-        
-        cursor = self.volunteer_hours_collection.aggregate(pipeline)
-        return await cursor.to_list(length=None)
+        async for row in self.volunteer_hours_collection.aggregate(pipeline):
+            yield {"member_id": row["_id"], "score": row["total_hours"], "count": row["activity_count"]}
 
     # Admin Functions
-    async def get_pending_verifications(self) -> List[dict]:
-        """Get hours that need verification"""
-        pipeline = [
-            {"$match": {"is_verified": False}},
-            {"$lookup": {
-                "from": "users",
-                "localField": "volunteer_id",
-                "foreignField": "_id",
-                "as": "volunteer"
-            }},
-            {"$unwind": "$volunteer"},
-            {"$sort": {"created_at": -1}}
-        ]
+    async def get_pending_verifications(self, limit: int = 50, cursor: str = None) -> dict:
+        """Get a page of hours that need verification, newest first"""
+        query = {"is_verified": False}
+        if cursor:
+            # Keyset cursor: continue strictly after the last (created_at, _id) seen
+            try:
+                created_at, log_id = cursor.rsplit("_", 1)
+                created_at, log_id = datetime.fromisoformat(created_at), ObjectId(log_id)
+            except (ValueError, InvalidId):
+                raise ValueError(f"Invalid cursor {cursor!r}") from None
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": log_id}}
+            ]
+        
+        logs = await self.volunteer_hours_collection.find(
+            query,
+            projection={"volunteer_id": 1, "activity_type": 1, "hours_earned": 1,
+                        "description": 1, "created_at": 1}
+        ).sort([("created_at", -1), ("_id", -1)]).limit(limit).to_list(length=limit)
+        
+        names = await self._get_volunteer_names(list({log["volunteer_id"] for log in logs}))
+        items = []
+        for log in logs:
+            log["id"] = str(log.pop("_id"))
+            log["volunteer_name"] = names.get(log["volunteer_id"])
+            items.append(log)
+        
+        next_cursor = None
+        if len(logs) == limit:
+            next_cursor = f"{logs[-1]['created_at'].isoformat()}_{logs[-1]['id']}"
+        return {"items": items, "next_cursor": next_cursor}
+
+    async def bulk_verify_volunteer_hours(self, log_ids: List[str], verified_by: str,
+                                        verification_notes: str = None) -> int:
+        """Verify many logged hours at once, updating each volunteer once"""
+        invalid = [log_id for log_id in log_ids if not ObjectId.is_valid(log_id)]
+        if invalid:
+            raise ValueError(f"Invalid hour log ids {invalid!r}")
+        object_ids = [ObjectId(log_id) for log_id in log_ids]
+        batch_id = str(uuid4())
+        
+        # Tag the logs this call actually flips, so concurrent verifiers never double count
+        result = await self.volunteer_hours_collection.update_many(
+            {"_id": {"$in": object_ids}, "is_verified": False},
+            {"$set": {
+                "is_verified": True,
+                "verified_by": verified_by,
+                "verification_notes": verification_notes,
+                "verified_at": datetime.now(),
+                "verification_batch": batch_id
+            }}
+        )
+        if result.modified_count == 0:
+            return 0
         
-        cursor = self.volunteer_hours_collection.aggregate(pipeline)
-        return await cursor.to_list(length=None)
+        verified_hours = defaultdict(float)
+        cursor = self.volunteer_hours_collection.find(
+            {"_id": {"$in": object_ids}, "verification_batch": batch_id},
+            projection={"volunteer_id": 1, "hours_earned": 1, "created_at": 1}
+        )
+        async for log_data in cursor:
+            verified_hours[log_data["volunteer_id"]] += log_data["hours_earned"]
+            self.leaderboard.record(log_data["volunteer_id"], log_data["hours_earned"], at=log_data["created_at"])
+        
+        await asyncio.gather(*[
+            self._apply_verified_hours(volunteer_id, hours)
+            for volunteer_id, hours in verified_hours.items()
+        ])
+        return result.modified_count
+
+    async def _apply_verified_hours(self, volunteer_id: str, hours: float):
+        """Move verified hours from pending to earned and update badges"""
+        ledger = await self._adjust_ledger(volunteer_id, earned=hours, pending=-hours)
+        if self.event_bus:
+            # Badges are evaluated in batches by the hours_verified consumer, against this update's totals
+            await self.event_bus.publish(HOURS_VERIFIED, {
+                "volunteer_id": volunteer_id,
+                "hours": hours,
+                "earned": ledger.earned,
+                "rating_total": ledger.rating_total,
+                "rating_count": ledger.rating_count
+            })
+        else:
+            await self._update_volunteer_badges(ledger, earned_delta=hours)
+
+
+def rank_lottery_entries(entries: List[dict], ledgers: Dict[str, VolunteerHourLedger],
+                         prior_wins: Dict[str, int], hours_required: float,
+                         rng: random.Random) -> List[dict]:
+    """Order eligible lottery entries by a weighted random draw.
+
+    Each entry's weight grows with its bid and the volunteer's quality score
+    and shrinks with the number of experiences they already hold, so regular
+    winners don't crowd out newcomers. Sorting by u ** (1 / weight) is a
+    weighted sample without replacement (Efraimidis-Spirakis).
+    """
+    keyed = []
+    for entry in entries:
+        ledger = ledgers.get(entry["volunteer_id"]) or VolunteerHourLedger(volunteer_id=entry["volunteer_id"])
+        if ledger.available < entry["bid_hours"]:
+            continue
+        weight = (entry["bid_hours"] / max(hours_required, 1)) \
+            * (ledger.quality_score / 3.0) \
+            / (1 + prior_wins.get(entry["volunteer_id"], 0))
+        weight = max(weight, 1e-6)
+        keyed.append((rng.random() ** (1 / weight), entry))
+    keyed.sort(key=lambda pair: pair[0], reverse=True)
+    return [entry for _, entry in keyed]
+
+
+# Badge requirements, lowest tier first
+BADGE_TIERS = [
+    {"type": "helper", "hours": 10, "quality": 3.0},
+    {"type": "mentor", "hours": 25, "quality": 3.5},
+    {"type": "expert", "hours": 50, "quality": 4.0},
+    {"type": "champion", "hours": 100, "quality": 4.5},
+    {"type": "legend", "hours": 200, "quality": 4.8}
+]
+
+BADGE_LEVELS = ["bronze", "silver", "gold", "platinum", "diamond"]
+
+def get_badge_levels(total_hours: float, quality_score: float) -> set:
+    """Get the (type, level, hours) badges a volunteer qualifies for"""
+    badges = set()
+    for badge_tier in BADGE_TIERS:
+        if total_hours >= badge_tier["hours"] and quality_score >= badge_tier["quality"]:
+            # Determine badge level based on hours
+            level_index = min(len(BADGE_LEVELS) - 1, int(total_hours / badge_tier["hours"]) - 1)
+            badges.add((badge_tier["type"], BADGE_LEVELS[level_index], badge_tier["hours"]))
+    return badges
@@ -0,0 +1,187 @@
+# Admin Watchlist: batch risk scoring of students and inactive parents
+from .models import WatchlistEntry, db_projection, from_db
+from .score_history import month_start
+from .indexes import declare_index, declare_query
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+from typing import Dict, List, Optional
+from collections import defaultdict
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+# Risk rules, mirroring the admin dashboard
+LOW_SCORE = 70           # average below this is low performance
+DECLINE_POINTS = 15      # drop across the recent scores that counts as declining
+INACTIVE_DAYS = 14       # parent considered disengaged after this many days
+LOOKBACK_DAYS = 28       # window of scores considered
+RECENT_SCORES = 3
+
+class WatchlistDAL:
+    INDEXES = [
+        declare_index("watchlist_collection", ("risk_score", -1)),
+        declare_index("watchlist_collection", ("performance_risk", -1)),
+        declare_index("watchlist_collection", ("engagement_risk", -1)),
+        declare_index("watchlist_collection", ("school", 1), ("risk_score", -1)),
+    ]
+    QUERIES = [
+        declare_query("watchlist_collection", {"risk_score": {"$gt": 0}}, [("risk_score", -1)]),
+        declare_query("watchlist_collection", {"engagement_risk": {"$gt": 0}}, [("engagement_risk", -1)]),
+        declare_query("watchlist_collection", {"risk_score": {"$gt": 0}, "school": "demo"}, [("risk_score", -1)]),
+    ]
+
+    def __init__(self,
+                 watchlist_collection: AsyncIOMotorCollection,
+                 student_collection: AsyncIOMotorCollection,
+                 score_buckets_collection: AsyncIOMotorCollection,
+                 streaks_collection: AsyncIOMotorCollection):
+        self.watchlist_collection = watchlist_collection
+        self.student_collection = student_collection
+        self.score_buckets_collection = score_buckets_collection
+        self.streaks_collection = streaks_collection
+
+    # Reads
+    async def get_watchlist(self, kind: str = None, school: str = None, limit: int = 20) -> List[WatchlistEntry]:
+        """Get the highest-risk students, optionally by kind of risk"""
+        sort_field = {"performance": "performance_risk", "engagement": "engagement_risk"}.get(kind, "risk_score")
+        query = {sort_field: {"$gt": 0}}
+        if school:
+            query["school"] = school
+        cursor = self.watchlist_collection.find(
+            query, projection=db_projection(WatchlistEntry)
+        ).sort(sort_field, -1).limit(limit)
+        return [from_db(WatchlistEntry, entry) async for entry in cursor]
+
+    # Scoring job
+    async def refresh(self, chunk_size: int = 500, now: datetime = None) -> int:
+        """Score every student in chunks and replace the watchlist, returning its size"""
+        now = now or datetime.now()
+        run_id = str(uuid4())
+        flagged = 0
+        chunk = []
+        cursor = self.student_collection.find({}, projection={"name": 1, "guardian_name": 1, "school": 1})
+        async for student in cursor:
+            chunk.append(student)
+            if len(chunk) >= chunk_size:
+                flagged += await self._score_chunk(chunk, run_id, now)
+                chunk = []
+        if chunk:
+            flagged += await self._score_chunk(chunk, run_id, now)
+
+        # Drop students who are no longer at risk, leaving rows of any run that started after this one
+        await self.watchlist_collection.delete_many({"run_id": {"$ne": run_id}, "scored_at": {"$lt": now}})
+        return flagged
+
+    async def _score_chunk(self, students: List[dict], run_id: str, now: datetime) -> int:
+        student_ids = [str(student["_id"]) for student in students]
+        samples = await self._recent_samples(student_ids, now - timedelta(days=LOOKBACK_DAYS))
+        activity = await self._activity(student_ids)
+
+        # Columns for the chunk, one value per student
+        scores = [[score for _, score in samples[sid]] for sid in student_ids]
+        averages = [_mean(values) for values in scores]
+        changes = [values[-1] - values[-RECENT_SCORES:][0] if len(values) >= 2 else None for values in scores]
+        last_seen = [
+            max(filter(None, (activity[sid]["last_activity"], samples[sid][-1][0] if samples[sid] else None)),
+                default=None)
+            for sid in student_ids
+        ]
+        days_inactive = [(now - seen).days if seen else None for seen in last_seen]
+        streaks = [activity[sid]["current_streak"] for sid in student_ids]
+
+        performance_risk = score_performance(averages, changes)
+        engagement_risk = score_engagement(days_inactive)
+
+        operations = []
+        for index, student in enumerate(students):
+            risk = performance_risk[index] + engagement_risk[index]
+            if risk <= 0:
+                continue
+            entry = WatchlistEntry(
+                student_id=student_ids[index],
+                student_name=student.get("name"),
+                guardian_name=student.get("guardian_name"),
+                school=student.get("school"),
+                risk_score=risk,
+                performance_risk=performance_risk[index],
+                engagement_risk=engagement_risk[index],
+                reasons=risk_reasons(averages[index], changes[index], days_inactive[index]),
+                average_score=averages[index],
+                score_change=changes[index],
+                days_inactive=days_inactive[index],
+                current_streak=streaks[index],
+                run_id=run_id,
+                scored_at=now
+            )
+            # A row scored by a later, overlapping run is left as it is
+            operations.append(ReplaceOne(
+                {"_id": entry.student_id, "scored_at": {"$lte": now}}, entry.model_dump(), upsert=True
+            ))
+        if operations:
+            try:
+                await self.watchlist_collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as exc:
+                # The filter missed a newer row, so the upsert hit its _id
+                if any(error["code"] != 11000 for error in exc.details["writeErrors"]):
+                    raise
+        return len(operations)
+
+    async def _recent_samples(self, student_ids: List[str], since: datetime) -> Dict[str, List[tuple]]:
+        """(recorded_at, score) since `since` per student, oldest first, from the monthly buckets"""
+        samples = defaultdict(list)
+        cursor = self.score_buckets_collection.find(
+            {"student_id": {"$in": student_ids}, "month": {"$gte": month_start(since)}},
+            projection={"_id": 0, "student_id": 1, "samples.score": 1, "samples.recorded_at": 1}
+        )
+        async for bucket in cursor:
+            samples[bucket["student_id"]].extend(
+                (sample["recorded_at"], sample["score"]) for sample in bucket["samples"]
+                if sample["recorded_at"] >= since
+            )
+        for rows in samples.values():
+            rows.sort()
+        return samples
+
+    async def _activity(self, student_ids: List[str]) -> Dict[str, dict]:
+        """Latest parent activity and best running streak per student"""
+        activity = defaultdict(lambda: {"last_activity": None, "current_streak": 0})
+        cursor = self.streaks_collection.find(
+            {"student_id": {"$in": student_ids}},
+            projection={"_id": 0, "student_id": 1, "current_streak": 1, "last_activity_date": 1}
+        )
+        async for streak in cursor:
+            row = activity[streak["student_id"]]
+            last_activity = streak.get("last_activity_date")
+            if last_activity and (row["last_activity"] is None or last_activity > row["last_activity"]):
+                row["last_activity"] = last_activity
+            row["current_streak"] = max(row["current_streak"], streak.get("current_streak", 0))
+        return activity
+
+
+def score_performance(averages: List[Optional[float]], changes: List[Optional[float]]) -> List[float]:
+    """Performance risk per student: how far below LOW_SCORE, plus how steep the decline"""
+    low = [max(0.0, LOW_SCORE - average) if average is not None else 0.0 for average in averages]
+    decline = [max(0.0, -change - DECLINE_POINTS + 1) if change is not None else 0.0 for change in changes]
+    return [round(l + 2 * d, 1) for l, d in zip(low, decline)]
+
+def score_engagement(days_inactive: List[Optional[int]]) -> List[float]:
+    """Engagement risk per student: days inactive past INACTIVE_DAYS (never active ranks lowest)"""
+    return [
+        1.0 if days is None else float(max(0, days - INACTIVE_DAYS + 1))
+        for days in days_inactive
+    ]
+
+def risk_reasons(average: Optional[float], change: Optional[float], days_inactive: Optional[int]) -> List[str]:
+    reasons = []
+    if average is not None and average < LOW_SCORE:
+        reasons.append("low_performance")
+    if change is not None and change <= -DECLINE_POINTS:
+        reasons.append("declining_scores")
+    if days_inactive is None:
+        reasons.append("never_active")
+    elif days_inactive >= INACTIVE_DAYS:
+        reasons.append("inactive_parent")
+    return reasons
+
+def _mean(values: List[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
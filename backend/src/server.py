@@ -1,12 +1,17 @@
 from contextlib import asynccontextmanager
 from datetime import datetime
+import argparse
+import importlib.util
+import math
 import os
 import sys
 
 from bson import ObjectId
-from fastapi import FastAPI, status, UploadFile, Form, File
+from fastapi import FastAPI, status, UploadFile, Form, File, Body, Depends, HTTPException, Request, WebSocket
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel
+import orjson
 import uvicorn
 
 from core import *
@@ -14,12 +19,109 @@ from core import *
 MONGODB_URI = os.environ["MONGODB_URI"]
 DEBUG = os.environ.get("DEBUG", "").strip().lower() in {"1", "true", "on", "yes"}
 
+# Serving: one worker process per core unless told otherwise (reload needs a single process)
+WORKERS = 1 if DEBUG else int(os.environ.get("WEB_CONCURRENCY", 0)) or os.cpu_count() or 1
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", 3001))
+GRACEFUL_SHUTDOWN_TIMEOUT = int(os.environ.get("GRACEFUL_SHUTDOWN_TIMEOUT", 30))
+
+# Motor pool per worker process; the default splits Motor's usual 100 connections across workers
+MONGODB_POOL_OPTIONS = {
+    "maxPoolSize": int(os.environ.get("MONGODB_MAX_POOL_SIZE", max(10, 100 // WORKERS))),
+    "minPoolSize": int(os.environ.get("MONGODB_MIN_POOL_SIZE", 0)),
+    "maxIdleTimeMS": int(os.environ.get("MONGODB_MAX_IDLE_TIME_MS", 60000)),
+    "waitQueueTimeoutMS": int(os.environ.get("MONGODB_WAIT_QUEUE_TIMEOUT_MS", 5000)),
+    "serverSelectionTimeoutMS": int(os.environ.get("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 5000)),
+    "connectTimeoutMS": int(os.environ.get("MONGODB_CONNECT_TIMEOUT_MS", 5000)),
+}
+
+# Admission control: (per user, per route) token buckets for expensive endpoints
+ADMISSION_LIMITS = {
+    "sign_in": (RateLimit(rate=5 / 60, burst=10), RateLimit(rate=50, burst=100)),
+    "grading": (RateLimit(rate=1 / 10, burst=3), RateLimit(rate=20, burst=40)),
+    "reports": (RateLimit(rate=1 / 30, burst=2), RateLimit(rate=1, burst=5)),
+}
+# Buckets must be shared once there are several workers
+RATE_LIMIT_STORE = os.environ.get("RATE_LIMIT_STORE", "mongo" if WORKERS > 1 else "memory")
+# Grading calls the model backend; cap them across all workers, queueing briefly
+GRADING_CONCURRENCY_TOTAL = int(os.environ.get("GRADING_CONCURRENCY", 8))
+GRADING_CONCURRENCY = max(1, GRADING_CONCURRENCY_TOTAL // WORKERS)
+if GRADING_CONCURRENCY_TOTAL < WORKERS:
+    # Each worker needs a slot of its own, so the cap can't hold
+    print(f"GRADING_CONCURRENCY={GRADING_CONCURRENCY_TOTAL} is below the {WORKERS} workers, so up to {WORKERS} "
+          "gradings can run at once; raise it or lower WEB_CONCURRENCY")
+GRADING_QUEUE_SIZE = int(os.environ.get("GRADING_QUEUE_SIZE", 4 * GRADING_CONCURRENCY))
+GRADING_QUEUE_TIMEOUT = float(os.environ.get("GRADING_QUEUE_TIMEOUT", 10))
+
+# Push updates: batches must reach every worker's WebSocket clients once there are several
+PUSH_BROADCAST = os.environ.get("PUSH_BROADCAST", "mongo" if WORKERS > 1 else "memory")
+PUSH_FLUSH_INTERVAL = float(os.environ.get("PUSH_FLUSH_INTERVAL", 0.25))
+
+# Request instrumentation: log requests over either budget (0 disables), explain new query shapes
+instrumentation = RequestInstrumentation(
+    slow_request_ms=float(os.environ.get("SLOW_REQUEST_MS", 1000)),
+    round_trip_budget=int(os.environ.get("REQUEST_ROUND_TRIP_BUDGET", 20)),
+    explain_plans=os.environ.get("EXPLAIN_QUERY_PLANS", "").strip().lower() in {"1", "true", "on", "yes"},
+)
+
+
+class ModelResponse(ORJSONResponse):
+    """Serializes models straight to JSON with orjson, skipping FastAPI's response validation.
+
+    For list endpoints whose DAL already built the models from trusted
+    documents (see core.models.from_db).
+    """
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_dump_model)
+
+def _dump_model(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True)
+    raise TypeError
+
+
+def admission(route: str, user_param: str = None):
+    """Dependency applying a route's rate limits, keyed by a query parameter or else the client address"""
+    user_limit, route_limit = ADMISSION_LIMITS[route]
+    async def admit(request: Request):
+        user = (user_param and request.query_params.get(user_param)) or (request.client.host if request.client else None)
+        await app.admission.admit(route, user, user_limit, route_limit)
+    return Depends(admit)
+
+
+class InstrumentationMiddleware:
+    """Attributes the Mongo commands and latency of each request to its route"""
+    def __init__(self, app, instrumentation: RequestInstrumentation):
+        self.app = app
+        self.instrumentation = instrumentation
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        trace = self.instrumentation.begin()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router leaves the matched route in the scope; group by its path template
+            route = scope.get("route")
+            self.instrumentation.finish(trace, f"{scope['method']} {route.path if route else '(unmatched)'}", status_code)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup:
-    client = AsyncIOMotorClient(MONGODB_URI,tlsAllowInvalidCertificates=True)
+    client = AsyncIOMotorClient(MONGODB_URI, tlsAllowInvalidCertificates=True,
+                                event_listeners=[instrumentation.monitor], **MONGODB_POOL_OPTIONS)
     database = client.get_default_database()
+    instrumentation.client = client
 
     # Ensure the database is available:
     pong = await database.command("ping")
@@ -36,14 +138,160 @@ async def lifespan(app: FastAPI):
 
     app.assignment_dal = AssignmentDAL(assignment_collection)
 
+    app.event_bus = EventBus(database.get_collection("event_outbox"))
+
+    app.push_hub = PushHub(
+        MongoBroadcast(database.get_collection("push_broadcast")) if PUSH_BROADCAST == "mongo"
+        else MemoryBroadcast(),
+        flush_interval=PUSH_FLUSH_INTERVAL,
+    )
+
+    app.time_auction_dal = TimeAuctionDAL(
+        database.get_collection("time_auction_experiences"),
+        database.get_collection("volunteer_hours"),
+        database.get_collection("experience_registrations"),
+        database.get_collection("volunteer_badges"),
+        database.get_collection("users"),
+        database.get_collection("volunteer_hour_ledger"),
+        database.get_collection("leaderboard_standings"),
+        database.get_collection("experience_entries"),
+        event_bus=app.event_bus,
+        push_hub=app.push_hub,
+    )
+
+    app.pet_game_dal = PetGameDAL(
+        database.get_collection("user_pets"),
+        database.get_collection("experience_logs"),
+        database.get_collection("pet_items"),
+        database.get_collection("user_pet_items"),
+        push_hub=app.push_hub,
+    )
+
+    app.ai_grading_dal = AIGradingDAL(
+        database.get_collection("ai_grading_sessions"),
+        database.get_collection("performance_alerts"),
+        database.get_collection("user_streaks"),
+        database.get_collection("submissions"),
+        student_collection,
+        event_bus=app.event_bus,
+        push_hub=app.push_hub,
+    )
+
+    app.family_points_dal = FamilyPointsDAL(
+        database.get_collection("family_points"),
+        database.get_collection("leaderboard_standings"),
+        student_collection,
+        push_hub=app.push_hub,
+    )
+
+    app.score_history_dal = ScoreHistoryDAL(database.get_collection("score_buckets"), student_collection)
+
+    app.watchlist_dal = WatchlistDAL(
+        database.get_collection("watchlist"),
+        student_collection,
+        database.get_collection("score_buckets"),
+        database.get_collection("user_streaks"),
+    )
+
+    app.report_exporter = ReportExporter(
+        database.get_collection("submissions"),
+        database.get_collection("score_buckets"),
+        database.get_collection("volunteer_hours"),
+        database.get_collection("experience_registrations"),
+    )
+
+    app.analytics_cube = AnalyticsCube(
+        database.get_collection("analytics_cube"),
+        database.get_collection("ai_grading_sessions"),
+        database.get_collection("submissions"),
+        student_collection,
+    )
+    app.analytics_cube.register(app.event_bus)
+
+    app.matching_dal = VolunteerMatchingDAL(
+        database.get_collection("family_needs"),
+        database.get_collection("volunteer_suggestions"),
+        student_collection,
+        volunteer_collection,
+        database.get_collection("submissions"),
+        database.get_collection("ai_grading_sessions"),
+        database.get_collection("performance_alerts"),
+        database.get_collection("volunteer_hours"),
+        database.get_collection("volunteer_hour_ledger"),
+    )
+    app.matching_dal.register(app.event_bus)
+
+    app.admission = AdmissionController(
+        MongoTokenBuckets(database.get_collection("rate_limits")) if RATE_LIMIT_STORE == "mongo"
+        else MemoryTokenBuckets()
+    )
+    app.grading_slots = ConcurrencyLimiter("Grading", GRADING_CONCURRENCY, GRADING_QUEUE_SIZE, GRADING_QUEUE_TIMEOUT)
+
+    # Maintenance jobs: every worker schedules them, a lease lets one run each
+    app.scheduler = JobScheduler(database.get_collection("job_locks"), database.get_collection("job_runs"))
+    app.scheduler.add("compact_idle_pets", "*/30 * * * *", app.pet_game_dal.compact_idle_pets)
+    app.scheduler.add("streak_rollover", "5 0 * * *", app.ai_grading_dal.rollover_streaks)
+    app.scheduler.add("leaderboard_rollover", "1 0 * * *", prune_leaderboard_windows)
+    app.scheduler.add("badge_reevaluation", "30 2 * * *", app.time_auction_dal.reevaluate_badges)
+    app.scheduler.add("hour_ledger_reconcile", "0 4 * * 0", app.time_auction_dal.reconcile_hour_ledgers,
+                      lease_seconds=1800)
+    app.scheduler.add("stale_upload_cleanup", "0 3 * * *", app.assignment_dal.cleanup_stale_uploads)
+    app.scheduler.add("allocate_due_experiences", "*/5 * * * *", app.time_auction_dal.allocate_due_experiences)
+    app.scheduler.add("watchlist_refresh", "0 */6 * * *", app.watchlist_dal.refresh, lease_seconds=1800)
+    app.scheduler.add("matching_refresh", "45 3 * * *", app.matching_dal.refresh, lease_seconds=1800)
+    app.scheduler.add("matching_refresh_stale", "*/10 * * * *", app.matching_dal.refresh_stale)
+
+    GamificationConsumers(
+        app.event_bus, app.pet_game_dal, app.ai_grading_dal, app.time_auction_dal,
+        app.family_points_dal, app.score_history_dal
+    ).register()
+
+    # Indexes declared by each DAL, created idempotently
+    app.indexed_components = [
+        app.login_dal, app.assignment_dal, app.event_bus, app.time_auction_dal, app.time_auction_dal.leaderboard,
+        app.pet_game_dal, app.ai_grading_dal, app.family_points_dal, app.family_points_dal.leaderboard,
+        app.score_history_dal, app.watchlist_dal, app.analytics_cube, app.matching_dal, app.admission.buckets,
+        app.scheduler,
+    ]
+    await apply_indexes(*app.indexed_components)
+    # Volunteers who logged hours before ledgers existed would read a zero balance until the weekly reconcile
+    await app.time_auction_dal.backfill_hour_ledgers()
+
+    # Background work
+    await app.push_hub.start()
+    await app.time_auction_dal.leaderboard.start()
+    await app.family_points_dal.leaderboard.start()
+    await app.pet_game_dal.exp_log_writer.start()
+    await app.event_bus.start()
+    await app.scheduler.start()
+
     # Yield back to FastAPI Application:
     yield
 
     # Shutdown:
+    await app.scheduler.stop()
+    await app.event_bus.stop()
+    await app.pet_game_dal.exp_log_writer.stop()
+    await app.time_auction_dal.leaderboard.stop()
+    await app.family_points_dal.leaderboard.stop()
+    await app.push_hub.stop()
     client.close()
 
+async def prune_leaderboard_windows() -> int:
+    return (await app.time_auction_dal.leaderboard.prune_windows()
+            + await app.family_points_dal.leaderboard.prune_windows())
+
 
-app = FastAPI(lifespan=lifespan, debug=DEBUG)
+app = FastAPI(lifespan=lifespan, debug=DEBUG, default_response_class=ORJSONResponse)
+app.add_middleware(InstrumentationMiddleware, instrumentation=instrumentation)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected) -> ORJSONResponse:
+    return ORJSONResponse(
+        {"detail": str(exc)},
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
 
 # -------------------------------------------  LOGIN APIS -------------------------------------------
 # -------------------------------------------  sign up  -------------------------------------------
@@ -86,15 +334,15 @@ async def api_verify_admin(admin_id: str, verification_code: str) -> bool:
     return await app.login_dal.verify_admin(admin_id, verification_code)
 
 # ------------------------------------------- sign in -------------------------------------------
-@app.post("/api/sign_in_student")
+@app.post("/api/sign_in_student", dependencies=[admission("sign_in", "username")])
 async def api_sign_in_student(username: str, password: str) -> bool:
     return await app.login_dal.sign_in_student(username, password)
 
-@app.post("/api/sign_in_volunteer")
+@app.post("/api/sign_in_volunteer", dependencies=[admission("sign_in", "username")])
 async def api_sign_in_volunteer(username: str, password: str) -> bool:
     return await app.login_dal.sign_in_volunteer(username, password)
 
-@app.post("/api/sign_in_admin")
+@app.post("/api/sign_in_admin", dependencies=[admission("sign_in", "username")])
 async def api_sign_in_admin(username: str, password: str) -> bool:
     return await app.login_dal.sign_in_admin(username, password)
 
@@ -108,9 +356,181 @@ async def api_create_assignment(
         file: UploadFile = File(...)) -> str:
     return await app.assignment_dal.create_assignment(title, description, due_date, file)
 
+# -------------------------------------------  TIME AUCTION APIS -------------------------------------------
+@app.get("/api/time_auction/leaderboard")
+async def api_get_volunteer_leaderboard(period: str = "all_time", limit: int = 10) -> list:
+    return await app.time_auction_dal.get_volunteer_leaderboard(period, limit)
+
+@app.get("/api/time_auction/leaderboard/{volunteer_id}")
+async def api_get_volunteer_rank(volunteer_id: str, period: str = "all_time"):
+    return await app.time_auction_dal.get_volunteer_rank(volunteer_id, period)
+
+@app.get("/api/time_auction/pending_verifications")
+async def api_get_pending_verifications(limit: int = 50, cursor: str = None) -> dict:
+    try:
+        return await app.time_auction_dal.get_pending_verifications(limit, cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+@app.post("/api/time_auction/bulk_verify")
+async def api_bulk_verify_volunteer_hours(verified_by: str, log_ids: list[str] = Body(...), verification_notes: str = None) -> int:
+    try:
+        return await app.time_auction_dal.bulk_verify_volunteer_hours(log_ids, verified_by, verification_notes)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+@app.get("/api/time_auction/badges/{volunteer_id}")
+async def api_get_volunteer_badges(volunteer_id: str) -> ModelResponse:
+    return ModelResponse(await app.time_auction_dal.get_volunteer_badges(volunteer_id))
+
+@app.post("/api/time_auction/enter_lottery")
+async def api_enter_experience_lottery(volunteer_id: str, experience_id: str, bid_hours: float = None) -> bool:
+    return await app.time_auction_dal.enter_experience_lottery(volunteer_id, experience_id, bid_hours)
+
+@app.post("/api/time_auction/allocate_due")
+async def api_allocate_due_experiences() -> dict:
+    return await app.time_auction_dal.allocate_due_experiences()
+
+# -------------------------------------------  VOLUNTEER MATCHING APIS -------------------------------------------
+@app.get("/api/matching/suggested_families/{volunteer_id}")
+async def api_get_suggested_families(volunteer_id: str, limit: int = 10) -> ModelResponse:
+    return ModelResponse(await app.matching_dal.get_suggestions(volunteer_id, limit))
+
+@app.post("/api/admin/matching/refresh")
+async def api_refresh_matching() -> int:
+    return await app.matching_dal.refresh()
+
+# -------------------------------------------  PET GAME APIS -------------------------------------------
+@app.get("/api/pet/{user_id}")
+async def api_get_user_pet(user_id: str) -> UserPet | None:
+    return await app.pet_game_dal.get_user_pet(user_id)
+
+@app.post("/api/pet/add_experience")
+async def api_add_experience(user_id: str, activity_type: str, exp_gained: int, description: str = None) -> bool:
+    return await app.pet_game_dal.add_experience(user_id, activity_type, exp_gained, description)
+
+@app.post("/api/pet/feed")
+async def api_feed_pet(user_id: str, item_id: str) -> bool:
+    return await app.pet_game_dal.feed_pet(user_id, item_id)
+
+@app.post("/api/pet/buy_item")
+async def api_buy_item(user_id: str, item_id: str) -> bool:
+    return await app.pet_game_dal.buy_item(user_id, item_id)
+
+@app.get("/api/pet/shop/items")
+async def api_get_shop_items() -> ModelResponse:
+    return ModelResponse(await app.pet_game_dal.get_shop_items())
+
+@app.get("/api/pet/{user_id}/experience_history")
+async def api_get_experience_history(user_id: str, limit: int = 10) -> ModelResponse:
+    return ModelResponse(await app.pet_game_dal.get_experience_history(user_id, limit))
+
+# -------------------------------------------  AI GRADING APIS -------------------------------------------
+@app.post("/api/ai_grading/grade", dependencies=[admission("grading", "user_id")])
+async def api_grade_submission(user_id: str, submission_id: str, submission_content: str = Body(...),
+                               assignment_context: dict = Body({})) -> AIGradingSession:
+    async with app.grading_slots.slot():
+        return await app.ai_grading_dal.grade_submission(submission_id, submission_content, assignment_context)
+
+@app.get("/api/alerts/{user_id}")
+async def api_get_user_alerts(user_id: str, unresolved_only: bool = True) -> ModelResponse:
+    return ModelResponse(await app.ai_grading_dal.get_user_alerts(user_id, unresolved_only))
+
+# -------------------------------------------  SCORE HISTORY APIS -------------------------------------------
+@app.get("/api/scores/{student_id}")
+async def api_get_score_history(student_id: str, start: datetime = None, end: datetime = None) -> list[ScoreSample]:
+    return await app.score_history_dal.get_score_history(student_id, start, end)
+
+@app.get("/api/scores/{student_id}/summary")
+async def api_get_score_summary(student_id: str, start: datetime = None, end: datetime = None) -> dict:
+    return await app.score_history_dal.get_score_summary(student_id, start, end)
+
+# -------------------------------------------  ADMIN WATCHLIST APIS -------------------------------------------
+@app.get("/api/admin/watchlist")
+async def api_get_watchlist(kind: WatchlistKind = None, school: str = None, limit: int = 20) -> ModelResponse:
+    return ModelResponse(await app.watchlist_dal.get_watchlist(kind, school, limit))
+
+@app.post("/api/admin/watchlist/refresh")
+async def api_refresh_watchlist() -> int:
+    return await app.watchlist_dal.refresh()
+
+@app.get("/api/admin/reports/{report}", dependencies=[admission("reports")])
+async def api_export_report(report: ReportName, format: ReportFormat = "csv",
+                            start: datetime = None, end: datetime = None) -> StreamingResponse:
+    media_type, extension = REPORT_FORMATS[format]
+    return StreamingResponse(
+        app.report_exporter.stream(report, format, start, end),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{report}.{extension}"'}
+    )
+
+@app.get("/api/admin/analytics/subjects")
+async def api_get_subject_comparison(start: datetime = None, end: datetime = None, school: str = None) -> dict:
+    return await app.analytics_cube.get_subject_comparison(start, end, school)
+
+@app.get("/api/admin/analytics/regional_trends")
+async def api_get_regional_trends(start: datetime = None, end: datetime = None,
+                                  subject: str = None, criterion: str = "overall") -> dict:
+    return await app.analytics_cube.get_regional_trends(start, end, subject, criterion)
+
+@app.get("/api/admin/instrumentation")
+async def api_get_request_instrumentation(limit: int = 10) -> list:
+    return instrumentation.route_stats(limit)
+
+@app.post("/api/admin/instrumentation/reset")
+async def api_reset_request_instrumentation() -> bool:
+    instrumentation.reset()
+    return True
+
+@app.get("/api/admin/jobs")
+async def api_get_jobs(history: int = 5) -> list:
+    return await app.scheduler.status(history)
+
+@app.post("/api/admin/jobs/{name}/run")
+async def api_run_job(name: str) -> dict | None:
+    if name not in app.scheduler.jobs:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown job {name}")
+    return await app.scheduler.run_now(name)
+
+# -------------------------------------------  FAMILY LEADERBOARD APIS -------------------------------------------
+@app.get("/api/leaderboard/family/{student_id}")
+async def api_get_family_rank(student_id: str, period: str = "all_time"):
+    return await app.family_points_dal.get_family_rank(student_id, period)
+
+@app.get("/api/leaderboard/{school}")
+async def api_get_school_leaderboard(school: str, period: str = "all_time", limit: int = 10) -> list:
+    return await app.family_points_dal.get_school_leaderboard(school, period, limit)
+
+# -------------------------------------------  PUSH UPDATES -------------------------------------------
+@app.websocket("/ws/push")
+async def ws_push(websocket: WebSocket, topics: str = ""):
+    """Topics: alerts:{parent_id}, leaderboard:{school}, pet:{user_id}, volunteer:{volunteer_id}"""
+    await websocket.accept()
+    await app.push_hub.serve(websocket, [topic for topic in topics.split(",") if topic])
+
 def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description="Run the API server")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="worker processes (default: one per core)")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args(argv)
+    workers = 1 if DEBUG else args.workers
+
+    # Workers import this module again; size their Mongo pools for the real worker count
+    os.environ["WEB_CONCURRENCY"] = str(workers)
     try:
-        uvicorn.run("server:app", host="0.0.0.0", port=3001, reload=DEBUG)
+        uvicorn.run(
+            "server:app",
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            reload=DEBUG,
+            # uvloop and httptools aren't available on every platform
+            loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+            http="httptools" if importlib.util.find_spec("httptools") else "h11",
+            # On shutdown stop accepting, let in-flight requests finish, then run the lifespan shutdown
+            timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT,
+        )
     except KeyboardInterrupt:
         pass
 
@@ -0,0 +1,24 @@
+# Shared fixtures: each test gets its own in-memory Mongo database
+import mongomock.collection
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+
+def _ignore_sort(add):
+    # pymongo 4.14 passes `sort` to every bulk operation; mongomock doesn't accept it yet
+    def wrapper(self, *args, sort=None, **kwargs):
+        return add(self, *args, **kwargs)
+    return wrapper
+
+for _name in ("add_insert", "add_update", "add_replace", "add_delete"):
+    setattr(mongomock.collection.BulkOperationBuilder, _name,
+            _ignore_sort(getattr(mongomock.collection.BulkOperationBuilder, _name)))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["test"]
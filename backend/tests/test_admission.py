@@ -0,0 +1,39 @@
+import pytest
+
+from core import admission
+from core.admission import MemoryTokenBuckets, RateLimit
+
+pytestmark = pytest.mark.anyio
+
+LIMIT = RateLimit(rate=1, burst=2)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    return now
+
+
+async def test_bucket_rejects_until_refilled(clock):
+    buckets = MemoryTokenBuckets()
+    assert [await buckets.take("sign_in:user:a", LIMIT) for _ in range(3)] == [0, 0, 1]
+    clock[0] += 1
+    assert await buckets.take("sign_in:user:a", LIMIT) == 0
+
+async def test_refilled_buckets_are_dropped(clock):
+    buckets = MemoryTokenBuckets()
+    for user in range(100):
+        await buckets.take(f"sign_in:user:{user}", LIMIT)
+    clock[0] += 2
+    await buckets.take("sign_in:user:late", LIMIT)
+    assert list(buckets.buckets) == ["sign_in:user:late"]
+
+async def test_rotating_keys_stay_within_max_buckets(clock):
+    buckets = MemoryTokenBuckets(max_buckets=50)
+    for user in range(1000):
+        await buckets.take(f"sign_in:user:{user}", LIMIT)
+    assert len(buckets.buckets) == 50
+    # The most recently used buckets are the ones kept
+    assert await buckets.take("sign_in:user:999", LIMIT) == 0
+    assert await buckets.take("sign_in:user:999", LIMIT) == 1
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.ai_grading import AIGradingDAL
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def ai_grading(db):
+    return AIGradingDAL(db.ai_grading_sessions, db.alerts, db.streaks, db.submissions, db.students)
+
+def _streak(user_id: str, days_ago: int, current: int = 4) -> dict:
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return {"user_id": user_id, "student_id": f"{user_id}-kid", "streak_type": "assignment_submission",
+            "current_streak": current, "longest_streak": current,
+            "last_activity_date": today - timedelta(days=days_ago)}
+
+
+async def test_rollover_breaks_lapsed_streaks_and_alerts_once(ai_grading, db):
+    await db.streaks.insert_many([_streak("lapsed", 3), _streak("active", 1), _streak("broken", 5, current=0)])
+
+    assert await ai_grading.rollover_streaks() == 1
+    # A second, overlapping or retried run finds nothing left to break
+    assert await ai_grading.rollover_streaks() == 0
+
+    alerts = await db.alerts.find().to_list(None)
+    assert [(alert["parent_id"], alert["trigger_data"]["broken_streak"]) for alert in alerts] == [("lapsed", 4)]
+    streaks = {streak["user_id"]: streak["current_streak"] async for streak in db.streaks.find()}
+    assert streaks == {"lapsed": 0, "active": 4, "broken": 0}
+
+async def test_rollover_skips_streak_extended_after_the_scan(ai_grading, db):
+    await db.streaks.insert_many([_streak("first", 3), _streak("second", 3)])
+    scan = ai_grading.streaks_collection.find
+
+    def find_then_extend(query, **kwargs):
+        # The student submits while the job is between its scan and the update
+        async def scanned():
+            async for streak_data in scan(query, **kwargs):
+                yield streak_data
+                await db.streaks.update_one({"user_id": "second"}, {"$set": {
+                    "current_streak": 5, "last_activity_date": datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+                }})
+        return scanned()
+
+    ai_grading.streaks_collection.find = find_then_extend
+    assert await ai_grading.rollover_streaks() == 1
+
+    assert [alert["parent_id"] async for alert in db.alerts.find()] == ["first"]
+    assert (await db.streaks.find_one({"user_id": "second"}))["current_streak"] == 5
+
+async def test_streak_activity_counts_each_day_once(ai_grading, db):
+    monday = datetime(2026, 10, 5, 16, 30)
+    activity = [("p1", "s1", "assignment_submission", monday + timedelta(days=offset)) for offset in (0, 1, 1, 2)]
+
+    [streak] = await ai_grading.record_streak_activity_many(activity)
+    assert (streak.current_streak, streak.longest_streak) == (3, 3)
+    assert streak.last_activity_date == datetime(2026, 10, 7)
+
+    # Replaying the same activities, or an older one, leaves the streak alone
+    [streak] = await ai_grading.record_streak_activity_many(activity + [("p1", "s1", "assignment_submission", monday)])
+    assert streak.current_streak == 3
+    assert await db.streaks.count_documents({}) == 1
+
+async def test_streak_activity_after_a_gap_starts_over(ai_grading, db):
+    await ai_grading.record_streak_activity_many([("p1", "s1", "assignment_submission", datetime(2026, 10, 5))])
+    await ai_grading.record_streak_activity_many([("p1", "s1", "assignment_submission", datetime(2026, 10, 6))])
+    [streak] = await ai_grading.record_streak_activity_many([("p1", "s1", "assignment_submission", datetime(2026, 10, 9))])
+    assert (streak.current_streak, streak.longest_streak) == (1, 2)
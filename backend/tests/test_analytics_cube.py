@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from core.analytics_cube import AnalyticsCube, CLAIM_TIMEOUT_SECONDS
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def cube(db):
+    return AnalyticsCube(db.analytics_cube, db.ai_grading_sessions, db.submissions, db.students)
+
+@pytest.fixture
+async def session_ids(db):
+    student = await db.students.insert_one({"school": "North"})
+    submission = await db.submissions.insert_one({"student_id": str(student.inserted_id)})
+    result = await db.ai_grading_sessions.insert_many([
+        {"submission_id": str(submission.inserted_id), "subject": "English", "adjusted_score": score,
+         "grading_criteria": {}, "created_at": datetime(2026, 10, 6), "cube_batch": None, "cube_applied": False}
+        for score in (60, 80)
+    ])
+    return [str(session_id) for session_id in result.inserted_ids]
+
+async def _overall_count(db) -> int:
+    cell = await db.analytics_cube.find_one({"criterion": "overall"})
+    return cell["count"] if cell else 0
+
+
+async def test_redelivered_sessions_are_counted_once(cube, db, session_ids):
+    assert await cube.add_sessions(session_ids) == 2
+    assert await cube.add_sessions(session_ids) == 0
+    assert await _overall_count(db) == 2
+
+async def test_failed_apply_is_counted_by_the_retry(cube, db, session_ids):
+    bulk_write = cube.cube_collection.bulk_write
+
+    async def failing_bulk_write(*args, **kwargs):
+        raise RuntimeError("connection reset")
+
+    cube.cube_collection.bulk_write = failing_bulk_write
+    with pytest.raises(RuntimeError):
+        await cube.add_sessions(session_ids)
+    cube.cube_collection.bulk_write = bulk_write
+
+    assert await cube.add_sessions(session_ids) == 2
+    assert await _overall_count(db) == 2
+
+async def test_sessions_claimed_by_another_delivery_are_not_recounted(cube, db, session_ids):
+    # Another delivery claimed the first session moments ago and is still counting it
+    claimed = {"cube_batch": "in-flight", "cube_applied": False, "cube_claimed_at": datetime.now()}
+    await db.ai_grading_sessions.update_one({"_id": ObjectId(session_ids[0])}, {"$set": claimed})
+
+    with pytest.raises(RuntimeError):
+        await cube.add_sessions(session_ids)
+    assert await _overall_count(db) == 1
+
+    # That delivery died; once its claim expires the retry takes the session over
+    expired = datetime.now() - timedelta(seconds=CLAIM_TIMEOUT_SECONDS + 1)
+    await db.ai_grading_sessions.update_one({"_id": ObjectId(session_ids[0])}, {"$set": {"cube_claimed_at": expired}})
+    assert await cube.add_sessions(session_ids) == 1
+    assert await _overall_count(db) == 2
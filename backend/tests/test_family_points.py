@@ -0,0 +1,31 @@
+import pytest
+
+from core.family_points import FamilyPointsDAL
+from core.indexes import apply_indexes
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def family_points(db):
+    family_points = FamilyPointsDAL(db.family_points, db.family_standings, db.students)
+    await apply_indexes(family_points)
+    return family_points
+
+
+async def test_award_cut_off_before_the_standings_write_counts_on_redelivery(family_points, db):
+    student_id = str((await db.students.insert_one({"name": "Kit", "school": "North"})).inserted_id)
+    record_now = family_points.leaderboard.record_now
+
+    async def worker_dies(records):
+        raise RuntimeError("worker died")
+
+    family_points.leaderboard.record_now = worker_dies
+    with pytest.raises(RuntimeError):
+        await family_points.award_points(student_id, "assignment_completion", reference_id="s1")
+    family_points.leaderboard.record_now = record_now
+
+    assert await family_points.award_points(student_id, "assignment_completion", reference_id="s1")
+    assert not await family_points.award_points(student_id, "assignment_completion", reference_id="s1")
+    assert (await family_points.get_family_rank(student_id))["total_points"] == 10
+    assert (await db.family_standings.find_one({"period": "all_time"}))["score"] == 10
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+
+from core.ai_grading import AIGradingDAL
+from core.events import EventBus, SUBMISSION_GRADED
+from core.family_points import FamilyPointsDAL
+from core.gamification import GamificationConsumers
+from core.indexes import apply_indexes
+from core.pet_game import PetGameDAL, get_exp_reward
+from core.score_history import ScoreHistoryDAL
+from core.time_auction import TimeAuctionDAL
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def event_bus(db):
+    return EventBus(db.outbox)
+
+@pytest.fixture
+def dals(db, event_bus):
+    dals = {
+        "pet_game": PetGameDAL(db.pets, db.experience_logs, db.pet_items, db.user_pet_items),
+        "ai_grading": AIGradingDAL(db.ai_grading_sessions, db.alerts, db.streaks, db.submissions, db.students,
+                                   event_bus=event_bus),
+        "time_auction": TimeAuctionDAL(db.experiences, db.volunteer_hours, db.registrations, db.badges, db.users,
+                                       db.hour_ledgers, db.volunteer_standings, db.experience_entries),
+        "family_points": FamilyPointsDAL(db.family_points, db.family_standings, db.students),
+        "score_history": ScoreHistoryDAL(db.score_buckets, db.students),
+    }
+    GamificationConsumers(event_bus, dals["pet_game"], dals["ai_grading"], dals["time_auction"],
+                          dals["family_points"], dals["score_history"]).register()
+    return dals
+
+async def _dispatch_all(event_bus):
+    while await event_bus.dispatch_once():
+        pass
+
+
+async def test_redelivered_grading_events_are_not_counted_twice(db, event_bus, dals):
+    # Including the unique indexes that make awards idempotent
+    await apply_indexes(*dals.values())
+    student_id = str((await db.students.insert_one({"name": "Kit", "school": "North"})).inserted_id)
+    submissions = await db.submissions.insert_many([
+        {"student_id": student_id, "parent_id": "p1", "submitted_at": datetime(2026, 10, day, 18)} for day in (5, 6)
+    ])
+    events = [(SUBMISSION_GRADED, {"submission_id": str(submission_id), "score": 100})
+              for submission_id in submissions.inserted_ids]
+
+    await event_bus.publish_many(events)
+    await _dispatch_all(event_bus)
+    # The same events delivered again, e.g. after a worker died before acking them
+    await event_bus.publish_many(events)
+    await _dispatch_all(event_bus)
+
+    expected_xp = 2 * (get_exp_reward("assignment_completion") + get_exp_reward("perfect_score")) \
+        + get_exp_reward("streak_bonus")
+    assert (await dals["pet_game"].get_user_pet("p1")).experience_points == expected_xp
+    assert (await dals["family_points"].get_family_rank(student_id))["total_points"] == 2 * (10 + 5) + 3
+    streak = await db.streaks.find_one({"user_id": "p1"})
+    assert (streak["current_streak"], streak["last_activity_date"]) == (2, datetime(2026, 10, 6))
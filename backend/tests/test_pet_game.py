@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.indexes import apply_indexes
+from core.pet_game import PetGameDAL, LEVEL_THRESHOLDS
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def pet_game(db):
+    return PetGameDAL(db.pets, db.experience_logs, db.pet_items, db.user_pet_items)
+
+
+async def test_level_up_bonus_applies_to_decayed_happiness(pet_game, db):
+    # Three days unfed: 60 stored happiness reads back as 30
+    await db.pets.insert_one({
+        "user_id": "u1", "pet_name": "Buddy", "pet_type": "dragon", "level": 1,
+        "experience_points": LEVEL_THRESHOLDS[0] - 10, "health": 50, "happiness": 60,
+        "last_fed": datetime.now() - timedelta(hours=73),
+    })
+
+    await pet_game.add_experience("u1", "assignment_completion", 20)
+
+    pet = await pet_game.get_user_pet("u1")
+    assert pet.level == 2
+    assert pet.happiness == 30 + 20
+    assert pet.health == 70
+
+async def test_level_up_bonus_is_capped(pet_game, db):
+    await db.pets.insert_one({
+        "user_id": "u1", "pet_name": "Buddy", "pet_type": "dragon", "level": 1,
+        "experience_points": LEVEL_THRESHOLDS[0] - 10, "health": 95, "happiness": 100,
+        "last_fed": datetime.now() - timedelta(hours=25),
+    })
+
+    await pet_game.add_experience("u1", "assignment_completion", 20)
+
+    pet = await pet_game.get_user_pet("u1")
+    assert (pet.health, pet.happiness) == (100, 100)
+
+async def test_experience_without_level_up_keeps_decay(pet_game, db):
+    last_fed = datetime.now().replace(microsecond=0) - timedelta(hours=49)
+    await db.pets.insert_one({
+        "user_id": "u1", "pet_name": "Buddy", "pet_type": "dragon", "level": 1,
+        "experience_points": 0, "health": 50, "happiness": 60, "last_fed": last_fed,
+    })
+
+    await pet_game.add_experience("u1", "daily_login", 10)
+
+    pet = await pet_game.get_user_pet("u1")
+    assert (pet.level, pet.experience_points, pet.happiness) == (1, 10, 40)
+    assert pet.last_fed == last_fed
+
+async def test_award_cut_off_before_the_pet_update_counts_on_redelivery(pet_game, db):
+    await apply_indexes(pet_game)
+    award = ("u1", "assignment_completion", 20, "Submission s1 graded", "s1")
+    write = pet_game.pet_collection.bulk_write
+
+    async def worker_dies(operations, **kwargs):
+        raise RuntimeError("worker died")
+
+    pet_game.pet_collection.bulk_write = worker_dies
+    with pytest.raises(RuntimeError):
+        await pet_game.add_experience_many([award])
+    pet_game.pet_collection.bulk_write = write
+
+    assert await pet_game.add_experience_many([award]) == 1
+    assert await pet_game.add_experience_many([award]) == 0
+    assert (await pet_game.get_user_pet("u1")).experience_points == 20
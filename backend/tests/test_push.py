@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from core.push import MongoBroadcast
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_tail_delivers_batches_inserted_out_of_id_order(db):
+    broadcast = MongoBroadcast(db.push_broadcast, retry_interval=0.01)
+    delivered = []
+    broadcast.deliver = delivered.append
+    earlier, later = ObjectId(), ObjectId()
+    await db.push_broadcast.insert_one({"_id": ObjectId(), "origin": "other", "batch": ["before start"]})
+
+    task = asyncio.create_task(broadcast._tail())
+    try:
+        await asyncio.sleep(0.05)
+        # Another worker's insert lands first with the larger _id
+        await db.push_broadcast.insert_one({"_id": later, "origin": "other", "batch": ["later"]})
+        await asyncio.sleep(0.05)
+        await db.push_broadcast.insert_one({"_id": earlier, "origin": "other", "batch": ["earlier"]})
+        await db.push_broadcast.insert_one({"origin": broadcast.origin, "batch": ["own"]})
+        await asyncio.sleep(0.05)
+    finally:
+        task.cancel()
+
+    assert delivered == [["later"], ["earlier"]]
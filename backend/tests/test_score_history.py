@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from core.indexes import apply_indexes
+from core.models import ScoreSample
+from core.score_history import ScoreHistoryDAL, _bucket_update
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def score_history(db):
+    score_history = ScoreHistoryDAL(db.score_buckets, db.students)
+    await apply_indexes(score_history)
+    return score_history
+
+
+async def test_first_samples_of_a_month_racing_are_both_recorded(score_history):
+    update_one = score_history.buckets_collection.update_one
+    raced = []
+
+    async def lose_the_upsert(query, update, **kwargs):
+        # Another worker's first sample of the month creates the bucket first
+        if not raced:
+            raced.append(True)
+            await update_one(*_bucket_update("s1", [ScoreSample(score=70, recorded_at=datetime(2026, 10, 5),
+                                                                source_id="a")]), upsert=True)
+            raise DuplicateKeyError("E11000 duplicate key error")
+        return await update_one(query, update, **kwargs)
+
+    score_history.buckets_collection.update_one = lose_the_upsert
+    assert await score_history.record_score("s1", 90, datetime(2026, 10, 6), source_id="b")
+    score_history.buckets_collection.update_one = update_one
+
+    assert not await score_history.record_score("s1", 90, datetime(2026, 10, 6), source_id="b")
+    history = await score_history.get_score_history("s1")
+    assert sorted(sample.source_id for sample in history) == ["a", "b"]
@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pytest
+
+from core.time_auction import TimeAuctionDAL
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def time_auction(db):
+    return TimeAuctionDAL(db.experiences, db.volunteer_hours, db.registrations, db.badges, db.users,
+                          db.hour_ledgers, db.volunteer_standings, db.experience_entries)
+
+async def _log_hours(db, volunteer_id: str, hours: float, verified: bool = True):
+    await db.volunteer_hours.insert_one({"volunteer_id": volunteer_id, "activity_type": "tutoring",
+                                         "hours_earned": hours, "is_verified": verified, "created_at": datetime.now()})
+
+
+async def test_backfill_builds_ledgers_for_existing_volunteers(time_auction, db):
+    # Hours logged before the ledger existed
+    await _log_hours(db, "v1", 10)
+    await _log_hours(db, "v1", 2, verified=False)
+    await db.registrations.insert_one({"volunteer_id": "v1", "experience_id": "e0", "hours_spent": 3,
+                                       "registration_status": "completed", "completion_rating": 4})
+    experience = await db.experiences.insert_one({"title": "Museum", "is_active": True, "allocation_mode": "first_come",
+                                                  "registration_deadline": None, "max_participants": 5,
+                                                  "seats_taken": 0, "hours_required": 5})
+
+    assert await time_auction.get_available_hours("v1") == 0
+    assert await time_auction.backfill_hour_ledgers() == 1
+
+    ledger = await time_auction.get_hour_ledger("v1")
+    assert (ledger.earned, ledger.pending, ledger.spent, ledger.available) == (10, 2, 3, 7)
+    assert await time_auction.register_for_experience("v1", str(experience.inserted_id))
+    assert await time_auction.get_available_hours("v1") == 2
+
+async def test_backfill_runs_only_while_there_are_no_ledgers(time_auction, db):
+    await _log_hours(db, "v1", 10)
+    assert await time_auction.backfill_hour_ledgers() == 1
+
+    # Later startups leave reconciling to the scheduled job
+    assert await time_auction.backfill_hour_ledgers() == 0
+
+async def test_malformed_ids_are_rejected_as_invalid_input(time_auction, db):
+    await _log_hours(db, "v1", 3, verified=False)
+    log_id = str((await db.volunteer_hours.find_one())["_id"])
+
+    with pytest.raises(ValueError):
+        await time_auction.bulk_verify_volunteer_hours([log_id, "not-an-id"], "admin")
+    with pytest.raises(ValueError):
+        await time_auction.get_pending_verifications(cursor="not-a-cursor")
+    # Nothing was verified by the rejected call
+    assert (await time_auction.get_pending_verifications())["items"][0]["id"] == log_id
+
+async def test_reconcile_repairs_drifted_ledgers(time_auction, db):
+    await time_auction.log_volunteer_hours("v1", "tutoring", 3)
+    await db.hour_ledgers.update_one({"_id": "v1"}, {"$inc": {"pending": 100}})
+
+    assert await time_auction.reconcile_hour_ledgers() == 1
+    assert (await time_auction.get_hour_ledger("v1")).pending == 3
+
+async def test_reconcile_keeps_adjustments_made_while_it_runs(time_auction, db):
+    await time_auction.log_volunteer_hours("v1", "tutoring", 3)
+    write = time_auction.ledger_collection.bulk_write
+    logged = []
+
+    async def log_before_write(operations, **kwargs):
+        # Hours logged after the reconcile read the raw data, before it writes
+        if not logged:
+            logged.append(await time_auction.log_volunteer_hours("v1", "tutoring", 5))
+        return await write(operations, **kwargs)
+
+    time_auction.ledger_collection.bulk_write = log_before_write
+    assert await time_auction.reconcile_hour_ledgers() == 1
+    assert (await time_auction.get_hour_ledger("v1")).pending == 8
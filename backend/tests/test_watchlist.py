@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.score_history import ScoreHistoryDAL
+from core.watchlist import WatchlistDAL
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def watchlist(db):
+    return WatchlistDAL(db.watchlist, db.students, db.score_buckets, db.streaks)
+
+
+async def test_overlapping_refreshes_keep_the_later_run(watchlist, db):
+    now = datetime.now().replace(microsecond=0)
+    student_id = str((await db.students.insert_one({"name": "Kit", "school": "North"})).inserted_id)
+    await ScoreHistoryDAL(db.score_buckets, db.students).record_scores_many([
+        (student_id, 90, now - timedelta(days=10), None), (student_id, 40, now - timedelta(days=2), None)
+    ])
+    await db.watchlist.insert_one({"_id": "gone", "run_id": "old", "risk_score": 5, "scored_at": now - timedelta(days=1)})
+
+    # The later run finishes first, then an earlier, slower run
+    await watchlist.refresh(now=now)
+    await watchlist.refresh(now=now - timedelta(seconds=5))
+
+    rows = await db.watchlist.find().to_list(None)
+    assert [(row["_id"], row["scored_at"]) for row in rows] == [(student_id, now)]